@@ -0,0 +1,89 @@
+"""Benchmark JSON encoding of API responses.
+
+Compares the old response path (``to_dict(orient="records")``, a
+recursive NaN→None walk, FastAPI's ``jsonable_encoder`` and
+``json.dumps``) with ``ili_json.encode_records`` on a synthetic
+growth table (as served by /ili/matches/{pair}, 1000 rows by default)
+and a synthetic profile (/ili/profile/{year}, 200k points), and checks
+both produce the same JSON.
+
+Run from jarvis_adk:
+    python -m benchmarks.bench_ili_json
+    python -m benchmarks.bench_ili_json --match-rows 1000 --profile-rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.bench_ili_growth import synthetic_matches
+from jarvis_agent.tools import ili_json
+from jarvis_agent.tools.ili_processing import ILIDataset
+
+
+def _clean(obj):
+    """The recursive walker the API used before."""
+    if isinstance(obj, dict):
+        return {k: _clean(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_clean(v) for v in obj]
+    if isinstance(obj, float) and (math.isnan(obj) or math.isinf(obj)):
+        return None
+    return obj
+
+
+def old_encode(df: pd.DataFrame) -> bytes:
+    return json.dumps(jsonable_encoder(_clean(df.to_dict(orient="records")))).encode()
+
+
+def synthetic_profile(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    oclock = rng.uniform(0, 12, rows).round(2)
+    oclock[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        "log_dist_ft": np.sort(rng.uniform(0, 500_000, rows)).round(2),
+        "depth_pct": rng.uniform(5, 80, rows).round(1),
+        "event": rng.choice(["metal loss", "Cluster", "metal loss-manufacturing anomaly"], rows).astype(object),
+        "oclock": oclock,
+        "joint": pd.array(np.arange(rows) // 3 * 10, dtype="Int64"),
+    })
+
+
+def _timed(fn, repeat: int):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return out, (time.perf_counter() - t0) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--match-rows", type=int, default=1000)
+    parser.add_argument("--profile-rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    ds = ILIDataset()
+    ds.matches = {(2015, 2022): synthetic_matches(args.match_rows)}
+    ds.calculate_growth()
+    frames = {
+        "matches": (ds.growth[(2015, 2022)], 20),
+        "profile": (synthetic_profile(args.profile_rows), 1),
+    }
+
+    print(f"{'response':>10} {'rows':>9} {'old_s':>8} {'new_s':>8} {'speedup':>8}")
+    for name, (df, repeat) in frames.items():
+        old, t_old = _timed(lambda: old_encode(df), repeat)
+        new, t_new = _timed(lambda: ili_json.encode_records(df), repeat)
+        assert json.loads(old) == json.loads(new), name
+        print(f"{name:>10} {len(df):>9} {t_old:>8.4f} {t_new:>8.4f} {t_old / t_new:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
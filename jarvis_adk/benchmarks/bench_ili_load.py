@@ -0,0 +1,90 @@
+"""Micro-benchmark event classification and o'clock parsing used by load.
+
+Compares the per-row ``Series.apply`` calls that ``ILIDataset.load`` used
+to make against ``_event_mask`` / ``_parse_oclock_series`` on a synthetic
+run (500k rows by default) mixing HH:MM strings, ``datetime.time`` cells,
+decimal hours and blanks, and checks both give the same per-row results.
+
+Run from jarvis_adk:
+    python -m benchmarks.bench_ili_load
+    python -m benchmarks.bench_ili_load --rows 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+
+from jarvis_agent.tools.ili_processing import (
+    _event_mask,
+    _is_anomaly,
+    _is_metal_loss,
+    _is_reference,
+    _parse_oclock,
+    _parse_oclock_series,
+)
+
+_EVENTS = [
+    "Girth Weld", "GirthWeld", "metal loss", "Metal Loss", "Cluster", "Field Bend",
+    "Valve", "Dent", "Seam Weld Manufacturing Anomaly", "AGM", "Start Sleeve",
+    "metal loss-manufacturing anomaly", "Attachment", "Tap",
+]
+
+
+def synthetic_run(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    hours = rng.integers(0, 13, rows)
+    minutes = rng.integers(0, 60, rows)
+    kind = rng.integers(0, 4, rows)
+    clocks = np.empty(rows, dtype=object)
+    for i in range(rows):
+        if kind[i] == 0:
+            clocks[i] = datetime.time(int(hours[i]) % 24, int(minutes[i]))
+        elif kind[i] == 1:
+            clocks[i] = f"{hours[i]}:{minutes[i]:02d}"
+        elif kind[i] == 2:
+            clocks[i] = float(hours[i]) + minutes[i] / 60.0
+        else:
+            clocks[i] = np.nan
+    return pd.DataFrame({
+        "event": rng.choice(_EVENTS, rows),
+        "oclock": clocks,
+    })
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args()
+
+    df = synthetic_run(args.rows)
+    print(f"{'stage':>14} {'apply_s':>9} {'vectorized_s':>13} {'speedup':>9}")
+
+    for name, predicate in [
+        ("is_reference", _is_reference),
+        ("is_anomaly", _is_anomaly),
+        ("is_metal_loss", _is_metal_loss),
+    ]:
+        old, t_old = _timed(lambda: df["event"].apply(predicate).to_numpy(dtype=bool))
+        new, t_new = _timed(lambda: _event_mask(df["event"], predicate))
+        assert (old == new).all(), name
+        print(f"{name:>14} {t_old:>9.3f} {t_new:>13.3f} {t_old / t_new:>9.1f}")
+
+    old, t_old = _timed(lambda: df["oclock"].apply(_parse_oclock))
+    new, t_new = _timed(lambda: _parse_oclock_series(df["oclock"]))
+    pd.testing.assert_series_equal(old, new, check_names=False)
+    print(f"{'oclock':>14} {t_old:>9.3f} {t_new:>13.3f} {t_old / t_new:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Benchmark the vectorized anomaly matcher against the original row loop.
+
+Builds synthetic metal-loss runs (1k, 10k and 100k anomalies by default),
+times ``ILIDataset._match_anomaly_pair`` and, for sizes up to
+``--legacy-max``, the original nested ``iterrows()`` loop, checking that
+both produce the same matches DataFrame and summary counts.
+
+Run from jarvis_adk:
+    python -m benchmarks.bench_ili_matching
+    python -m benchmarks.bench_ili_matching --sizes 1000 10000 --legacy-max 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from jarvis_agent.tools.ili_processing import ILIDataset, _clock_distance, _is_metal_loss
+
+
+def synthetic_pair(n: int, seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Two runs of ``n`` metal-loss anomalies, the later one jittered and grown."""
+    rng = np.random.default_rng(seed)
+    length_ft = n * 5.0  # ~one anomaly every 5 ft
+    dist1 = np.sort(rng.uniform(0, length_ft, n))
+    clock1 = rng.uniform(0, 12, n)
+    depth1 = rng.uniform(5, 60, n)
+
+    keep = rng.random(n) > 0.1
+    dist2 = np.concatenate([
+        dist1[keep] + rng.normal(0, 0.8, keep.sum()),
+        rng.uniform(0, length_ft, n - keep.sum()),
+    ])
+    clock2 = np.concatenate([
+        (clock1[keep] + rng.normal(0, 0.3, keep.sum())) % 12,
+        rng.uniform(0, 12, n - keep.sum()),
+    ])
+    depth2 = np.concatenate([
+        depth1[keep] + rng.uniform(0, 8, keep.sum()),
+        rng.uniform(5, 30, n - keep.sum()),
+    ])
+    order = np.argsort(dist2)
+
+    def frame(dist, clock, depth):
+        return pd.DataFrame({
+            "joint_number": (dist // 40).astype(int),
+            "log_dist_ft": dist,
+            "event": "metal loss",
+            "depth_pct": depth,
+            "length_in": rng.uniform(0.5, 4, len(dist)),
+            "width_in": rng.uniform(0.5, 4, len(dist)),
+            "oclock_decimal": clock,
+            "id_od": rng.choice(["internal", "external"], len(dist)),
+        })
+
+    return frame(dist1, clock1, depth1), frame(dist2[order], clock2[order], depth2[order])
+
+
+def legacy_match_pair(
+    ds: ILIDataset, y1: int, y2: int,
+    distance_tol: float = 3.0, clock_tol: float = 1.5,
+    depth_weight: float = 0.3, dist_weight: float = 0.4, clock_weight: float = 0.3,
+) -> tuple[dict, pd.DataFrame]:
+    """The original O(n*m) iterrows matcher, kept here as the reference."""
+    anoms1 = ds.anomalies[y1].copy()
+    anoms2 = ds.anomalies[y2].copy()
+    ml1 = anoms1[anoms1["event"].apply(_is_metal_loss)].copy()
+    ml2 = anoms2[anoms2["event"].apply(_is_metal_loss)].copy()
+
+    if (y1, y2) in ds.correction_funcs:
+        ml2["corrected_dist"] = ds.correction_funcs[(y1, y2)](ml2["log_dist_ft"].values)
+    else:
+        ml2["corrected_dist"] = ml2["log_dist_ft"]
+
+    matched_pairs = []
+    used_y1 = set()
+    used_y2 = set()
+    for idx2, row2 in ml2.iterrows():
+        corr_dist = row2["corrected_dist"]
+        clock2 = row2.get("oclock_decimal")
+        best_score = -1
+        best_idx1 = None
+        for idx1, row1 in ml1.iterrows():
+            if idx1 in used_y1:
+                continue
+            dist_diff = abs(corr_dist - row1["log_dist_ft"])
+            if dist_diff > distance_tol:
+                continue
+            clock1 = row1.get("oclock_decimal")
+            if clock1 is not None and clock2 is not None:
+                clock_diff = _clock_distance(clock1, clock2)
+                if clock_diff > clock_tol:
+                    continue
+            else:
+                clock_diff = 0
+            dist_score = 1.0 - (dist_diff / distance_tol)
+            clock_score = 1.0 - (clock_diff / clock_tol) if (clock1 is not None and clock2 is not None) else 0.5
+            depth1 = row1.get("depth_pct")
+            depth2 = row2.get("depth_pct")
+            if pd.notna(depth1) and pd.notna(depth2) and depth1 > 0:
+                depth_ratio = depth2 / depth1
+                if depth_ratio >= 1.0:
+                    depth_score = max(0, 1.0 - abs(depth_ratio - 1.0) / 2.0)
+                else:
+                    depth_score = max(0, depth_ratio - 0.3)
+            else:
+                depth_score = 0.5
+            total_score = dist_weight * dist_score + clock_weight * clock_score + depth_weight * depth_score
+            if total_score > best_score:
+                best_score = total_score
+                best_idx1 = idx1
+
+        if best_idx1 is not None and best_score > 0.3:
+            row1 = ml1.loc[best_idx1]
+            confidence = "high" if best_score > 0.7 else ("medium" if best_score > 0.5 else "low")
+            matched_pairs.append({
+                "y1_idx": best_idx1,
+                "y2_idx": idx2,
+                "y1_dist": float(row1["log_dist_ft"]),
+                "y2_dist": float(row2["log_dist_ft"]),
+                "y2_corrected_dist": float(corr_dist),
+                "y1_joint": row1.get("joint_number"),
+                "y2_joint": row2.get("joint_number"),
+                "y1_depth_pct": row1.get("depth_pct"),
+                "y2_depth_pct": row2.get("depth_pct"),
+                "y1_length_in": row1.get("length_in"),
+                "y2_length_in": row2.get("length_in"),
+                "y1_width_in": row1.get("width_in"),
+                "y2_width_in": row2.get("width_in"),
+                "y1_clock": row1.get("oclock_decimal"),
+                "y2_clock": row2.get("oclock_decimal"),
+                "y1_event": row1.get("event"),
+                "y2_event": row2.get("event"),
+                "y1_id_od": row1.get("id_od"),
+                "y2_id_od": row2.get("id_od"),
+                "score": round(best_score, 3),
+                "confidence": confidence,
+            })
+            used_y1.add(best_idx1)
+            used_y2.add(idx2)
+
+    stats = {
+        "matched": len(matched_pairs),
+        "new_in_later_run": int((~ml2.index.isin(used_y2)).sum()),
+        "missing_from_earlier_run": int((~ml1.index.isin(used_y1)).sum()),
+        "high_confidence": len([m for m in matched_pairs if m["confidence"] == "high"]),
+        "medium_confidence": len([m for m in matched_pairs if m["confidence"] == "medium"]),
+        "low_confidence": len([m for m in matched_pairs if m["confidence"] == "low"]),
+        "total_y1_metal_loss": len(ml1),
+        "total_y2_metal_loss": len(ml2),
+    }
+    return stats, pd.DataFrame(matched_pairs)
+
+
+def _dataset(n: int) -> ILIDataset:
+    run1, run2 = synthetic_pair(n)
+    ds = ILIDataset()
+    ds.runs = {1: run1, 2: run2}
+    ds.anomalies = {1: run1, 2: run2}
+    return ds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--legacy-max", type=int, default=1000,
+                        help="Largest size to also time with the original loop (it is O(n*m)).")
+    args = parser.parse_args()
+
+    print(f"{'anomalies':>10} {'vectorized_s':>13} {'legacy_s':>10} {'speedup':>9} {'matched':>8}")
+    for n in args.sizes:
+        ds = _dataset(n)
+        t0 = time.perf_counter()
+        stats = ds._match_anomaly_pair(1, 2, 3.0, 1.5, 0.3, 0.4, 0.3)
+        fast = time.perf_counter() - t0
+
+        legacy = float("nan")
+        if n <= args.legacy_max:
+            t0 = time.perf_counter()
+            ref_stats, ref_df = legacy_match_pair(ds, 1, 2)
+            legacy = time.perf_counter() - t0
+            assert stats == ref_stats, (stats, ref_stats)
+            pd.testing.assert_frame_equal(ds.matches[(1, 2)], ref_df)
+
+        print(f"{n:>10} {fast:>13.3f} {legacy:>10.3f} {legacy / fast:>9.1f} {stats['matched']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark ILIDataset.query_anomalies on a large synthetic run.
+
+Times indexed queries (``ili_index``) against the boolean column scan
+``query_anomalies`` used before, on one run of 1M anomalies by default,
+and checks both return the same rows.
+
+Run from jarvis_adk:
+    python -m benchmarks.bench_ili_query
+    python -m benchmarks.bench_ili_query --rows 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from jarvis_agent.tools.ili_processing import ILIDataset
+
+QUERIES = {
+    "joint range": {"joint_min": 40_000, "joint_max": 40_200},
+    "deep": {"min_depth": 79.5},
+    "joint+depth": {"joint_min": 10_000, "joint_max": 60_000, "min_depth": 60},
+    "dist window": {"dist_min": 250_000, "dist_max": 251_000},
+    "no filter": {},
+}
+
+
+def synthetic_anomalies(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dist = np.sort(rng.uniform(0, 2_000_000, rows)).round(3)
+    return pd.DataFrame({
+        "joint_number": (dist // 40).astype(np.int64) * 10,
+        "log_dist_ft": dist,
+        "event": "metal loss",
+        "depth_pct": rng.uniform(5, 80, rows).round(1),
+        "oclock_decimal": rng.uniform(0, 12, rows).round(2),
+    })
+
+
+def scan_query(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    """Column scans as query_anomalies did them before the indexes."""
+    df = df.copy()
+    if "joint_min" in filters:
+        df = df[df["joint_number"] >= filters["joint_min"]]
+    if "joint_max" in filters:
+        df = df[df["joint_number"] <= filters["joint_max"]]
+    if "min_depth" in filters:
+        df = df[df["depth_pct"] >= filters["min_depth"]]
+    if "dist_min" in filters:
+        df = df[df["log_dist_ft"] >= filters["dist_min"]]
+    if "dist_max" in filters:
+        df = df[df["log_dist_ft"] <= filters["dist_max"]]
+    return df.head(filters.get("limit", 50))
+
+
+def _timed(fn, repeat: int):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return out, (time.perf_counter() - t0) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = synthetic_anomalies(args.rows)
+    ds = ILIDataset()
+    ds.runs = {2022: df}
+    ds.anomalies = {2022: df}
+    ds.query_anomalies({"year": 2022})  # builds the index
+
+    print(f"{'query':>12} {'scan_ms':>9} {'indexed_ms':>11} {'speedup':>8}")
+    for name, filters in QUERIES.items():
+        filters = {"year": 2022, "limit": 50, **filters}
+        old, t_old = _timed(lambda: scan_query(df, filters).to_dict(orient="records"), 3)
+        new, t_new = _timed(lambda: ds.query_anomalies(filters), 50)
+        assert new == old, name
+        print(f"{name:>12} {t_old * 1e3:>9.2f} {t_new * 1e3:>11.3f} {t_old / t_new:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measure peak memory of streaming a large tally CSV into the Parquet cache.
+
+Writes a synthetic tally CSV (the sample workbook's 2022 sheet repeated
+to ``--rows`` rows, distances offset per copy), then ingests it in a fresh
+process with ``ILIDataset._parse_tallies``, once streamed through the cache
+and once fully in memory, reporting wall time and peak RSS for each.
+
+Run from jarvis_adk:
+    python -m benchmarks.bench_ili_tally
+    python -m benchmarks.bench_ili_tally --rows 2000000 --chunk-rows 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+_WORKBOOK = Path(__file__).resolve().parent.parent.parent / "ILIDataV2.xlsx"
+
+_CHILD = """
+import resource, sys, time
+from pathlib import Path
+import pandas as pd
+from jarvis_agent.tools import ili_cache
+from jarvis_agent.tools.ili_processing import ILIDataset, _iter_tally_chunks, _tally_files
+
+path, streamed, chunk_rows = Path(sys.argv[1]), sys.argv[2] == "1", int(sys.argv[3])
+t0 = time.perf_counter()
+if streamed:
+    # Cold ingest: chunks go straight into the Parquet cache
+    chunks = {y: _iter_tally_chunks(f, y, chunk_rows) for y, f in _tally_files(path).items()}
+    assert ili_cache.store_chunks(path, "bench", pd.DataFrame(), chunks)
+else:
+    ILIDataset._parse_tallies(path, "bench", False, chunk_rows)
+print(time.perf_counter() - t0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+"""
+
+
+def write_tally(path: Path, rows: int):
+    sheet = pd.read_excel(_WORKBOOK, "2022")
+    dist_col = next(c for c in sheet.columns if "Wheel Count" in c)
+    span = float(sheet[dist_col].max()) + 100.0
+    written = 0
+    copy = 0
+    while written < rows:
+        part = sheet.head(rows - written).copy()
+        part[dist_col] = part[dist_col] + copy * span
+        part.to_csv(path, mode="a", header=copy == 0, index=False)
+        written += len(part)
+        copy += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        tally = tmp / "tally_2022.csv"
+        write_tally(tally, args.rows)
+        size_mb = tally.stat().st_size / 1e6
+        print(f"{args.rows} rows, {size_mb:.0f} MB CSV, chunks of {args.chunk_rows}")
+        print(f"{'mode':>10} {'seconds':>9} {'peak_rss_mb':>12}")
+        for label, use_cache in (("streamed", "1"), ("in-memory", "0")):
+            out = subprocess.run(
+                [sys.executable, "-c", _CHILD, str(tally), use_cache, str(args.chunk_rows)],
+                check=True, capture_output=True, text=True,
+                cwd=Path(__file__).resolve().parent.parent,
+            ).stdout.split()
+            print(f"{label:>10} {float(out[0]):>9.2f} {float(out[1]):>12.0f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,23 +10,51 @@ for fast, structured data without going through the LLM agent loop.
 from __future__ import annotations
 
 import json
-import math
 import os
 from pathlib import Path
+from typing import Any
 import pandas as pd
 
 def _log(msg: str):
     """Log to stdout so it appears in uvicorn terminal."""
     print(f"[ILI] {msg}", flush=True)
 
-from fastapi import FastAPI, Query
+from fastapi import Body, FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-
-from jarvis_agent.tools.ili_processing import get_dataset, reset_dataset
-from jarvis_agent.tools.ili_clustering import cluster_anomalies
+from fastapi.responses import Response, StreamingResponse
+
+from jarvis_agent.tools.ili_jobs import JobManager, run_pipeline
+from jarvis_agent.tools.ili_json import dumps, encode_records, encode_sse, iter_csv, iter_ndjson
+from jarvis_agent.tools.ili_processing import datasets
+from jarvis_agent.tools.ili_registry import UnknownDatasetError
+from jarvis_agent.tools.ili_singleflight import SingleFlight
+from jarvis_agent.tools.ili_clustering import (
+    HIERARCHY_REACH, MAX_EPSILON, ClusterHierarchy, cluster_anomalies, cluster_stats,
+)
 from jarvis_agent.tools.ili_llm_prediction import predict_growth, predict_new_anomalies, risk_assessment
 
-app = FastAPI(title="JARVIS ILI API", version="1.0.0")
+
+class ILIJSONResponse(Response):
+    """JSON response encoded straight to bytes by ``ili_json``.
+
+    NaN/Inf become null in the encoder and DataFrames are written as a
+    list of row objects without building per-row dicts. Returning an
+    instance also skips FastAPI's ``jsonable_encoder`` pass.
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, content: Any, omit_null: tuple[str, ...] = (), **kwargs):
+        self._omit_null = omit_null
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, pd.DataFrame):
+            return encode_records(content, self._omit_null)
+        return dumps(content)
+
+
+app = FastAPI(title="JARVIS ILI API", version="1.0.0", default_response_class=ILIJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,83 +65,164 @@ app.add_middleware(
 
 _DEFAULT_FILE = str(Path(__file__).resolve().parent.parent / "ILIDataV2.xlsx")
 
+# Optional ``dataset`` query param: an id from /ili/load or /ili/datasets
+_DATASET = Query(None, description="Dataset id from /ili/load (default: the last workbook loaded)")
+
+# Concurrent identical run-all / growth / predict-growth calls share one computation
+flights = SingleFlight()
+
+
+@app.exception_handler(UnknownDatasetError)
+def unknown_dataset(request: Request, exc: UnknownDatasetError):
+    return ILIJSONResponse({"error": str(exc)}, status_code=404)
+
 
-def _clean(obj):
-    """Recursively replace NaN/Inf with None for JSON serialization."""
-    if isinstance(obj, dict):
-        return {k: _clean(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [_clean(v) for v in obj]
-    if isinstance(obj, float) and (math.isnan(obj) or math.isinf(obj)):
-        return None
-    return obj
+def _source(ds) -> str:
+    """Workbook the dataset was loaded from, or the default one."""
+    return ds._file_path or _DEFAULT_FILE
+
+
+def _latest_year(ds) -> int | None:
+    return max(ds.runs) if ds.runs else None
 
 
 @app.get("/ili/load")
 def load_data(file_path: str = ""):
-    """Load ILI data from Excel file."""
-    reset_dataset()
-    ds = get_dataset()
+    """Load ILI data from Excel file (no-op if the same content is already loaded).
+
+    The workbook becomes the default dataset; the response's ``dataset``
+    id selects it explicitly on other endpoints.
+    """
     path = file_path.strip() if file_path.strip() else _DEFAULT_FILE
-    result = ds.load(path)
-    return _clean(result)
+    key = datasets.open(path)
+    _, result = datasets.current(key, lambda ds: ds.ensure_loaded(path))
+    return ILIJSONResponse({**result, "dataset": key})
+
+
+@app.get("/ili/datasets")
+def list_datasets():
+    """Registered datasets (most recently used first) with their sizes."""
+    return ILIJSONResponse(datasets.describe())
+
+
+@app.get("/ili/singleflight")
+def singleflight_stats():
+    """Computations run and saved by coalescing identical concurrent requests."""
+    return ILIJSONResponse(flights.describe())
+
+
+@app.post("/ili/datasets")
+def open_dataset(file_path: str = Query(...)):
+    """Register (and load) a workbook alongside the others, keeping the current default."""
+    key = datasets.open(file_path.strip(), make_default=False)
+    _, result = datasets.current(key, lambda ds: ds.ensure_loaded())
+    return ILIJSONResponse({"dataset": key, "load": result})
+
+
+@app.delete("/ili/datasets/{dataset_id}")
+def drop_dataset(dataset_id: str):
+    """Forget a dataset; requests already using it finish normally."""
+    if not datasets.drop(dataset_id):
+        raise UnknownDatasetError(dataset_id)
+    return ILIJSONResponse({"dropped": dataset_id})
 
 
 @app.get("/ili/summary")
-def summary():
+def summary(dataset: str | None = _DATASET):
     """Get pipeline summary statistics."""
-    ds = get_dataset()
-    if not ds.runs:
-        ds.load(_DEFAULT_FILE)
-    return _clean(ds.get_summary_stats())
+    ds, _ = datasets.current(dataset, lambda ds: ds.ensure_loaded(_source(ds)))
+    return ILIJSONResponse(ds.get_summary_stats())
+
+
+@app.get("/ili/memory")
+def memory(dataset: str | None = _DATASET):
+    """Bytes held per run and per derived table of the loaded dataset."""
+    ds, _ = datasets.current(dataset, lambda ds: ds.ensure_loaded(_source(ds)))
+    return ILIJSONResponse(ds.memory_report())
 
 
 @app.get("/ili/align")
-def align():
+def align(dataset: str | None = _DATASET):
     """Run weld alignment and return quality metrics."""
-    ds = get_dataset()
-    if not ds.runs:
-        ds.load(_DEFAULT_FILE)
-    result = ds.align_welds()
-    return _clean(result)
+    _, result = datasets.current(dataset, lambda ds: ds.ensure_aligned(_source(ds)))
+    return ILIJSONResponse(result)
 
 
 @app.get("/ili/alignment-data")
-def alignment_data():
+def alignment_data(dataset: str | None = _DATASET):
     """Get alignment visualization data (weld matches + correction curves)."""
-    ds = get_dataset()
-    if not ds.runs:
-        ds.load(_DEFAULT_FILE)
-    if not ds.correction_funcs:
-        ds.align_welds()
-    return _clean(ds.get_alignment_data())
+    ds, _ = datasets.current(dataset, lambda ds: ds.ensure_aligned(_source(ds)))
+    return ILIJSONResponse(ds.get_alignment_data())
 
 
 @app.get("/ili/match")
-def match():
-    """Run anomaly matching and return statistics."""
-    ds = get_dataset()
-    if not ds.runs:
-        ds.load(_DEFAULT_FILE)
-    if not ds.correction_funcs:
-        ds.align_welds()
-    result = ds.match_anomalies()
-    return _clean(result)
+def match(
+    assignment: str = Query("greedy", pattern="^(greedy|optimal)$"),
+    workers: int = Query(1, ge=1, le=32),
+    dataset: str | None = _DATASET,
+):
+    """Run anomaly matching and return statistics.
+
+    assignment: "greedy" (later-run order) or "optimal" (min-cost one-to-one).
+    workers: processes used for matching (same result as 1).
+    """
+    _, result = datasets.current(
+        dataset, lambda ds: ds.ensure_matched(_source(ds), workers=workers, assignment=assignment),
+    )
+    return ILIJSONResponse(result)
+
+
+@app.get("/ili/match-sweep")
+def match_sweep(
+    distance_tol: list[float] = Query([1.0, 2.0, 3.0, 4.0, 5.0]),
+    clock_tol: list[float] = Query([0.5, 1.0, 1.5, 2.0]),
+    assignment: str = Query("greedy", pattern="^(greedy|optimal)$"),
+    dataset: str | None = _DATASET,
+):
+    """Match statistics for a whole distance/clock tolerance grid in one call.
+
+    Repeat the query params to set the grid, e.g.
+    ``?distance_tol=2&distance_tol=3&clock_tol=1&clock_tol=1.5``.
+    """
+    with datasets.use(dataset) as ds:
+        ds.ensure_aligned(_source(ds))
+        result = ds.sweep_matches(distance_tol, clock_tol, assignment=assignment)
+        return ILIJSONResponse(result)
 
 
 @app.get("/ili/growth")
-def growth(top_n: int = Query(20, ge=1, le=500)):
-    """Calculate growth rates and return top fastest-growing anomalies."""
-    ds = get_dataset()
-    if not ds.runs:
-        ds.load(_DEFAULT_FILE)
-    if not ds.correction_funcs:
-        ds.align_welds()
-    if not ds.matches:
-        ds.match_anomalies()
-    stats = ds.calculate_growth()
-    top = ds.get_top_growth(top_n=top_n)
-    return _clean({"statistics": stats, "top_growing": top})
+def growth(
+    top_n: int = Query(20, ge=1, le=500),
+    workers: int = Query(1, ge=1, le=32),
+    thresholds: str | None = Query(None, description="e.g. critical:3,high:2,moderate:1"),
+    sort_by: str = Query("depth", pattern="^(depth|length|width)$"),
+    dataset: str | None = _DATASET,
+):
+    """Calculate growth rates and return top fastest-growing anomalies.
+
+    thresholds: severity bins as label:min depth growth %/yr pairs; rows
+    above none of them are "normal". Without it the current bins are kept
+    (the defaults, unless an earlier call set others). Growth is computed
+    over the current matches, whatever parameters /ili/match ran with;
+    re-binning does not re-run matching.
+    sort_by: growth rate to rank by (depth, length or width).
+    """
+    def compute():
+        ds, stats = datasets.current(
+            dataset, lambda ds: ds.reuse_growth(_source(ds), workers=workers, severity_thresholds=table),
+        )
+        return {"statistics": stats, "top_growing": ds.get_top_growth(top_n=top_n, sort_by=sort_by)}
+
+    try:
+        table = None
+        if thresholds:
+            table = [(label.strip(), float(rate)) for label, rate in
+                     (item.split(":", 1) for item in thresholds.split(",") if item.strip())]
+        key = (datasets.fingerprint(dataset), top_n, sort_by, tuple(table or ()))
+        body = flights.do("growth", key, compute)
+    except ValueError as e:
+        return {"error": f"Bad thresholds {thresholds!r}: {e}"}
+    return ILIJSONResponse(body)
 
 
 @app.get("/ili/matches/{pair}")
@@ -121,67 +230,286 @@ def match_details(
     pair: str,
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    dataset: str | None = _DATASET,
 ):
     """Get detailed match results for a specific run pair (e.g. '2015->2022')."""
-    ds = get_dataset()
-    if not ds.runs:
-        ds.load(_DEFAULT_FILE)
-    if not ds.correction_funcs:
-        ds.align_welds()
-    if not ds.matches:
-        ds.match_anomalies()
-    if not ds.growth:
-        ds.calculate_growth()
-    data = ds.get_match_details(pair, limit=limit, offset=offset)
-    return _clean(data)
+    ds, _ = datasets.current(dataset, lambda ds: ds.reuse_growth(_source(ds)))
+    return ILIJSONResponse(ds.match_details_frame(pair, limit=limit, offset=offset))
 
 
 @app.get("/ili/profile/{year}")
-def profile(year: int):
-    """Get pipeline profile data (distance vs depth) for a specific year."""
-    ds = get_dataset()
-    if not ds.runs:
-        ds.load(_DEFAULT_FILE)
-    data = ds.get_profile_data(year)
-    return _clean(data)
+def profile(
+    year: int,
+    start_ft: float | None = Query(None),
+    end_ft: float | None = Query(None),
+    max_points: int | None = Query(None, ge=2, le=100_000),
+    dataset: str | None = _DATASET,
+):
+    """Get pipeline profile data (distance vs depth) for a specific year.
+
+    start_ft/end_ft: distance window to return.
+    max_points: cap on points; denser windows are reduced to the shallowest
+    and deepest anomaly per distance bin.
+    """
+    ds, _ = datasets.current(dataset, lambda ds: ds.ensure_loaded(_source(ds)))
+    frame = ds.profile_frame(year, start_ft=start_ft, end_ft=end_ft, max_points=max_points)
+    return ILIJSONResponse(frame, omit_null=ds.PROFILE_OPTIONAL)
+
+
+@app.get("/ili/profile-tiles/{year}")
+def profile_tiles(year: int, dataset: str | None = _DATASET):
+    """Layout of the profile tile pyramid for a run (origin, extent, levels)."""
+    ds, _ = datasets.current(dataset, lambda ds: ds.ensure_loaded(_source(ds)))
+    pyramid = ds.profile_pyramid(year)
+    if pyramid is None:
+        return ILIJSONResponse({"error": f"No data for year {year}"}, status_code=404)
+    return ILIJSONResponse(pyramid.describe())
+
+
+@app.get("/ili/profile-tiles/{year}/{level}/{tile}")
+def profile_tile(
+    year: int, level: int, tile: int, request: Request, dataset: str | None = _DATASET,
+):
+    """One precomputed profile tile: per-bin count, max/mean depth and deepest anomaly.
+
+    Level z splits the run into 2**z tiles. The ETag only changes when the
+    run's data does, so clients revalidate with If-None-Match and get 304.
+    """
+    ds, _ = datasets.current(dataset, lambda ds: ds.ensure_loaded(_source(ds)))
+    pyramid = ds.profile_pyramid(year)
+    if pyramid is None or not pyramid.has_tile(level, tile):
+        return ILIJSONResponse({"error": f"No profile tile {year}/{level}/{tile}"}, status_code=404)
+
+    etag = f'"{pyramid.fingerprint}-{level}-{tile}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return ILIJSONResponse(pyramid.tile(level, tile), headers=headers)
+
+
+def _export(df: pd.DataFrame, fmt: str, name: str, omit_null: tuple[str, ...] = ()) -> StreamingResponse:
+    """Stream ``df`` as NDJSON or CSV, encoded chunk by chunk as the client reads."""
+    if fmt == "csv":
+        body, media_type, suffix = iter_csv(df), "text/csv", "csv"
+    else:
+        body, media_type, suffix = iter_ndjson(df, omit_null), "application/x-ndjson", "ndjson"
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{suffix}"'},
+    )
+
+
+@app.get("/ili/export/matches/{pair}")
+def export_matches(
+    pair: str,
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    dataset: str | None = _DATASET,
+):
+    """All match rows (with growth columns) for a run pair, streamed as NDJSON or CSV."""
+    ds, _ = datasets.current(dataset, lambda ds: ds.reuse_growth(_source(ds)))
+    try:
+        y1, y2 = (int(y) for y in pair.split("->"))
+    except ValueError:
+        return ILIJSONResponse({"error": f"Invalid pair format: {pair}"})
+    if (y1, y2) not in ds.matches:
+        return ILIJSONResponse({"error": f"No matches for {pair}"})
+    return _export(ds.match_details_frame(pair, limit=None), fmt, f"matches_{y1}_{y2}")
+
+
+@app.get("/ili/export/profile/{year}")
+def export_profile(
+    year: int,
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    dataset: str | None = _DATASET,
+):
+    """Every profile point (metal-loss anomaly) of a run, streamed as NDJSON or CSV."""
+    ds, _ = datasets.current(dataset, lambda ds: ds.ensure_loaded(_source(ds)))
+    if year not in ds.anomalies:
+        return ILIJSONResponse({"error": f"No data for year {year}"})
+    return _export(ds.profile_frame(year), fmt, f"profile_{year}", omit_null=ds.PROFILE_OPTIONAL)
+
+
+@app.post("/ili/runs/{year}")
+def register_run(year: int, rows: list[dict] = Body(...), dataset: str | None = _DATASET):
+    """Add or replace the inspection run for ``year`` from JSON rows.
+
+    Rows use workbook headers (any spelling the loader knows) or canonical
+    column names. Only the run pairs touching ``year`` are re-aligned and
+    re-matched by the next request.
+    """
+    with datasets.use(dataset) as ds:
+        ds.ensure_loaded(_source(ds))
+        try:
+            result = ds.register_run(year, pd.DataFrame(rows))
+        except ValueError as e:
+            return {"error": str(e)}
+        return ILIJSONResponse(result)
+
+
+@app.get("/ili/tracks")
+def tracks(
+    min_runs: int = Query(2, ge=2),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    dataset: str | None = _DATASET,
+):
+    """Anomaly identities chained across all runs (one entry per track)."""
+    ds, _ = datasets.current(dataset, lambda ds: ds.reuse_matched(_source(ds)))
+    return ILIJSONResponse(ds.get_tracks(min_runs=min_runs, limit=limit, offset=offset))
 
 
 @app.get("/ili/run-all")
-def run_all():
-    """Run the full pipeline: load, align, match, growth. Returns everything."""
+def run_all(dataset: str | None = _DATASET):
+    """Run the full pipeline: load, align, match, growth. Returns everything.
+
+    Stages whose inputs (file content, parameters) are unchanged are reused.
+    The pipeline runs on a copy of the dataset, which replaces the published
+    snapshot only once every stage is done; other requests keep reading the
+    previous snapshot meanwhile. Identical calls arriving while one is
+    running wait for it and share its result.
+    """
+    return ILIJSONResponse(flights.do("run-all", datasets.fingerprint(dataset), lambda: _run_all(dataset)))
+
+
+def _run_all(dataset: str | None) -> dict:
     _log("Pipeline started")
-    reset_dataset()
-    ds = get_dataset()
+    with datasets.use(dataset) as ds:
+        _log("Step 1/5: Loading data...")
+        load_result = ds.ensure_loaded(_source(ds))
+        _log(f"Step 1/5: Load complete ({list(load_result.get('runs', {}).keys())})")
+
+        _log("Step 2/5: Aligning welds...")
+        align_result = ds.ensure_aligned()
+        align_pairs = align_result.get("weld_alignment", [])
+        _log(f"Step 2/5: Align complete ({len(align_pairs)} pairs)")
+
+        _log("Step 3/5: Matching anomalies...")
+        match_result = ds.ensure_matched()
+        _log(f"Step 3/5: Match complete ({len(match_result)} pairs)")
+
+        _log("Step 4/5: Calculating growth...")
+        growth_result = ds.ensure_growth()
+        _log("Step 4/5: Growth complete")
+
+        _log("Step 5/5: Getting top growing anomalies...")
+        top_growing = ds.get_top_growth(top_n=30)
+        _log(f"Step 5/5: Pipeline complete ({len(top_growing)} top growing)")
+
+        return {
+            "load": load_result,
+            "alignment": align_result,
+            "matching": match_result,
+            "growth": growth_result,
+            "top_growing": top_growing,
+            "summary": ds.get_summary_stats(),
+        }
+
+
+# ---------------------------------------------------------------------------
+# Background pipeline jobs
+# ---------------------------------------------------------------------------
+
+jobs = JobManager()
+
+
+@app.post("/ili/jobs")
+def submit_job(
+    assignment: str = Query("greedy", pattern="^(greedy|optimal)$"),
+    workers: int = Query(1, ge=1, le=32),
+    dataset: str | None = _DATASET,
+):
+    """Start a full pipeline run (as /ili/run-all) in the background.
+
+    Returns the job at once (202); poll GET /ili/jobs/{id} for stage,
+    per-stage timings and percent, then fetch /ili/jobs/{id}/result.
+    """
+    job = _submit_pipeline(dataset, workers, assignment)
+    return ILIJSONResponse(job.describe(), status_code=202)
+
+
+@app.get("/ili/run-all/stream")
+def run_all_stream(
+    assignment: str = Query("greedy", pattern="^(greedy|optimal)$"),
+    workers: int = Query(1, ge=1, le=32),
+    dataset: str | None = _DATASET,
+):
+    """Run the full pipeline as a background job and stream its events (SSE).
+
+    Events: stage_start, stage_end (seconds, rows and the stage's result),
+    progress ticks from inside matching and growth, partial (top_growing,
+    summary) and finally done, failed or cancelled. Every event carries
+    elapsed_seconds; the first one names the job, which can be cancelled
+    with DELETE /ili/jobs/{id} or re-attached to at /ili/jobs/{id}/events.
+    """
+    job = _submit_pipeline(dataset, workers, assignment)
+    return _event_stream(job)
+
+
+def _submit_pipeline(dataset: str | None, workers: int, assignment: str):
+    def pipeline(job):
+        with datasets.use(dataset) as ds:
+            return run_pipeline(ds, _source(ds), job, workers=workers, assignment=assignment)
+
+    return jobs.submit(pipeline, dataset=dataset, assignment=assignment, workers=workers)
+
+
+def _event_stream(job, after: int = 0) -> StreamingResponse:
+    def events():
+        if after == 0:
+            yield encode_sse({"id": 0, "event": "job", "job": job.describe()})
+        for event in job.events(after):
+            yield encode_sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/ili/jobs")
+def list_jobs():
+    """Recent jobs, newest first."""
+    return ILIJSONResponse(jobs.describe())
+
+
+@app.get("/ili/jobs/{job_id}")
+def job_status(job_id: str):
+    """Status, current stage, per-stage timings and percent of a job."""
+    job = jobs.get(job_id)
+    if job is None:
+        return ILIJSONResponse({"error": f"Unknown job: {job_id}"}, status_code=404)
+    return ILIJSONResponse(job.describe())
 
-    _log("Step 1/5: Loading data...")
-    load_result = ds.load(_DEFAULT_FILE)
-    _log(f"Step 1/5: Load complete ({list(load_result.get('runs', {}).keys())})")
 
-    _log("Step 2/5: Aligning welds...")
-    align_result = ds.align_welds()
-    align_pairs = align_result.get("weld_alignment", [])
-    _log(f"Step 2/5: Align complete ({len(align_pairs)} pairs)")
+@app.get("/ili/jobs/{job_id}/events")
+def job_events(job_id: str, request: Request):
+    """A job's events as Server-Sent Events, resuming after a Last-Event-ID header."""
+    job = jobs.get(job_id)
+    if job is None:
+        return ILIJSONResponse({"error": f"Unknown job: {job_id}"}, status_code=404)
+    last = request.headers.get("last-event-id", "0")
+    return _event_stream(job, after=int(last) if last.isdigit() else 0)
 
-    _log("Step 3/5: Matching anomalies...")
-    match_result = ds.match_anomalies()
-    _log(f"Step 3/5: Match complete ({len(match_result)} pairs)")
 
-    _log("Step 4/5: Calculating growth...")
-    growth_result = ds.calculate_growth()
-    _log("Step 4/5: Growth complete")
+@app.get("/ili/jobs/{job_id}/result")
+def job_result(job_id: str):
+    """The run-all result of a finished job (409 while it is still running)."""
+    job = jobs.get(job_id)
+    if job is None:
+        return ILIJSONResponse({"error": f"Unknown job: {job_id}"}, status_code=404)
+    if job.status != "done":
+        return ILIJSONResponse({"error": f"Job is {job.status}", "job": job.describe()}, status_code=409)
+    return ILIJSONResponse(job.result)
 
-    _log("Step 5/5: Getting top growing anomalies...")
-    top_growing = ds.get_top_growth(top_n=30)
-    _log(f"Step 5/5: Pipeline complete ({len(top_growing)} top growing)")
 
-    return _clean({
-        "load": load_result,
-        "alignment": align_result,
-        "matching": match_result,
-        "growth": growth_result,
-        "top_growing": top_growing,
-        "summary": ds.get_summary_stats(),
-    })
+@app.delete("/ili/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """Cancel a queued or running job; its partial work is discarded."""
+    job = jobs.get(job_id)
+    if job is None:
+        return ILIJSONResponse({"error": f"Unknown job: {job_id}"}, status_code=404)
+    return ILIJSONResponse({"cancelled": job.cancel(), "job": job.describe()})
 
 
 # ---------------------------------------------------------------------------
@@ -189,27 +517,63 @@ def run_all():
 # ---------------------------------------------------------------------------
 
 @app.get("/ili/clusters")
-def clusters(year: int = Query(2022), epsilon: float = Query(50.0), min_samples: int = Query(3)):
-    """Identify spatial clusters of anomalies using DBSCAN.
+def clusters(
+    year: int | None = Query(None),
+    epsilon: float = Query(50.0, le=MAX_EPSILON),
+    min_samples: int = Query(3, ge=1),
+    epsilons: str | None = Query(None, description="Comma-separated epsilons, e.g. 5,10,25,50: cluster counts only"),
+    dataset: str | None = _DATASET,
+):
+    """Identify spatial clusters of anomalies (DBSCAN on the unrolled pipe wall).
     
     Args:
-        year: Inspection year to cluster (2007, 2015, or 2022)
-        epsilon: Maximum distance (ft) between anomalies in same cluster
+        year: Inspection year to cluster (default: latest run)
+        epsilon: Maximum distance (ft, axial and around the wall) between
+            neighbouring anomalies in a cluster, at most MAX_EPSILON
         min_samples: Minimum anomalies to form a cluster
+        epsilons: Instead of clusters, return the cluster count at each of
+            these epsilons (e.g. to label a slider)
         
     Returns:
-        Dict of clusters with stats: {cluster_0: {center_dist, member_count, avg_depth, ...}}
+        Dict of clusters with stats: {cluster_0: {center_dist, member_count, avg_depth, ...}},
+        or with epsilons: {year, min_samples, counts: [{epsilon, clusters, core_anomalies}]}
+
+    The run's cluster hierarchy is cached with the dataset, so changing
+    epsilon or min_samples cuts the cached tree instead of clustering again.
+    It answers epsilons up to HIERARCHY_REACH; larger ones are clustered
+    for this request only.
     """
-    ds = get_dataset()
-    if not ds.runs:
-        ds.load(_DEFAULT_FILE)
-    
+    ds, _ = datasets.current(dataset, lambda ds: ds.ensure_loaded(_source(ds)))
+    year = year if year is not None else _latest_year(ds)
+
     if year not in ds.anomalies:
         return {"error": f"No data for year {year}"}
-    
-    anoms = ds.anomalies[year]
-    result = cluster_anomalies(anoms, epsilon=epsilon, min_samples=min_samples)
-    return _clean(result)
+
+    def ensure_hierarchy(ds):
+        # Built (once) under the dataset lock, so the registry measures it
+        ds.ensure_loaded(_source(ds))
+        return ds.cluster_hierarchy(year, min_samples)
+
+    if epsilons:
+        try:
+            values = [float(e) for e in epsilons.split(",") if e.strip()]
+        except ValueError as e:
+            return {"error": f"Bad epsilons {epsilons!r}: {e}"}
+        reach = max(values, default=0.0)
+        if reach > MAX_EPSILON:
+            return {"error": f"Epsilons must be at most {MAX_EPSILON} ft"}
+        if reach > HIERARCHY_REACH:
+            hierarchy = ClusterHierarchy(ds.anomalies[year], ds.pipe_od_in(), reach=reach)
+        else:
+            ds, hierarchy = datasets.current(dataset, ensure_hierarchy)
+        return ILIJSONResponse({"year": year, "min_samples": min_samples, "counts": hierarchy.counts(values, min_samples)})
+
+    if epsilon > HIERARCHY_REACH:
+        result = cluster_anomalies(ds.anomalies[year], epsilon=epsilon, min_samples=min_samples, pipe_od_in=ds.pipe_od_in())
+        return ILIJSONResponse(result)
+    ds, hierarchy = datasets.current(dataset, ensure_hierarchy)
+    result = cluster_stats(ds.anomalies[year], hierarchy.labels(epsilon, min_samples))
+    return ILIJSONResponse(result)
 
 
 @app.get("/ili/predict-growth")
@@ -219,6 +583,7 @@ def predict_growth_endpoint(
     api_key: str = Query(""),
     model: str = Query("Qwen/Qwen2.5-14B-Instruct"),
     base_url: str = Query("https://api.featherless.ai/v1"),
+    dataset: str | None = _DATASET,
 ):
     """Predict future growth for top anomalies using LLM.
     
@@ -236,43 +601,35 @@ def predict_growth_endpoint(
     if len(parts) != 2:
         return {"error": f"Invalid pair format: {pair}"}
 
-    ds = get_dataset()
-    if not ds.runs:
-        ds.load(_DEFAULT_FILE)
-    y1, y2 = int(parts[0]), int(parts[1])
-    if y1 not in ds.references or y2 not in ds.references:
-        reset_dataset()
-        ds = get_dataset()
-        ds.load(_DEFAULT_FILE)
-    if not ds.correction_funcs:
-        ds.align_welds()
-    if not ds.matches:
-        ds.match_anomalies()
-    if not ds.growth:
-        ds.calculate_growth()
-    
-    key = (y1, y2)
-    if key not in ds.growth:
-        return {"error": f"No growth data for {pair}"}
-    
-    growth_df = ds.growth[key]
-    predictions = predict_growth(growth_df, pair, top_n, api_key, model, base_url)
-    return _clean(predictions)
+    def compute():
+        ds, _ = datasets.current(dataset, lambda ds: ds.reuse_growth(_source(ds)))
+        y1, y2 = int(parts[0]), int(parts[1])
+
+        key = (y1, y2)
+        if key not in ds.growth:
+            return {"error": f"No growth data for {pair}"}
+
+        growth_df = ds.growth[key]
+        return predict_growth(growth_df, pair, top_n, api_key, model, base_url)
+
+    key = (datasets.fingerprint(dataset), pair, top_n, api_key, model, base_url)
+    return ILIJSONResponse(flights.do("predict-growth", key, compute))
 
 
 @app.get("/ili/predict-new-anomalies")
 def predict_new_anomalies_endpoint(
-    year: int = Query(2022),
+    year: int | None = Query(None),
     start_dist: float = Query(0),
     end_dist: float = Query(5000),
     api_key: str = Query(""),
     model: str = Query("Qwen/Qwen2.5-14B-Instruct"),
     base_url: str = Query("https://api.featherless.ai/v1"),
+    dataset: str | None = _DATASET,
 ):
     """Predict locations where new corrosion is likely to form using LLM.
     
     Args:
-        year: Recent inspection year
+        year: Recent inspection year (default: latest run)
         start_dist, end_dist: Pipeline segment to analyze (ft)
         api_key: Featherless.ai API key
         model: LLM model name
@@ -281,17 +638,8 @@ def predict_new_anomalies_endpoint(
     Returns:
         List of predictions: [{predicted_dist, risk_score, explanation}]
     """
-    ds = get_dataset()
-    if not ds.runs:
-        ds.load(_DEFAULT_FILE)
-    # Ensure references/anomalies populated; reset and reload if incomplete
-    if year not in ds.references or year not in ds.anomalies:
-        reset_dataset()
-        ds = get_dataset()
-        ds.load(_DEFAULT_FILE)
-    if not ds.matches:
-        ds.align_welds()
-        ds.match_anomalies()
+    ds, _ = datasets.current(dataset, lambda ds: ds.reuse_matched(_source(ds)))
+    year = year if year is not None else _latest_year(ds)
 
     if year not in ds.anomalies:
         return {"error": f"No data for year {year}"}
@@ -308,13 +656,13 @@ def predict_new_anomalies_endpoint(
     anomalies = ds.anomalies[year]
     refs = ds.references.get(year, pd.DataFrame())
     welds = refs[refs["event"].str.lower().str.contains("weld")] if len(refs) > 0 else pd.DataFrame()
-    
+
     predictions = predict_new_anomalies(
         anomalies, new_anoms, welds,
         start_dist, end_dist,
         api_key, model, base_url
     )
-    return _clean(predictions)
+    return ILIJSONResponse(predictions)
 
 
 @app.get("/ili/risk-assessment")
@@ -322,6 +670,7 @@ def risk_assessment_endpoint(
     api_key: str = Query(""),
     model: str = Query("Qwen/Qwen2.5-14B-Instruct"),
     base_url: str = Query("https://api.featherless.ai/v1"),
+    dataset: str | None = _DATASET,
 ):
     """Generate pipeline risk assessment and action items using LLM.
     
@@ -333,17 +682,7 @@ def risk_assessment_endpoint(
     Returns:
         {overall_risk: str, risk_level: str, action_items: [str]}
     """
-    ds = get_dataset()
-    if not ds.runs:
-        ds.load(_DEFAULT_FILE)
-    if not ds.growth:
-        if not ds.references or 2022 not in ds.references:
-            reset_dataset()
-            ds = get_dataset()
-            ds.load(_DEFAULT_FILE)
-        ds.align_welds()
-        ds.match_anomalies()
-        ds.calculate_growth()
+    ds, _ = datasets.current(dataset, lambda ds: ds.reuse_growth(_source(ds)))
 
     summary = ds.get_summary_stats()
     growth_stats = {}
@@ -358,4 +697,4 @@ def risk_assessment_endpoint(
     
     top_growing = ds.get_top_growth(top_n=10)
     result = risk_assessment(summary, growth_stats, top_growing, api_key, model, base_url)
-    return _clean(result)
+    return ILIJSONResponse(result)
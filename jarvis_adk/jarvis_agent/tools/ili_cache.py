@@ -0,0 +1,239 @@
+"""On-disk columnar cache for normalised ILI workbooks.
+
+Parsing the Excel workbook with openpyxl dominates ``ILIDataset.load``.
+The normalised per-year frames (renamed columns, ``oclock_decimal`` and
+the reference/anomaly split) are written as Parquet next to the source
+file, keyed by the workbook's SHA-256, and memory-mapped on later loads.
+
+Layout::
+
+    <dir>/.<workbook name>.ili_cache/
+        manifest.json          # version, sha256, mtime_ns, size, years
+        <sha256>/summary.parquet
+        <sha256>/run_<year>.parquet
+
+The manifest's mtime/size let an unchanged file skip re-hashing; when
+they differ the file is re-hashed and the cache is only reused if the
+content hash still matches. A source may also be a directory of per-run
+tally files, fingerprinted over all of its (non-hidden) files.
+
+Runs can be written chunk by chunk (``store_chunks``): each chunk becomes
+a Parquet row group as it arrives, so streaming a large CSV export into
+the cache only holds one chunk in memory. Requires pyarrow; without it
+every call here is a no-op and loads fall back to parsing the source.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Bump when the normalised frame layout changes so old caches are ignored
+CACHE_VERSION = 1
+
+_MANIFEST = "manifest.json"
+_REF_COL = "__is_reference"
+_ANOM_COL = "__is_anomaly"
+
+
+def cache_dir(source: str | Path) -> Path:
+    """Cache directory for a workbook (hidden, alongside the source file)."""
+    source = Path(source)
+    return source.parent / f".{source.name}.ili_cache"
+
+
+def file_sha256(path: str | Path, chunk_size: int = 1 << 20) -> str:
+    """Content hash of a file (read in chunks) or of a directory's files."""
+    path = Path(path)
+    h = hashlib.sha256()
+    if path.is_dir():
+        for child in _source_files(path):
+            h.update(f"{child.name}\0{file_sha256(child, chunk_size)}\0".encode())
+        return h.hexdigest()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _source_files(directory: Path) -> list[Path]:
+    return sorted(p for p in directory.iterdir() if p.is_file() and not p.name.startswith("."))
+
+
+def _stat_signature(source: Path) -> tuple[int, int]:
+    """(mtime_ns, size) of a file, or newest mtime / total size of a directory."""
+    if source.is_dir():
+        stats = [p.stat() for p in _source_files(source)]
+        return max((st.st_mtime_ns for st in stats), default=0), sum(st.st_size for st in stats)
+    st = source.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_manifest(directory: Path) -> dict | None:
+    try:
+        with open(directory / _MANIFEST) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != CACHE_VERSION:
+        return None
+    return manifest
+
+
+def _write_manifest(directory: Path, manifest: dict):
+    tmp = directory / f"{_MANIFEST}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, directory / _MANIFEST)
+
+
+def source_fingerprint(source: str | Path) -> str:
+    """SHA-256 of the workbook, reusing the manifest's hash when mtime/size match."""
+    source = Path(source)
+    mtime_ns, size = _stat_signature(source)
+    manifest = _read_manifest(cache_dir(source))
+    if manifest and manifest.get("mtime_ns") == mtime_ns and manifest.get("size") == size:
+        return manifest["sha256"]
+    return file_sha256(source)
+
+
+def _restore_object_nans(df: pd.DataFrame):
+    """Arrow returns nulls in object columns as None; the Excel path has NaN."""
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+
+
+def load_cached(
+    source: str | Path, sha256: str,
+) -> tuple[pd.DataFrame, dict[int, tuple[pd.DataFrame, np.ndarray, np.ndarray]]] | None:
+    """Return (summary, {year: (frame, is_reference, is_anomaly)}) or None on a miss."""
+    if pq is None:
+        return None
+    source = Path(source)
+    directory = cache_dir(source)
+    manifest = _read_manifest(directory)
+    if not manifest or manifest.get("sha256") != sha256:
+        return None
+
+    data_dir = directory / sha256
+    try:
+        summary = pq.read_table(data_dir / "summary.parquet", memory_map=True).to_pandas()
+        runs = {}
+        for year in manifest["years"]:
+            df = pq.read_table(data_dir / f"run_{year}.parquet", memory_map=True).to_pandas()
+            is_ref = df.pop(_REF_COL).to_numpy(dtype=bool)
+            is_anom = df.pop(_ANOM_COL).to_numpy(dtype=bool)
+            _restore_object_nans(df)
+            runs[int(year)] = (df, is_ref, is_anom)
+    except (OSError, KeyError, ValueError):
+        return None
+
+    # Content unchanged but mtime moved (touch/copy): refresh so the next
+    # load can skip hashing again.
+    mtime_ns, size = _stat_signature(source)
+    if manifest.get("mtime_ns") != mtime_ns or manifest.get("size") != size:
+        manifest.update(mtime_ns=mtime_ns, size=size)
+        try:
+            _write_manifest(directory, manifest)
+        except OSError:
+            pass
+    return summary, runs
+
+
+def store(
+    source: str | Path,
+    sha256: str,
+    summary: pd.DataFrame,
+    runs: dict[int, tuple[pd.DataFrame, np.ndarray, np.ndarray]],
+) -> bool:
+    """Write the normalised frames for ``source``. Returns False if not cached.
+
+    Failures (no pyarrow, read-only directory, unconvertible column) are
+    swallowed: the cache is an optimisation, never a requirement.
+    """
+    return store_chunks(source, sha256, summary, {year: [parsed] for year, parsed in runs.items()})
+
+
+def store_chunks(
+    source: str | Path,
+    sha256: str,
+    summary: pd.DataFrame,
+    runs: dict[int, Iterable[tuple[pd.DataFrame, np.ndarray, np.ndarray]]],
+) -> bool:
+    """Like ``store`` but each run is an iterable of (chunk, is_reference, is_anomaly).
+
+    Chunks are consumed one at a time and appended as Parquet row groups;
+    later chunks are cast to the first chunk's schema. Runs are consumed
+    in ``runs`` order, so generators are only started when their turn comes.
+    """
+    if pq is None:
+        return False
+    source = Path(source)
+    directory = cache_dir(source)
+    try:
+        directory.mkdir(exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=directory, prefix=".tmp-"))
+        years = []
+        try:
+            summary.to_parquet(tmp_dir / "summary.parquet", engine="pyarrow", index=False)
+            for year, chunks in runs.items():
+                if _write_run(tmp_dir / f"run_{year}.parquet", chunks):
+                    years.append(int(year))
+
+            final = directory / sha256
+            if final.exists():
+                shutil.rmtree(final)
+            os.replace(tmp_dir, final)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        # Drop data for older source contents
+        for child in directory.iterdir():
+            if child.is_dir() and child.name != sha256 and not child.name.startswith(".tmp-"):
+                shutil.rmtree(child, ignore_errors=True)
+
+        mtime_ns, size = _stat_signature(source)
+        _write_manifest(directory, {
+            "version": CACHE_VERSION,
+            "sha256": sha256,
+            "mtime_ns": mtime_ns,
+            "size": size,
+            "years": sorted(years),
+        })
+    except Exception:
+        return False
+    return True
+
+
+def _write_run(path: Path, chunks: Iterable[tuple[pd.DataFrame, np.ndarray, np.ndarray]]) -> bool:
+    """Append each chunk as a row group. Returns False if there were no chunks."""
+    writer = None
+    try:
+        for df, is_ref, is_anom in chunks:
+            out = df.assign(**{_REF_COL: is_ref, _ANOM_COL: is_anom})
+            schema = writer.schema if writer is not None else None
+            table = pa.Table.from_pandas(out, schema=schema, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return writer is not None
@@ -1,94 +1,337 @@
 """Spatial clustering of anomalies for interaction analysis.
 
-Uses DBSCAN to identify clusters of closely-spaced anomalies that may
-interact and affect pipeline integrity.
+Identifies clusters of closely-spaced anomalies that may interact and
+affect pipeline integrity, with DBSCAN semantics: a core anomaly has at
+least ``min_samples`` anomalies (itself included) within ``epsilon``,
+clusters are core anomalies chained by ``epsilon`` links plus the border
+anomalies they reach, and clusters are numbered as scikit-learn's DBSCAN
+numbers them.
+
+Anomalies are placed on the unrolled pipe wall: axial log distance by
+circumferential arc length, both in feet. The arc between two o'clock
+positions is taken the shorter way round (the clock axis wraps at 12)
+on the mid-wall circumference, pi * (OD - wall thickness), using each
+row's ``pipe_od_in`` and ``wall_thickness_in`` where the run reports
+them. Anomalies without an o'clock position are compared axially only.
+
+Neighbours are found with a sweep over the anomalies sorted by
+distance: each one is only paired with those at most ``epsilon`` ahead
+of it, so the cost grows with the number of close pairs instead of n².
+
+``ClusterHierarchy`` does that search once per run, up to a ``reach``,
+and keeps a minimum spanning forest per ``min_samples``. Clusters at any
+epsilon up to ``reach`` are then a cut of the forest, and cluster counts
+for a whole list of epsilons come from two binary searches each.
 """
 
 from __future__ import annotations
 
 import math
-from typing import Any
+import threading
+from typing import Iterator, NamedTuple
 
 import numpy as np
 import pandas as pd
-from sklearn.cluster import DBSCAN
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
 
+from .ili_matching import float_column
 
-def cluster_anomalies(anomalies_df: pd.DataFrame, epsilon: float = 50.0, min_samples: int = 3) -> dict:
-    """Cluster anomalies using DBSCAN based on spatial proximity.
-    
-    Args:
-        anomalies_df: DataFrame with columns: log_dist_ft, oclock_decimal, depth_pct, length_in, width_in
-        epsilon: Maximum distance (ft) between anomalies in same cluster
-        min_samples: Minimum anomalies to form a cluster
-        
-    Returns:
-        Dict with cluster_id -> {center_dist, member_count, avg_depth, max_depth, total_length, risk_score, members}
+# Outside diameter assumed when neither the rows nor the caller give one
+DEFAULT_PIPE_OD_IN = 48.0
+
+# Anomalies swept per batch (bounds the candidate pair arrays)
+_BATCH_ROWS = 4096
+
+# Member distances listed per cluster
+_MEMBER_DISTANCES = 10
+
+# Largest epsilon (ft) a ClusterHierarchy answers unless built with more reach
+HIERARCHY_REACH = 200.0
+
+# Largest epsilon (ft) clusters may be asked for; neighbour pairs grow with it
+MAX_EPSILON = 1000.0
+
+
+class WallPositions(NamedTuple):
+    """Anomaly positions on the unrolled pipe wall (positional, NaN = unknown)."""
+
+    dist: np.ndarray    # axial log distance (ft)
+    clock: np.ndarray   # o'clock position (hours, 0-12)
+    circ: np.ndarray    # mid-wall circumference at the anomaly (ft)
+
+
+def wall_positions(df: pd.DataFrame, pipe_od_in: float | None = None) -> WallPositions:
+    """Axial distance, clock and circumference of every row, without a row loop.
+
+    Rows without ``pipe_od_in`` use the argument (for runs that do not
+    report it), then the column's median, then ``DEFAULT_PIPE_OD_IN``.
     """
-    if anomalies_df.empty:
+    od = float_column(df, "pipe_od_in")
+    fallback = pipe_od_in
+    if fallback is None or not math.isfinite(fallback):
+        known = od[~np.isnan(od)]
+        fallback = float(np.median(known)) if len(known) else DEFAULT_PIPE_OD_IN
+    od = np.where(np.isnan(od), fallback, od)
+    wall = np.nan_to_num(float_column(df, "wall_thickness_in"), nan=0.0)
+    return WallPositions(
+        dist=float_column(df, "log_dist_ft"),
+        clock=float_column(df, "oclock_decimal"),
+        circ=math.pi * np.clip(od - wall, 0.0, None) / 12.0,
+    )
+
+
+def wall_distance(pos: WallPositions, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Straight-line distance (ft) between anomalies i[k] and j[k] on the unrolled wall."""
+    axial = pos.dist[j] - pos.dist[i]
+    raw = np.abs(pos.clock[j] - pos.clock[i]) % 12.0
+    hours = np.minimum(raw, 12.0 - raw)
+    arc = np.where(np.isnan(hours), 0.0, hours / 12.0 * (pos.circ[i] + pos.circ[j]) / 2.0)
+    return np.hypot(axial, arc)
+
+
+def iter_neighbour_pairs(
+    pos: WallPositions, epsilon: float, batch_rows: int = _BATCH_ROWS,
+) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield ``(i, j, distance)`` for every pair within ``epsilon`` (each pair once).
+
+    Anomalies are swept in distance order; each is compared with the ones
+    up to ``epsilon`` further along, which bounds the axial gap, and the
+    wall distance is checked exactly on those. Rows without a distance
+    have no neighbours.
+    """
+    present = np.flatnonzero(~np.isnan(pos.dist))
+    order = present[np.argsort(pos.dist[present], kind="stable")]
+    ordered = pos.dist[order]
+    pad = abs(epsilon) * 1e-9 + 1e-9
+    n = len(order)
+    for start in range(0, n, batch_rows):
+        stop = min(start + batch_rows, n)
+        hi = np.searchsorted(ordered, ordered[start:stop] + epsilon + pad, side="right")
+        counts = hi - np.arange(start + 1, stop + 1)
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        a = np.repeat(np.arange(start, stop), counts)
+        b = a + 1 + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        i, j = order[a], order[b]
+        d = wall_distance(pos, i, j)
+        keep = d <= epsilon
+        yield i[keep], j[keep], d[keep]
+
+
+def dbscan_labels(n: int, i: np.ndarray, j: np.ndarray, min_samples: int) -> np.ndarray:
+    """DBSCAN cluster label per anomaly (-1 = noise) from its neighbour pairs.
+
+    Labels match scikit-learn's: clusters are numbered by their lowest
+    core anomaly, and a border anomaly within reach of several clusters
+    joins the lowest-numbered one.
+    """
+    counts = 1 + np.bincount(i, minlength=n) + np.bincount(j, minlength=n)
+    core = counts >= min_samples
+    if not core.any():
+        return np.full(n, -1, dtype=np.int64)
+    links = core[i] & core[j]
+    return _label_clusters(core, _components(n, i[links], j[links]), i, j)
+
+
+def _components(n: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    graph = coo_matrix((np.ones(len(i), dtype=np.int8), (i, j)), shape=(n, n))
+    return connected_components(graph, directed=False)[1]
+
+
+def _label_clusters(core: np.ndarray, component: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Number the core components by lowest core anomaly, then attach border anomalies.
+
+    ``i``/``j`` are neighbour pairs within epsilon (non-core ends join
+    the lowest-numbered cluster among their core neighbours).
+    """
+    n = len(core)
+    labels = np.full(n, -1, dtype=np.int64)
+    core_rows = np.flatnonzero(core)
+    if len(core_rows) == 0:
+        return labels
+    first = np.full(component.max() + 1, n, dtype=np.int64)
+    np.minimum.at(first, component[core_rows], core_rows)
+    used = np.flatnonzero(first < n)
+    number = np.full(len(first), -1, dtype=np.int64)
+    number[used[np.argsort(first[used], kind="stable")]] = np.arange(len(used))
+    labels[core_rows] = number[component[core_rows]]
+
+    # Border anomalies: lowest cluster among their core neighbours
+    none = np.iinfo(np.int64).max
+    border = np.full(n, none, dtype=np.int64)
+    for a, b in ((i, j), (j, i)):
+        reach = core[a] & ~core[b]
+        np.minimum.at(border, b[reach], labels[a[reach]])
+    reached = ~core & (border != none)
+    labels[reached] = border[reached]
+    return labels
+
+
+class ClusterHierarchy:
+    """DBSCAN clusters of one run at any epsilon up to ``reach``, from a cached forest.
+
+    Keeps the neighbour pairs within ``reach`` sorted by wall distance.
+    For each ``min_samples`` it builds (once) the core distance of every
+    anomaly, i.e. the distance to its ``min_samples``-th nearest anomaly
+    counting itself, and a minimum spanning forest over the mutual
+    reachability distance max(d(a, b), core(a), core(b)). DBSCAN's
+    clusters at epsilon are the components of that forest's edges of
+    weight <= epsilon (single linkage over the core anomalies), so a
+    query only takes a prefix of the sorted edges. Border anomalies are
+    attached from the prefix of pairs within epsilon.
+    """
+
+    def __init__(self, anomalies_df: pd.DataFrame, pipe_od_in: float | None = None,
+                 reach: float = HIERARCHY_REACH):
+        self.n = len(anomalies_df)
+        self.reach = reach
+        pairs = list(iter_neighbour_pairs(wall_positions(anomalies_df, pipe_od_in), reach))
+        i, j, d = (np.concatenate([p[k] for p in pairs]) if pairs else np.empty(0) for k in range(3))
+        order = np.argsort(d, kind="stable")
+        self.i, self.j, self.d = i[order].astype(np.int64), j[order].astype(np.int64), d[order]
+        # min_samples → (core distance, forest edges u, v, weights ascending)
+        self._forests: dict[int, tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self.i.nbytes + self.j.nbytes + self.d.nbytes + sum(
+            sum(a.nbytes for a in forest) for forest in self._forests.values()
+        )
+
+    def built(self) -> tuple[int, ...]:
+        """``min_samples`` values whose forest is already built."""
+        with self._lock:
+            return tuple(sorted(self._forests))
+
+    def _core_distance(self, min_samples: int) -> np.ndarray:
+        if min_samples <= 1:
+            return np.zeros(self.n)
+        ends = np.concatenate([self.i, self.j])
+        dists = np.concatenate([self.d, self.d])
+        order = np.lexsort((dists, ends))
+        ends, dists = ends[order], dists[order]
+        starts = np.searchsorted(ends, np.arange(self.n))
+        enough = np.bincount(ends, minlength=self.n) >= min_samples - 1
+        core = np.full(self.n, np.inf)  # not core at any epsilon within reach
+        core[enough] = dists[starts[enough] + min_samples - 2]
+        return core
+
+    def forest(self, min_samples: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(core distance, u, v, weight) of the mutual-reachability forest, weights ascending."""
+        with self._lock:
+            forest = self._forests.get(min_samples)
+            if forest is None:
+                core = self._core_distance(min_samples)
+                weight = np.maximum(self.d, np.maximum(core[self.i], core[self.j]))
+                keep = np.flatnonzero(weight <= self.reach)
+                ranked = keep[np.argsort(weight[keep], kind="stable")]
+                # minimum_spanning_tree drops zero weights, so it is given ranks, not distances
+                graph = coo_matrix(
+                    (np.arange(1, len(ranked) + 1, dtype=np.float64), (self.i[ranked], self.j[ranked])),
+                    shape=(self.n, self.n),
+                )
+                edges = ranked[np.sort(minimum_spanning_tree(graph).tocoo().data).astype(np.int64) - 1]
+                forest = self._forests[min_samples] = (core, self.i[edges], self.j[edges], weight[edges])
+            return forest
+
+    def _check(self, epsilon: float):
+        if epsilon > self.reach:
+            raise ValueError(f"epsilon {epsilon} is beyond this hierarchy's reach ({self.reach} ft)")
+
+    def labels(self, epsilon: float, min_samples: int) -> np.ndarray:
+        """``dbscan_labels`` at ``epsilon``, without another neighbour search."""
+        self._check(epsilon)
+        core_distance, u, v, weight = self.forest(min_samples)
+        core = core_distance <= epsilon
+        edges = np.searchsorted(weight, epsilon, side="right")
+        pairs = np.searchsorted(self.d, epsilon, side="right")
+        return _label_clusters(core, _components(self.n, u[:edges], v[:edges]), self.i[:pairs], self.j[:pairs])
+
+    def counts(self, epsilons, min_samples: int) -> list[dict]:
+        """Number of clusters (and core anomalies) at each epsilon.
+
+        Within a forest each edge joins two clusters, so the count is the
+        core anomalies minus the forest edges up to epsilon.
+        """
+        epsilons = [float(e) for e in epsilons]
+        for epsilon in epsilons:
+            self._check(epsilon)
+        core_distance, _, _, weight = self.forest(min_samples)
+        n_core = np.searchsorted(np.sort(core_distance), epsilons, side="right")
+        n_edges = np.searchsorted(weight, epsilons, side="right")
+        return [
+            {"epsilon": e, "clusters": int(c - k), "core_anomalies": int(c)}
+            for e, c, k in zip(epsilons, n_core, n_edges)
+        ]
+
+
+def cluster_stats(anomalies_df: pd.DataFrame, labels: np.ndarray) -> dict:
+    """Per-cluster statistics in one groupby pass, clusters in order of first member."""
+    members = np.flatnonzero(labels >= 0)
+    if len(members) == 0:
         return {}
-    
-    # Extract spatial features: distance and circumferential position
-    # Convert o'clock to radians for distance calculation (assuming 48" diameter pipe)
-    X = []
-    indices = []
-    for idx, row in anomalies_df.iterrows():
-        dist = row.get("log_dist_ft", 0)
-        oclock = row.get("oclock_decimal")
-        # If we have o'clock, include it in clustering (scaled to ft for comparable units)
-        # Approximate: 1 hour on clock = pi*diameter/12 ~ 4 inches ~ 0.33 ft for 48" pipe
-        if oclock is not None and not math.isnan(oclock):
-            circum_dist = oclock * 0.33  # Rough circumferential distance
-            X.append([dist, circum_dist])
-        else:
-            X.append([dist, 0])
-        indices.append(idx)
-    
-    X = np.array(X)
-    
-    # DBSCAN clustering
-    clustering = DBSCAN(eps=epsilon, min_samples=min_samples).fit(X)
-    labels = clustering.labels_
-    
-    # Group by cluster
-    clusters = {}
-    for i, label in enumerate(labels):
-        if label == -1:
-            continue  # Noise point
-        
-        if label not in clusters:
-            clusters[label] = []
-        clusters[label].append(indices[i])
-    
-    # Compute cluster statistics
+    frame = pd.DataFrame({
+        "label": labels[members],
+        "dist": float_column(anomalies_df, "log_dist_ft")[members],
+        "depth": float_column(anomalies_df, "depth_pct")[members],
+        "length": float_column(anomalies_df, "length_in")[members],
+    })
+    groups = frame.groupby("label", sort=False)
+    stats = groups.agg(
+        center=("dist", "mean"), start=("dist", "min"), end=("dist", "max"),
+        count=("dist", "size"), avg_depth=("depth", "mean"), max_depth=("depth", "max"),
+        total_length=("length", "sum"),
+    )
+    heads = groups["dist"].head(_MEMBER_DISTANCES)
+    first_members = frame.loc[heads.index].groupby("label", sort=False)["dist"].agg(list)
+
     result = {}
-    for cluster_id, member_indices in clusters.items():
-        members = anomalies_df.loc[member_indices]
-        
-        center_dist = float(members["log_dist_ft"].mean())
-        member_count = len(members)
-        
-        depths = members["depth_pct"].dropna()
-        avg_depth = float(depths.mean()) if len(depths) > 0 else 0
-        max_depth = float(depths.max()) if len(depths) > 0 else 0
-        
-        lengths = members["length_in"].dropna()
-        total_length = float(lengths.sum()) if len(lengths) > 0 else 0
-        
+    for label, center, start, end, count, avg_depth, max_depth, total_length in zip(
+        stats.index.tolist(), *(stats[c].tolist() for c in stats.columns),
+    ):
+        avg_depth = 0 if math.isnan(avg_depth) else avg_depth
+        max_depth = 0 if math.isnan(max_depth) else max_depth
         # Risk score: higher if many anomalies, deep, long total extent
-        risk_score = (member_count * 0.3) + (max_depth * 0.01) + (total_length * 0.02)
-        risk_score = min(risk_score, 10.0)  # Cap at 10
-        
-        result[f"cluster_{cluster_id}"] = {
-            "center_dist": round(center_dist, 1),
-            "span_start": round(float(members["log_dist_ft"].min()), 1),
-            "span_end": round(float(members["log_dist_ft"].max()), 1),
-            "member_count": member_count,
+        risk_score = min((count * 0.3) + (max_depth * 0.01) + (total_length * 0.02), 10.0)
+        result[f"cluster_{label}"] = {
+            "center_dist": round(center, 1),
+            "span_start": round(start, 1),
+            "span_end": round(end, 1),
+            "member_count": count,
             "avg_depth_pct": round(avg_depth, 1),
             "max_depth_pct": round(max_depth, 1),
             "total_length_in": round(total_length, 1),
             "risk_score": round(risk_score, 2),
-            "member_distances": [round(float(d), 1) for d in members["log_dist_ft"].tolist()[:10]],  # First 10
+            "member_distances": [round(d, 1) for d in first_members[label]],
         }
-    
     return result
+
+
+def cluster_anomalies(
+    anomalies_df: pd.DataFrame, epsilon: float = 50.0, min_samples: int = 3,
+    pipe_od_in: float | None = None,
+) -> dict:
+    """Cluster anomalies by their separation on the pipe wall (DBSCAN semantics).
+
+    Args:
+        anomalies_df: DataFrame with columns: log_dist_ft, oclock_decimal, depth_pct, length_in,
+            and optionally pipe_od_in and wall_thickness_in
+        epsilon: Maximum wall distance (ft) between neighbouring anomalies in a cluster
+        min_samples: Minimum anomalies (within epsilon of a core anomaly) to form a cluster
+        pipe_od_in: Outside diameter for rows that do not report one
+
+    Returns:
+        Dict with cluster_id -> {center_dist, span_start, span_end, member_count, avg_depth_pct,
+        max_depth_pct, total_length_in, risk_score, member_distances}
+    """
+    if anomalies_df.empty:
+        return {}
+    pos = wall_positions(anomalies_df, pipe_od_in)
+    pairs = list(iter_neighbour_pairs(pos, epsilon))
+    i = np.concatenate([p[0] for p in pairs]) if pairs else np.empty(0, dtype=np.int64)
+    j = np.concatenate([p[1] for p in pairs]) if pairs else np.empty(0, dtype=np.int64)
+    labels = dbscan_labels(len(anomalies_df), i, j, min_samples)
+    return cluster_stats(anomalies_df, labels)
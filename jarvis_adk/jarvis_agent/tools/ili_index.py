@@ -0,0 +1,215 @@
+"""Secondary indexes for filtering anomaly and growth tables.
+
+``TableIndex`` is built once per table (at load for anomaly runs, after
+growth for growth tables). It keeps a ``SortedIndex`` (row positions
+ordered by value) per filterable numeric column and row positions per
+severity label. A query then takes the most selective condition's rows
+by binary search and checks the remaining conditions on those rows only,
+instead of scanning every column of the whole table.
+
+``GrowthRanking`` keeps the growth tables' rows in descending order of
+each growth rate, per pair and across all pairs, so a top-N request is
+a slice of that order.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from .ili_matching import float_column
+
+# Rows checked per block when no condition is selective enough to start from
+_SCAN_BLOCK = 65536
+
+# Growth metric (``sort_by``) → rate column ranked by GrowthRanking
+GROWTH_METRICS = {
+    "depth": "depth_growth_pct_yr",
+    "length": "length_growth_in_yr",
+    "width": "width_growth_in_yr",
+}
+
+
+class SortedIndex:
+    """Row positions ordered by one numeric column (missing values left out)."""
+
+    __slots__ = ("values", "positions")
+
+    def __init__(self, values: np.ndarray):
+        present = np.flatnonzero(~np.isnan(values))
+        order = np.argsort(values[present], kind="stable")
+        self.positions = present[order]
+        self.values = values[present][order]
+
+    def between(self, lo: float | None = None, hi: float | None = None) -> np.ndarray:
+        """Positions (in value order) of rows with lo <= value <= hi."""
+        start = 0 if lo is None else np.searchsorted(self.values, lo, side="left")
+        stop = len(self.values) if hi is None else np.searchsorted(self.values, hi, side="right")
+        return self.positions[start:stop]
+
+
+def _in_range(values: np.ndarray, lo: float | None, hi: float | None) -> np.ndarray:
+    ok = ~np.isnan(values)
+    if lo is not None:
+        ok &= values >= lo
+    if hi is not None:
+        ok &= values <= hi
+    return ok
+
+
+class TableIndex:
+    """Indexes over one table for ``select``.
+
+    ``columns`` maps filter names ("dist", "joint", "depth", "clock") to
+    the table's column; absent columns are not indexed and their filters
+    are ignored, as a column scan would ignore them.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: dict[str, str]):
+        self.n_rows = len(df)
+        self.values: dict[str, np.ndarray] = {}
+        self.sorted: dict[str, SortedIndex] = {}
+        for name, column in columns.items():
+            if column in df.columns:
+                self.values[name] = float_column(df, column)
+                self.sorted[name] = SortedIndex(self.values[name])
+        # Severity: per-row label codes and, per label, its ascending row positions
+        self.severity_codes: np.ndarray | None = None
+        self.labels: dict[str, tuple[int, np.ndarray]] = {}
+        if "severity" in df.columns:
+            codes, uniques = pd.factorize(df["severity"])
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self.severity_codes = codes
+            self.labels = {str(label): (i, order[bounds[i]:bounds[i + 1]]) for i, label in enumerate(uniques)}
+
+    @property
+    def nbytes(self) -> int:
+        total = sum(v.nbytes for v in self.values.values())
+        total += sum(ix.values.nbytes + ix.positions.nbytes for ix in self.sorted.values())
+        if self.severity_codes is not None:
+            total += self.severity_codes.nbytes + sum(rows.nbytes for _, rows in self.labels.values())
+        return total
+
+    def _conditions(self, filters: dict) -> list[tuple[np.ndarray, Callable[[np.ndarray], np.ndarray]]]:
+        """(candidate rows, row predicate) for every filter that applies."""
+        conditions = []
+        for name, lo_key, hi_key in (
+            ("joint", "joint_min", "joint_max"),
+            ("dist", "dist_min", "dist_max"),
+            ("depth", "min_depth", "max_depth"),
+        ):
+            lo, hi = filters.get(lo_key), filters.get(hi_key)
+            if name in self.sorted and (lo is not None or hi is not None):
+                values = self.values[name]
+                conditions.append((
+                    self.sorted[name].between(lo, hi),
+                    lambda rows, v=values, lo=lo, hi=hi: _in_range(v[rows], lo, hi),
+                ))
+
+        lo, hi = filters.get("clock_min"), filters.get("clock_max")
+        if "clock" in self.sorted and (lo is not None or hi is not None):
+            clock, values = self.sorted["clock"], self.values["clock"]
+            if lo is not None and hi is not None and lo > hi:
+                # Sector across 12 o'clock, e.g. 11 -> 1
+                conditions.append((
+                    np.concatenate([clock.between(lo, None), clock.between(None, hi)]),
+                    lambda rows, lo=lo, hi=hi: _in_range(values[rows], lo, None) | _in_range(values[rows], None, hi),
+                ))
+            else:
+                conditions.append((
+                    clock.between(lo, hi),
+                    lambda rows, lo=lo, hi=hi: _in_range(values[rows], lo, hi),
+                ))
+
+        if "severity" in filters and self.severity_codes is not None:
+            code, rows = self.labels.get(str(filters["severity"]), (-2, np.empty(0, dtype=np.int64)))
+            conditions.append((rows, lambda r, code=code: self.severity_codes[r] == code))
+        return conditions
+
+    def select(self, filters: dict, limit: int | None = None) -> np.ndarray:
+        """Ascending positions of rows passing every filter, at most ``limit``.
+
+        Filters: joint_min/joint_max, dist_min/dist_max, min_depth/max_depth
+        (inclusive), clock_min/clock_max (o'clock sector, wrapping past 12
+        when clock_min > clock_max) and severity.
+        """
+        stop = self.n_rows if limit is None else min(limit, self.n_rows)
+        conditions = self._conditions(filters)
+        if not conditions:
+            return np.arange(stop)
+
+        conditions.sort(key=lambda c: len(c[0]))
+        (seed, _), rest = conditions[0], conditions[1:]
+        if limit is None or len(seed) <= _SCAN_BLOCK:
+            # Selective: check the other conditions on the smallest candidate set
+            rows = np.sort(seed)
+            for _, predicate in rest:
+                rows = rows[predicate(rows)]
+            return rows[:stop]
+
+        # Nothing selective: scan blocks in row order until ``limit`` rows pass
+        found = []
+        n_found = 0
+        for start in range(0, self.n_rows, _SCAN_BLOCK):
+            rows = np.arange(start, min(start + _SCAN_BLOCK, self.n_rows))
+            for _, predicate in conditions:
+                rows = rows[predicate(rows)]
+            found.append(rows)
+            n_found += len(rows)
+            if n_found >= stop:
+                break
+        return np.concatenate(found)[:stop] if found else np.empty(0, dtype=np.int64)
+
+
+def descending_order(values: np.ndarray) -> np.ndarray:
+    """Positions of the non-missing ``values``, largest first.
+
+    Ties come out as ``sort_values(ascending=False)`` orders them (pandas
+    reverses, quicksorts and reverses again), so a slice of this order is
+    row for row what sorting the table and taking its head gives.
+    """
+    present = np.flatnonzero(~np.isnan(values))[::-1]
+    return present[values[present].argsort(kind="quicksort")][::-1]
+
+
+class GrowthRanking:
+    """Rows of the growth tables in descending order of each growth rate.
+
+    Built once per growth run. ``by_pair[(pair, metric)]`` orders one
+    table's rows. The order across all pairs treats the tables as stacked
+    in dict order (as ``pd.concat`` would) and is stored as a table number
+    and a row position per ranked row.
+    """
+
+    __slots__ = ("pairs", "by_pair", "tables", "rows")
+
+    def __init__(self, tables: dict[Any, pd.DataFrame], metrics: dict[str, str] = GROWTH_METRICS):
+        self.pairs = list(tables)
+        self.by_pair: dict[tuple[Any, str], np.ndarray] = {}
+        self.tables: dict[str, np.ndarray] = {}
+        self.rows: dict[str, np.ndarray] = {}
+        starts = np.cumsum([0] + [len(df) for df in tables.values()])
+        for metric, column in metrics.items():
+            per_table = [float_column(df, column) for df in tables.values()]
+            for pair, values in zip(self.pairs, per_table):
+                self.by_pair[(pair, metric)] = descending_order(values)
+            stacked = descending_order(np.concatenate(per_table)) if per_table else np.empty(0, dtype=np.int64)
+            table = np.searchsorted(starts, stacked, side="right") - 1
+            self.tables[metric] = table
+            self.rows[metric] = stacked - starts[table]
+
+    @property
+    def nbytes(self) -> int:
+        return (sum(rows.nbytes for rows in self.by_pair.values())
+                + sum(t.nbytes + r.nbytes for t, r in zip(self.tables.values(), self.rows.values())))
+
+    def top(self, metric: str, n: int, pair: Any = None) -> np.ndarray | tuple[np.ndarray, np.ndarray]:
+        """Top ``n`` row positions of ``pair``'s table, or (table numbers, row positions) across all."""
+        if metric not in self.tables:
+            raise ValueError(f"Unknown growth metric {metric!r}; expected one of {sorted(self.tables)}")
+        if pair is not None:
+            return self.by_pair[(pair, metric)][:n]
+        return self.tables[metric][:n], self.rows[metric][:n]
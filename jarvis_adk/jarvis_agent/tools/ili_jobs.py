@@ -0,0 +1,284 @@
+"""Background jobs for long ILI pipeline runs.
+
+``JobManager.submit`` queues a function on a small thread pool and
+returns a ``Job`` straight away. The job records its current stage,
+how long each stage took and a percent estimate. ``run_pipeline`` feeds
+that estimate from inside the matching and growth loops through
+``ILIDataset.progress``. A client polls ``Job.describe()`` and fetches
+``Job.result`` once the status is "done".
+
+Each job also keeps an ordered event log (``Job.events``): stage start
+and end with elapsed time and row counts, throttled progress ticks,
+partial results as soon as a stage produces them, and a final
+done/failed/cancelled event. /ili/run-all/stream relays it as
+Server-Sent Events.
+
+Cancellation is cooperative. ``Job.cancel`` sets a flag, and the next
+progress report or stage boundary raises ``JobCancelled``. That abandons
+the dataset fork the job was working on (see ``DatasetRegistry.use``), so
+a cancelled run publishes nothing.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator
+
+# Pipeline runs executing at once; later submissions wait in the queue
+JOB_WORKERS = 2
+
+# Finished jobs kept for polling (oldest dropped first)
+JOB_HISTORY = 100
+
+# Share of a pipeline run's percent given to each stage
+PIPELINE_STAGES = (("load", 10), ("align", 10), ("match", 60), ("growth", 20))
+
+# Minimum seconds between two progress events of one stage
+PROGRESS_EVENT_INTERVAL = 0.25
+
+_FINISHED = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been asked to stop."""
+
+
+class Job:
+    """State of one background run, updated by its worker thread."""
+
+    def __init__(self, kind: str, stages: tuple[tuple[str, float], ...] = (), **info):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.info = info
+        self.status = "queued"  # queued → running → done | failed | cancelled
+        self.stage: str | None = None
+        self.result: Any = None
+        self.error: str | None = None
+        self.created = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+        self._weights = dict(stages)
+        self._stages: dict[str, dict] = {}
+        self._percent = 0.0
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._events: list[dict] = []
+        self._last_tick = 0.0
+
+    # --- called from the worker thread -------------------------------------
+
+    def start_stage(self, stage: str):
+        self.check_cancelled()
+        with self._lock:
+            self.stage = stage
+            self._stages[stage] = {"status": "running", "started": time.time(), "seconds": None, "percent": 0.0}
+            self._emit("stage_start", stage=stage)
+
+    def end_stage(self, stage: str, rows: int | None = None, result: Any = None):
+        """Mark ``stage`` done; ``rows`` and ``result`` go out with its stage_end event."""
+        with self._lock:
+            entry = self._stages[stage]
+            entry.update(status="done", seconds=round(time.time() - entry["started"], 3), percent=100.0)
+            if rows is not None:
+                entry["rows"] = rows
+            self._update_percent()
+            self._emit("stage_end", stage=stage, seconds=entry["seconds"], rows=rows, result=result)
+
+    def progress(self, stage: str, done: float, total: float):
+        """``ILIDataset.progress`` hook: ``done`` of ``total`` units of ``stage``."""
+        self.check_cancelled()
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is not None and total > 0:
+                # Parallel shards and the per-pair pass can report out of order
+                entry["percent"] = max(entry["percent"], round(min(done / total, 1.0) * 100, 1))
+                self._update_percent()
+                now = time.time()
+                if now - self._last_tick >= PROGRESS_EVENT_INTERVAL or done >= total:
+                    self._last_tick = now
+                    self._emit("progress", stage=stage, done=done, total=total,
+                               stage_percent=entry["percent"], percent=self._percent)
+
+    def publish(self, name: str, value: Any):
+        """Send a partial result (``name``: ``value``) to event listeners."""
+        with self._lock:
+            self._emit("partial", name=name, value=value)
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def _update_percent(self):
+        total = sum(self._weights.values()) or 1.0
+        done = sum(self._weights.get(name, 0) * entry["percent"] / 100 for name, entry in self._stages.items())
+        self._percent = max(self._percent, round(100 * done / total, 1))
+
+    def _emit(self, event: str, **data):
+        """Append an event to the log; call with ``_lock`` held."""
+        start = self.started or self.created
+        self._events.append({
+            "id": len(self._events) + 1,
+            "event": event,
+            "elapsed_seconds": round(time.time() - start, 3),
+            **data,
+        })
+        self._changed.notify_all()
+
+    def _finish(self, status: str):
+        with self._lock:
+            self.status = status
+            self.finished = time.time()
+            self._emit(status, status=status, error=self.error, percent=self.percent)
+
+    # --- called from request threads ----------------------------------------
+
+    def cancel(self) -> bool:
+        """Ask the job to stop. Returns False if it had already finished."""
+        if self.status in _FINISHED:
+            return False
+        self._cancel.set()
+        return True
+
+    def events(self, after: int = 0, heartbeat: float = 15.0) -> Iterator[dict | None]:
+        """Events with an id above ``after``, blocking for new ones until the job ends.
+
+        Yields ``None`` after ``heartbeat`` idle seconds, so a streaming
+        client can be sent a keep-alive.
+        """
+        seen = after
+        while True:
+            with self._changed:
+                if len(self._events) <= seen and self.finished is None:
+                    self._changed.wait(heartbeat)
+                new = self._events[seen:]
+                finished = self.finished is not None
+            seen += len(new)
+            if new:
+                yield from new
+            elif finished:
+                return
+            else:
+                yield None
+
+    @property
+    def percent(self) -> float:
+        return 100.0 if self.status == "done" else self._percent
+
+    def describe(self) -> dict:
+        with self._lock:
+            stages = {
+                name: {k: v for k, v in entry.items() if k != "started"}
+                for name, entry in self._stages.items()
+            }
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            **self.info,
+            "status": self.status,
+            "stage": self.stage,
+            "percent": self.percent,
+            "stages": stages,
+            "cancel_requested": self._cancel.is_set(),
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "elapsed_seconds": round((self.finished or time.time()) - (self.started or self.created), 3),
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Thread pool plus an id → Job table for polling."""
+
+    def __init__(self, max_workers: int = JOB_WORKERS, history: int = JOB_HISTORY):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ili-job")
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._history = history
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[[Job], Any], kind: str = "pipeline",
+               stages: tuple[tuple[str, float], ...] = PIPELINE_STAGES, **info) -> Job:
+        """Queue ``fn(job)``; its return value becomes ``job.result``."""
+        job = Job(kind, stages, **info)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def describe(self) -> list[dict]:
+        """Every tracked job, newest first."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.describe() for job in reversed(jobs)]
+
+    @staticmethod
+    def _run(job: Job, fn: Callable[[Job], Any]):
+        job.started = time.time()
+        status = "failed"
+        try:
+            job.check_cancelled()
+            job.status = "running"
+            job.result = fn(job)
+            status = "done"
+        except JobCancelled:
+            status = "cancelled"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            job._finish(status)
+
+    def _trim(self):
+        """Drop the oldest finished jobs beyond ``history``."""
+        finished = [k for k, job in self._jobs.items() if job.finished is not None]
+        for key in finished[:max(0, len(self._jobs) - self._history)]:
+            del self._jobs[key]
+
+
+def run_pipeline(ds, file_path: str, job: Job | None = None, workers: int = 1, top_n: int = 30, **match_params) -> dict:
+    """load → align → match → growth on ``ds`` (a writable dataset), as /ili/run-all returns it.
+
+    With ``job``, each stage's start/end and the progress reported from
+    inside matching and growth are recorded on it, and a cancel request
+    stops the run at the next report. Each stage's result (load summary,
+    alignment stats, ...) rides on its stage_end event, so a client can
+    render it while later stages run.
+    """
+    if job is not None:
+        ds.progress = job.progress
+    try:
+        results = {}
+        # stage, result key, step, rows produced
+        steps = (
+            ("load", "load", lambda: ds.ensure_loaded(file_path),
+             lambda: sum(len(df) for df in ds.runs.values())),
+            ("align", "alignment", lambda: ds.ensure_aligned(),
+             lambda: 0 if ds.aligned_welds is None else len(ds.aligned_welds)),
+            ("match", "matching", lambda: ds.ensure_matched(workers=workers, **match_params),
+             lambda: sum(len(df) for df in ds.matches.values())),
+            ("growth", "growth", lambda: ds.ensure_growth(workers=workers, **match_params),
+             lambda: sum(len(df) for df in ds.growth.values())),
+        )
+        for stage, name, step, rows in steps:
+            if job is not None:
+                job.start_stage(stage)
+            results[name] = step()
+            if job is not None:
+                job.end_stage(stage, rows=rows(), result=results[name])
+        results["top_growing"] = ds.get_top_growth(top_n=top_n)
+        results["summary"] = ds.get_summary_stats()
+        if job is not None:
+            job.publish("top_growing", results["top_growing"])
+            job.publish("summary", results["summary"])
+        return results
+    finally:
+        ds.progress = None
@@ -0,0 +1,142 @@
+"""JSON, NDJSON and CSV encoding for ILI API responses and exports.
+
+DataFrames are encoded column by column straight to JSON bytes: each
+column becomes a list of encoded values (numeric columns in one call
+over the whole array), and rows are joined from those fragments, so no
+per-row dicts are built. NaN and ±Inf become ``null`` in the encoder
+itself. Frames are processed ``JSON_CHUNK_ROWS`` rows at a time, which
+bounds the working memory per chunk; the ``iter_*`` generators hand
+each chunk out as soon as it is encoded, for streaming exports.
+
+Uses orjson when installed; otherwise falls back to the standard
+library (same output, slower).
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Rows encoded per chunk by iter_json_array
+JSON_CHUNK_ROWS = 2048
+
+_NULL = b"null"
+
+
+def _default(obj):
+    """Encode values orjson/json do not know natively."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if pd.api.types.is_scalar(obj) and pd.isna(obj):
+        return None
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _finite_or_none(obj):
+    """Stdlib fallback: NaN/Inf → None, recursively (orjson does this itself)."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite_or_none(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite_or_none(v) for v in obj]
+    return obj
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialise ``obj`` to JSON bytes with NaN/Inf as null and non-str keys as strings."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        _finite_or_none(obj), default=_default, separators=(",", ":"), allow_nan=False,
+    ).encode()
+
+
+def _column_fragments(s: pd.Series) -> list[bytes]:
+    """Encoded JSON value for every element of ``s``."""
+    if len(s) == 0:
+        return []
+    dtype = s.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in "fiub":
+        values = np.ascontiguousarray(s.to_numpy())
+        if orjson is not None:
+            # Numbers never contain commas, so the array encoding splits cleanly
+            return orjson.dumps(values, option=orjson.OPT_SERIALIZE_NUMPY)[1:-1].split(b",")
+        return [dumps(v) for v in values.tolist()]
+    values = s.to_numpy(dtype=object, na_value=None)
+    return [dumps(v) for v in values.tolist()]
+
+
+def _iter_row_chunks(df: pd.DataFrame, omit_null: Iterable[str], chunk_rows: int) -> Iterator[list[bytes]]:
+    """Encoded JSON objects for ``df``'s rows, ``chunk_rows`` at a time."""
+    keys = [dumps(str(c)) + b":" for c in df.columns]
+    omit_null = set(omit_null)
+    omit = [c in omit_null for c in df.columns]
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        columns = []
+        for (_, s), key, skip_null in zip(chunk.items(), keys, omit):
+            frags = _column_fragments(s)
+            columns.append([b"" if skip_null and f == _NULL else key + f for f in frags])
+        if any(omit):
+            yield [b"{" + b",".join([p for p in parts if p]) + b"}" for parts in zip(*columns)]
+        else:
+            yield [b"{" + b",".join(parts) + b"}" for parts in zip(*columns)]
+
+
+def iter_json_array(
+    df: pd.DataFrame, omit_null: Iterable[str] = (), chunk_rows: int = JSON_CHUNK_ROWS,
+) -> Iterator[bytes]:
+    """Yield ``df`` as a JSON array of row objects, in chunks of bytes.
+
+    Keys in ``omit_null`` are left out of a row when its value is null
+    (instead of being written as ``null``).
+    """
+    yield b"["
+    for i, rows in enumerate(_iter_row_chunks(df, omit_null, chunk_rows)):
+        yield (b"," if i else b"") + b",".join(rows)
+    yield b"]"
+
+
+def iter_ndjson(
+    df: pd.DataFrame, omit_null: Iterable[str] = (), chunk_rows: int = JSON_CHUNK_ROWS,
+) -> Iterator[bytes]:
+    """Yield ``df`` as newline-delimited JSON (one row object per line), in chunks."""
+    for rows in _iter_row_chunks(df, omit_null, chunk_rows):
+        yield b"\n".join(rows) + b"\n"
+
+
+def iter_csv(df: pd.DataFrame, chunk_rows: int = JSON_CHUNK_ROWS) -> Iterator[bytes]:
+    """Yield ``df`` as CSV (header first, missing values empty), in chunks."""
+    if len(df) == 0:
+        yield df.to_csv(index=False).encode()
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        yield chunk.to_csv(index=False, header=start == 0, lineterminator="\n").encode()
+
+
+def encode_records(df: pd.DataFrame, omit_null: Iterable[str] = ()) -> bytes:
+    """``df`` as a JSON array of row objects (``to_dict(orient="records")`` layout)."""
+    return b"".join(iter_json_array(df, omit_null))
+
+
+def encode_sse(event: dict | None) -> bytes:
+    """One Server-Sent Events message for a job event (``None``: a keep-alive comment)."""
+    if event is None:
+        return b": keep-alive\n\n"
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event["id"], event["event"].encode(), dumps(event))
@@ -0,0 +1,428 @@
+"""Vectorized anomaly matching engine for ILI run pairs.
+
+Sorts the earlier run by log distance so each later-run anomaly only
+looks at the earlier-run anomalies inside its ``distance_tol`` window.
+Candidate scores are computed in NumPy batches with the same distance,
+clock and depth weights used by the original row-by-row matcher, and
+the greedy one-to-one assignment keeps its semantics (later-run rows in
+order, best unused earlier-run candidate, first row wins ties).
+
+An optional globally optimal mode solves the same candidate graph as a
+min-cost bipartite assignment, one girth-weld-bounded block at a time.
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, NamedTuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+# Minimum score for a candidate to be accepted as a match
+MIN_MATCH_SCORE = 0.3
+
+# Score thresholds for the confidence labels
+HIGH_CONFIDENCE = 0.7
+MEDIUM_CONFIDENCE = 0.5
+
+# Later-run rows scored per batch (bounds the candidate edge arrays)
+_BATCH_ROWS = 4096
+
+# Columns copied from each side into the matches DataFrame (prefix y1_/y2_)
+_DETAIL_COLUMNS = [
+    ("joint", "joint_number"),
+    ("depth_pct", "depth_pct"),
+    ("length_in", "length_in"),
+    ("width_in", "width_in"),
+    ("clock", "oclock_decimal"),
+    ("event", "event"),
+    ("id_od", "id_od"),
+]
+
+
+class RunArrays(NamedTuple):
+    """Compact per-run arrays used by the matcher."""
+
+    dist: np.ndarray         # float64 distance (log or corrected)
+    clock: np.ndarray        # float64 decimal o'clock, NaN when unparseable
+    clock_known: np.ndarray  # bool, False where there is no clock value at all
+    depth: np.ndarray        # float64 depth %, NaN when missing
+
+
+def float_column(df: pd.DataFrame, name: str) -> np.ndarray:
+    """Column as float64 (NaN for missing or non-numeric values, all-NaN if absent)."""
+    if name not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def run_arrays(df: pd.DataFrame, dist: np.ndarray | None = None) -> RunArrays:
+    """Extract the matcher inputs from an anomaly DataFrame.
+
+    Args:
+        df: Metal-loss anomalies with log_dist_ft, oclock_decimal, depth_pct.
+        dist: Optional distances to use instead of log_dist_ft (e.g. corrected).
+    """
+    if dist is None:
+        dist = float_column(df, "log_dist_ft")
+    if "oclock_decimal" in df.columns:
+        col = df["oclock_decimal"]
+        clock = float_column(df, "oclock_decimal")
+        # A float NaN still counts as "known" (it scores NaN and never wins);
+        # only an explicit None means the run has no clock for that row.
+        if col.dtype == object:
+            clock_known = np.fromiter((v is not None for v in col), dtype=bool, count=len(col))
+        else:
+            clock_known = np.ones(len(df), dtype=bool)
+    else:
+        clock = np.full(len(df), np.nan)
+        clock_known = np.zeros(len(df), dtype=bool)
+    return RunArrays(
+        dist=np.asarray(dist, dtype=np.float64),
+        clock=clock,
+        clock_known=clock_known,
+        depth=float_column(df, "depth_pct"),
+    )
+
+
+def score_edges(
+    a1: RunArrays, a2: RunArrays, i1: np.ndarray, i2: np.ndarray,
+    distance_tol: float, clock_tol: float,
+    depth_weight: float, dist_weight: float, clock_weight: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Score candidate pairs (i1[k], i2[k]).
+
+    Returns:
+        (score, keep): float64 scores and a mask of pairs that pass the
+        distance and clock gates.
+    """
+    dist_diff = np.abs(a2.dist[i2] - a1.dist[i1])
+
+    both_clock = a1.clock_known[i1] & a2.clock_known[i2]
+    raw = np.abs(a1.clock[i1] - a2.clock[i2]) % 12.0
+    clock_diff = np.where(both_clock, np.minimum(raw, 12.0 - raw), 0.0)
+
+    keep = (dist_diff <= distance_tol) & ~(both_clock & (clock_diff > clock_tol))
+
+    dist_score = 1.0 - (dist_diff / distance_tol)
+    clock_score = np.where(both_clock, 1.0 - (clock_diff / clock_tol), 0.5)
+
+    d1 = a1.depth[i1]
+    d2 = a2.depth[i2]
+    has_depth = ~np.isnan(d1) & ~np.isnan(d2) & (d1 > 0)
+    ratio = np.divide(d2, d1, out=np.ones_like(d2), where=has_depth)
+    # Depth should grow or stay same; penalize shrinkage heavily
+    depth_score = np.where(
+        ratio >= 1.0,
+        np.fmax(0.0, 1.0 - np.abs(ratio - 1.0) / 2.0),
+        np.fmax(0.0, ratio - 0.3),  # Mild shrinkage ok (measurement error)
+    )
+    depth_score = np.where(has_depth, depth_score, 0.5)
+
+    score = (
+        dist_weight * dist_score
+        + clock_weight * clock_score
+        + depth_weight * depth_score
+    )
+    return score, keep
+
+
+def window_pairs(
+    a1: RunArrays, a2: RunArrays, distance_tol: float,
+    start: int = 0, stop: int | None = None,
+    order1: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Candidate (i2, i1) pairs whose distances may lie within ``distance_tol``.
+
+    Covers later-run rows ``start:stop`` in order. The window is padded so
+    searchsorted never drops a boundary candidate to rounding; the exact
+    ``|diff| <= tol`` gate is applied by score_edges.
+    """
+    if order1 is None:
+        order1 = np.argsort(a1.dist, kind="stable")
+    sorted1 = a1.dist[order1]
+    stop = len(a2.dist) if stop is None else stop
+    pad = abs(distance_tol) * 1e-9 + 1e-9
+
+    d2 = a2.dist[start:stop]
+    lo = np.searchsorted(sorted1, d2 - distance_tol - pad, side="left")
+    hi = np.searchsorted(sorted1, d2 + distance_tol + pad, side="right")
+    counts = np.where(np.isnan(d2), 0, hi - lo)
+    total = int(counts.sum())
+
+    i2 = np.repeat(np.arange(start, stop), counts)
+    within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    i1 = order1[np.repeat(lo, counts) + within]
+    return i2, i1
+
+
+def rank_edges(
+    i2: np.ndarray, i1: np.ndarray, score: np.ndarray, keep: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Drop gated-out edges and order the rest for assignment.
+
+    Edges are grouped by ``i2`` ascending and, within a group, ordered best
+    first (score descending, then earlier position in run 1), which is the
+    order the original row loop preferred them in.
+    """
+    # The row loop started from best_score = -1 and used strict '>',
+    # so NaN scores and scores <= -1 could never be selected.
+    keep = keep & (score > -1)
+    i1, i2, score = i1[keep], i2[keep], score[keep]
+    order = np.lexsort((i1, -score, i2))
+    return i2[order], i1[order], score[order]
+
+
+def iter_candidate_edges(
+    a1: RunArrays, a2: RunArrays,
+    distance_tol: float, clock_tol: float,
+    depth_weight: float, dist_weight: float, clock_weight: float,
+    batch_rows: int = _BATCH_ROWS,
+) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield gated, scored candidate edges in later-run row order.
+
+    Each batch is a tuple ``(i2, i1, score)`` of positional indices into
+    the later and earlier runs, ordered as described in rank_edges.
+    """
+    order1 = np.argsort(a1.dist, kind="stable")
+    n2 = len(a2.dist)
+
+    for start in range(0, n2, batch_rows):
+        stop = min(start + batch_rows, n2)
+        i2, i1 = window_pairs(a1, a2, distance_tol, start, stop, order1)
+        if len(i2) == 0:
+            continue
+        score, keep = score_edges(
+            a1, a2, i1, i2, distance_tol, clock_tol,
+            depth_weight, dist_weight, clock_weight,
+        )
+        yield rank_edges(i2, i1, score, keep)
+
+
+def greedy_assign(
+    edges: Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    n1: int,
+    min_score: float = MIN_MATCH_SCORE,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Greedy one-to-one assignment over edges from iter_candidate_edges.
+
+    For each later-run row in order, takes its best candidate that has
+    not been used yet and accepts it if the score exceeds ``min_score``.
+
+    Returns:
+        (i2, i1, score) arrays of accepted matches in later-run order.
+    """
+    used1 = np.zeros(n1, dtype=bool)
+    out2: list[int] = []
+    out1: list[int] = []
+    out_score: list[float] = []
+
+    for i2, i1, score in edges:
+        i2_list = i2.tolist()
+        i1_list = i1.tolist()
+        score_list = score.tolist()
+        k = 0
+        n = len(i2_list)
+        while k < n:
+            row2 = i2_list[k]
+            # Walk this row's candidates best-first until an unused one
+            while k < n and i2_list[k] == row2 and used1[i1_list[k]]:
+                k += 1
+            if k < n and i2_list[k] == row2:
+                if score_list[k] > min_score:
+                    used1[i1_list[k]] = True
+                    out2.append(row2)
+                    out1.append(i1_list[k])
+                    out_score.append(score_list[k])
+            while k < n and i2_list[k] == row2:
+                k += 1
+
+    return (
+        np.asarray(out2, dtype=np.int64),
+        np.asarray(out1, dtype=np.int64),
+        np.asarray(out_score, dtype=np.float64),
+    )
+
+
+def weld_blocks(
+    seg1: np.ndarray, seg2: np.ndarray, i1: np.ndarray, i2: np.ndarray,
+) -> np.ndarray:
+    """Block id for each candidate edge from girth-weld segment ids.
+
+    ``seg1``/``seg2`` give the weld segment of every anomaly in each run.
+    Adjacent segments are merged into one block whenever an edge spans
+    them, so no candidate edge ever crosses a block boundary.
+    """
+    s1 = seg1[i1]
+    s2 = seg2[i2]
+    lo = np.minimum(s1, s2)
+    hi = np.maximum(s1, s2)
+    n_seg = int(max(seg1.max(initial=0), seg2.max(initial=0))) + 1
+
+    # cover[b] > 0 means the boundary between segment b and b + 1 is spanned
+    cover = np.zeros(n_seg + 1, dtype=np.int64)
+    np.add.at(cover, lo, 1)
+    np.add.at(cover, hi, -1)
+    spanned = np.cumsum(cover)[:n_seg - 1] > 0
+    block_of_seg = np.concatenate([[0], np.cumsum(~spanned)])
+    return block_of_seg[lo]
+
+
+def optimal_assign(
+    edges: Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    seg1: np.ndarray,
+    seg2: np.ndarray,
+    min_score: float = MIN_MATCH_SCORE,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Globally optimal one-to-one assignment over candidate edges.
+
+    Maximises the total of ``score - min_score`` over accepted matches.
+    Each later-run row gets a private "unmatched" column worth
+    ``min_score``, so every block has a full matching and leaving a row
+    unmatched is always allowed. Blocks are solved independently with a
+    sparse Jonker-Volgenant assignment, so time and memory stay close to
+    linear in the number of candidate edges.
+
+    Returns:
+        (i2, i1, score) arrays of accepted matches in later-run order.
+    """
+    batches = list(edges)
+    empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))
+    if not batches:
+        return empty
+    i2 = np.concatenate([b[0] for b in batches])
+    i1 = np.concatenate([b[1] for b in batches])
+    score = np.concatenate([b[2] for b in batches])
+    keep = score > min_score
+    i2, i1, score = i2[keep], i1[keep], score[keep]
+    if len(i2) == 0:
+        return empty
+
+    block = weld_blocks(seg1, seg2, i1, i2)
+    order = np.argsort(block, kind="stable")
+    i2, i1, score, block = i2[order], i1[order], score[order], block[order]
+    bounds = np.flatnonzero(np.diff(block)) + 1
+    starts = np.concatenate([[0], bounds])
+    stops = np.concatenate([bounds, [len(block)]])
+
+    keep = np.zeros(len(block), dtype=bool)
+    for start, stop in zip(starts.tolist(), stops.tolist()):
+        if stop - start == 1:
+            keep[start] = True
+            continue
+        rows, row_pos = np.unique(i2[start:stop], return_inverse=True)
+        cols, col_pos = np.unique(i1[start:stop], return_inverse=True)
+        n_rows, n_cols = len(rows), len(cols)
+        graph = csr_matrix(
+            (
+                np.concatenate([score[start:stop], np.full(n_rows, min_score)]),
+                (
+                    np.concatenate([row_pos, np.arange(n_rows)]),
+                    np.concatenate([col_pos, n_cols + np.arange(n_rows)]),
+                ),
+            ),
+            shape=(n_rows, n_cols + n_rows),
+        )
+        row_ind, col_ind = min_weight_full_bipartite_matching(graph, maximize=True)
+        real = col_ind < n_cols
+        chosen = row_ind[real] * n_cols + col_ind[real]
+        keep[start:stop] = np.isin(row_pos * n_cols + col_pos, chosen)
+
+    i2, i1, score = i2[keep], i1[keep], score[keep]
+    order = np.argsort(i2, kind="stable")
+    return i2[order], i1[order], score[order]
+
+
+def assign_arrays(
+    a1: RunArrays, a2: RunArrays, seg1: np.ndarray, seg2: np.ndarray,
+    distance_tol: float, clock_tol: float,
+    depth_weight: float, dist_weight: float, clock_weight: float,
+    assignment: str = "greedy",
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Candidate generation plus assignment on plain arrays.
+
+    Module-level and DataFrame-free so it can run in a worker process.
+    ``seg1``/``seg2`` are only used by the optimal assignment.
+    """
+    edges = iter_candidate_edges(
+        a1, a2, distance_tol, clock_tol,
+        depth_weight, dist_weight, clock_weight,
+    )
+    if assignment == "optimal":
+        return optimal_assign(edges, seg1, seg2)
+    return greedy_assign(edges, len(a1.dist))
+
+
+def subset_arrays(a: RunArrays, rows: np.ndarray) -> RunArrays:
+    """RunArrays restricted to ``rows`` (ascending positions)."""
+    return RunArrays(*(field[rows] for field in a))
+
+
+def shard_rows(
+    a1: RunArrays, a2: RunArrays, seg1: np.ndarray, seg2: np.ndarray,
+    distance_tol: float, n_shards: int,
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Split a pair into independent shards of girth-weld blocks.
+
+    Blocks come from weld_blocks over the (padded) distance windows, so no
+    candidate edge crosses a shard and each shard can be assigned on its
+    own with the same result as the whole pair. Consecutive blocks are
+    packed into at most ``n_shards`` shards of similar edge counts.
+
+    Returns:
+        [(rows1, rows2), ...] ascending positions in each run, in distance
+        order. Rows without any candidate are left out (they cannot match).
+    """
+    i2, i1 = window_pairs(a1, a2, distance_tol)
+    if len(i2) == 0:
+        return []
+    block = weld_blocks(seg1, seg2, i1, i2)
+    counts = np.bincount(block)
+    cum = np.cumsum(counts)
+    shard_of_block = np.minimum((cum - counts) * n_shards // cum[-1], n_shards - 1)
+    shard = shard_of_block[block]
+
+    shards = []
+    for k in np.unique(shard).tolist():
+        in_shard = shard == k
+        shards.append((np.unique(i1[in_shard]), np.unique(i2[in_shard])))
+    return shards
+
+
+def confidence_labels(score: np.ndarray) -> np.ndarray:
+    """Map match scores to high / medium / low confidence labels."""
+    return np.where(
+        score > HIGH_CONFIDENCE, "high",
+        np.where(score > MEDIUM_CONFIDENCE, "medium", "low"),
+    ).astype(object)
+
+
+def _take(df: pd.DataFrame, name: str, pos: np.ndarray) -> pd.Series | list:
+    if name not in df.columns:
+        return [None] * len(pos)
+    return df[name].iloc[pos].reset_index(drop=True)
+
+
+def build_matches_frame(
+    ml1: pd.DataFrame, ml2: pd.DataFrame, corrected_dist: np.ndarray,
+    i1: np.ndarray, i2: np.ndarray, score: np.ndarray,
+) -> pd.DataFrame:
+    """Build the matches DataFrame for accepted (i1, i2) positional pairs."""
+    if len(i2) == 0:
+        return pd.DataFrame()
+
+    data: dict = {
+        "y1_idx": ml1.index.to_numpy()[i1],
+        "y2_idx": ml2.index.to_numpy()[i2],
+        "y1_dist": float_column(ml1, "log_dist_ft")[i1],
+        "y2_dist": float_column(ml2, "log_dist_ft")[i2],
+        "y2_corrected_dist": np.asarray(corrected_dist, dtype=np.float64)[i2],
+    }
+    for suffix, column in _DETAIL_COLUMNS:
+        data[f"y1_{suffix}"] = _take(ml1, column, i1)
+        data[f"y2_{suffix}"] = _take(ml2, column, i2)
+    data["score"] = [round(s, 3) for s in score.tolist()]
+    data["confidence"] = confidence_labels(score)
+    return pd.DataFrame(data)
@@ -13,7 +13,7 @@ import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 
-from .ili_processing import get_dataset, reset_dataset
+from .ili_processing import ILIDataset
 from .ili_ml_matching import extract_features, save_model
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
@@ -30,8 +30,8 @@ def train_matching_model(test_size: float = 0.2, random_state: int = 42) -> dict
     Returns:
         Training results: {accuracy, precision, recall, model_path}
     """
-    reset_dataset()
-    ds = get_dataset()
+    # A private dataset, so training never touches the shared ones
+    ds = ILIDataset()
     ds.load(str(ILIData_PATH))
     ds.align_welds()
     ds.match_anomalies()
@@ -1,19 +1,58 @@
 """Core ILI data alignment engine.
 
-Ingests ILI Excel data (2007, 2015, 2022), normalises columns,
-aligns reference points (girth welds), corrects odometer drift,
-matches anomalies across runs, and computes corrosion growth rates.
+Ingests ILI Excel data (one sheet per inspection year, any number of
+runs), normalises columns, aligns reference points (girth welds) between
+adjacent runs, corrects odometer drift, matches anomalies across runs,
+chains the matches into per-anomaly tracks, and computes corrosion growth
+rates.
 """
 
 from __future__ import annotations
 
+import copy
+import hashlib
+import inspect
+import json
 import math
+import re
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator
 
 import pandas as pd
 import numpy as np
-from scipy.interpolate import interp1d
+
+from . import ili_cache
+from .ili_clustering import ClusterHierarchy
+from .ili_correction import Correction
+from .ili_index import GROWTH_METRICS, GrowthRanking, TableIndex
+from .ili_profile import ProfilePyramid
+from .ili_registry import DatasetRegistry, StaleSnapshotError
+from .ili_matching import (
+    assign_arrays,
+    build_matches_frame,
+    float_column,
+    greedy_assign,
+    iter_candidate_edges,
+    optimal_assign,
+    rank_edges,
+    run_arrays,
+    score_edges,
+    shard_rows,
+    subset_arrays,
+    window_pairs,
+)
+
+# Assignment strategies accepted by ILIDataset.match_anomalies
+ASSIGNMENT_MODES = ("greedy", "optimal")
+
+# Match results kept per dataset for tolerance sweeps (LRU-evicted)
+MATCH_CACHE_SIZE = 64
+
+# Default severity bins: (label, depth growth %/yr it must exceed), highest first
+SEVERITY_THRESHOLDS = (("critical", 3.0), ("high", 2.0), ("moderate", 1.0))
 
 # ---------------------------------------------------------------------------
 # Column normalisation maps (each year → canonical name)
@@ -118,10 +157,75 @@ _COL_MAP_2022 = {
 
 _YEAR_COL_MAPS = {2007: _COL_MAP_2007, 2015: _COL_MAP_2015, 2022: _COL_MAP_2022}
 
+# Runs from other years: accept any header spelling seen in the known years
+_DEFAULT_COL_MAP = {k: v for col_map in _YEAR_COL_MAPS.values() for k, v in col_map.items()}
+
+
+def _is_run_sheet(name) -> bool:
+    """Workbook sheets named after an inspection year hold one run each."""
+    name = str(name).strip()
+    return len(name) == 4 and name.isdigit()
+
+
+# ---------------------------------------------------------------------------
+# Vendor tally exports (CSV / fixed-width), streamed in chunks
+# ---------------------------------------------------------------------------
+
+_WORKBOOK_SUFFIXES = {".xlsx", ".xlsm", ".xls"}
+_TALLY_READERS = {".csv": pd.read_csv, ".txt": pd.read_fwf, ".fwf": pd.read_fwf}
+
+# Rows per chunk when streaming tally files into the cache
+TALLY_CHUNK_ROWS = 200_000
+
+# Canonical columns kept as text in tallies; the rest are parsed as numbers
+_TEXT_COLUMNS = {
+    "event", "comments", "id_od", "oclock", "dimension_class", "pipe_type",
+    "seam_position", "tool", "magnetization",
+}
+
+_YEAR_IN_NAME_RE = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+
+
+def _tally_files(path: Path) -> dict[int, Path]:
+    """Tally file for each run year: ``path`` itself, or every tally in a directory.
+
+    The run year is the (first) four-digit year in the file name.
+    """
+    candidates = sorted(path.iterdir()) if path.is_dir() else [path]
+    files = {}
+    for f in candidates:
+        if f.name.startswith(".") or f.suffix.lower() not in _TALLY_READERS:
+            continue
+        m = _YEAR_IN_NAME_RE.search(f.stem)
+        if m is None:
+            raise ValueError(f"Cannot tell the run year of {f.name} (expected e.g. 2022.csv)")
+        year = int(m.group(1))
+        if year in files:
+            raise ValueError(f"Two tally files for {year}: {files[year].name}, {f.name}")
+        files[year] = f
+    return files
+
+
+def _iter_tally_chunks(path: Path, year: int, chunk_rows: int):
+    """Normalised (frame, is_reference, is_anomaly) chunks of one tally file.
+
+    Everything is read as text and numeric columns are coerced per chunk,
+    so every chunk has the same dtypes whatever values it happens to hold.
+    """
+    reader = _TALLY_READERS[path.suffix.lower()]
+    with reader(path, dtype=str, chunksize=chunk_rows) as chunks:
+        for chunk in chunks:
+            df, is_ref, is_anom = ILIDataset._normalise_run(year, chunk)
+            for col in df.columns:
+                if col not in _TEXT_COLUMNS and col != "year":
+                    # float64 even for all-integer chunks: the next may hold blanks
+                    # (this also turns an all-None oclock_decimal into NaN)
+                    df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float64)
+            yield df, is_ref, is_anom
+
 
 def _normalize_col(name: str) -> str:
     """Collapse whitespace/newlines in column names for fuzzy matching."""
-    import re
     return re.sub(r"\s+", " ", str(name)).strip()
 
 
@@ -137,7 +241,8 @@ def _build_rename_map(df_columns, col_map: dict) -> dict:
     rename = {}
     for actual_col in df_columns:
         norm = _normalize_col(actual_col)
-        if norm in norm_lookup:
+        # First column wins if two headers map to the same canonical name
+        if norm in norm_lookup and norm_lookup[norm] not in rename.values():
             rename[actual_col] = norm_lookup[norm]
     return rename
 
@@ -162,9 +267,12 @@ def _normalize_event(event: str) -> str:
     return " ".join(event.strip().lower().split())
 
 
+_REFERENCE_EVENTS_NOSPACE = {r.replace(" ", "") for r in _REFERENCE_EVENTS}
+
+
 def _is_reference(event: str) -> bool:
     ev = _normalize_event(event)
-    return ev in _REFERENCE_EVENTS or ev.replace(" ", "") in {r.replace(" ", "") for r in _REFERENCE_EVENTS}
+    return ev in _REFERENCE_EVENTS or ev.replace(" ", "") in _REFERENCE_EVENTS_NOSPACE
 
 
 def _is_anomaly(event: str) -> bool:
@@ -177,6 +285,21 @@ def _is_metal_loss(event: str) -> bool:
     return "metal loss" in ev or "cluster" in ev
 
 
+def _event_mask(events: pd.Series, predicate) -> np.ndarray:
+    """Evaluate an event predicate once per distinct value and broadcast it.
+
+    Event columns hold a few dozen distinct strings over thousands of rows,
+    so classifying the uniques is far cheaper than a per-row ``apply``.
+    Missing events classify as False.
+    """
+    codes, uniques = pd.factorize(events, use_na_sentinel=True)
+    if len(uniques) == 0:
+        return np.zeros(len(codes), dtype=bool)
+    # Trailing False is what code -1 (missing) indexes into
+    lookup = np.array([bool(predicate(str(u))) for u in uniques] + [False])
+    return lookup[codes]
+
+
 # ---------------------------------------------------------------------------
 # Clock position helpers
 # ---------------------------------------------------------------------------
@@ -205,95 +328,581 @@ def _parse_oclock(val) -> float | None:
         return None
 
 
+_HHMM_RE = r"^\s*([+-]?\d+)\s*:\s*([+-]?\d+)\s*(?::|$)"
+
+
+def _parse_oclock_series(values: pd.Series) -> pd.Series:
+    """Vectorized ``_parse_oclock`` over a whole column.
+
+    Handles HH:MM(:SS) strings, ``datetime.time`` cells (via their
+    ``HH:MM:SS`` string form), and decimal hours, with the same per-row
+    results as applying ``_parse_oclock``.
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        out = pd.Series(values.to_numpy(dtype=np.float64, na_value=np.nan), index=values.index) % 12.0
+    else:
+        # Clock columns repeat a limited set of positions: parse the distinct
+        # values with string ops, then broadcast back by factor code.
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+
+        hhmm = text.str.extract(_HHMM_RE)
+        hours = pd.to_numeric(hhmm[0], errors="coerce")
+        minutes = pd.to_numeric(hhmm[1], errors="coerce")
+        from_hhmm = (hours % 12) + minutes / 60.0
+
+        has_colon = text.str.contains(":", regex=False)
+        from_decimal = pd.to_numeric(text.where(~has_colon & (text != "")), errors="coerce") % 12.0
+        parsed = from_hhmm.where(has_colon, from_decimal).to_numpy(dtype=np.float64)
+        # Trailing NaN is what code -1 (missing) indexes into
+        out = pd.Series(np.append(parsed, np.nan)[codes], index=values.index)
+
+    if len(out) > 0 and out.isna().all():
+        # Series.apply(_parse_oclock) yields an object column of None when
+        # nothing parses; keep that so "no clock" rows still score as such.
+        return pd.Series([None] * len(out), index=values.index, dtype=object)
+    return out
+
+
 def _clock_distance(a: float, b: float) -> float:
     """Minimum angular distance between two clock positions (0-6 hours)."""
     diff = abs(a - b) % 12.0
     return min(diff, 12.0 - diff)
 
 
+# ---------------------------------------------------------------------------
+# Pipeline stages
+# ---------------------------------------------------------------------------
+
+# load -> align -> match -> growth; each stage depends on the one before it
+_PIPELINE_STAGES = ("load", "align", "match", "growth")
+
+# Attributes each stage produces (cleared when the stage is invalidated)
+_STAGE_ARTEFACTS = {
+    "load": ("summary", "runs", "references", "anomalies"),
+    "align": ("aligned_welds", "weld_matches", "correction_funcs"),
+    "match": ("matches", "tracks"),
+    "growth": ("growth", "_growth_ranking"),
+}
+
+
+def _round_like_python(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """``np.round`` that agrees with Python's ``round()`` on every element.
+
+    np.round scales by 10**ndigits first, which can land a value on the
+    wrong side of a .5 tie; only those near-tie values are re-rounded with
+    Python's correctly-rounded ``round``.
+    """
+    out = np.round(values, ndigits)
+    scaled = values * 10.0 ** ndigits
+    near_tie = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    if len(near_tie):
+        out[near_tie] = [round(v, ndigits) for v in values[near_tie].tolist()]
+    return out
+
+
+def _severity_table(thresholds) -> tuple[tuple[str, float], ...]:
+    """Normalise a {label: min depth growth %/yr} table, highest threshold first."""
+    if thresholds is None:
+        return SEVERITY_THRESHOLDS
+    items = thresholds.items() if isinstance(thresholds, dict) else thresholds
+    table = tuple(sorted(((str(label), float(rate)) for label, rate in items), key=lambda t: -t[1]))
+    labels = [label for label, _ in table]
+    if len(set(labels)) != len(labels) or "normal" in labels:
+        raise ValueError(f"Severity labels must be unique and not 'normal': {labels}")
+    return table
+
+
+def _growth_columns(d1, d2, l1, l2, w1, w2, gap: int, thresholds=SEVERITY_THRESHOLDS) -> dict[str, np.ndarray]:
+    """Per-year growth rates and severity for one matched pair (pool worker)."""
+    rate_pct = (d2 - d1) / gap
+    # Severity comes from the unrounded rate; only the stored rate is rounded.
+    # Labels are checked highest threshold first; NaN growth stays "normal"
+    severity = np.select(
+        [rate_pct > rate for _, rate in thresholds],
+        [label for label, _ in thresholds],
+        default="normal",
+    ).astype(object)
+    return {
+        "depth_growth_pct_yr": _round_like_python(rate_pct, 3),
+        "length_growth_in_yr": _round_like_python((l2 - l1) / gap, 4),
+        "width_growth_in_yr": _round_like_python((w2 - w1) / gap, 4),
+        "severity": severity,
+    }
+
+
+def _run_tasks(fn, tasks: list[tuple], workers: int, on_done: Callable[[int], None] | None = None) -> list:
+    """Run ``fn(*task)`` for each task, in a process pool when workers > 1.
+
+    Results come back in task order regardless of completion order.
+    ``on_done(n)`` is called as the n-th task finishes; if it raises, tasks
+    not yet started are cancelled and the exception propagates.
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        results = []
+        for task in tasks:
+            results.append(fn(*task))
+            if on_done is not None:
+                on_done(len(results))
+        return results
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        futures = [pool.submit(fn, *task) for task in tasks]
+        try:
+            if on_done is not None:
+                for n, _ in enumerate(as_completed(futures), 1):
+                    on_done(n)
+            return [f.result() for f in futures]
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+
+
+def _frame_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a run frame (values, index and column names)."""
+    h = hashlib.sha1(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df.astype(str), index=True).to_numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+def _fingerprint(*parts) -> str:
+    """Short stable hash of JSON-serialisable stage inputs."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _profile_extremes(dist: np.ndarray, depth: np.ndarray, lo: float, hi: float, n_bins: int) -> np.ndarray:
+    """Positions of the shallowest and deepest point in each equal-width distance bin.
+
+    Points without a distance are dropped; a missing depth only wins a bin
+    that has no depths at all. Positions come back in ascending order.
+    """
+    placed = np.flatnonzero(~np.isnan(dist))
+    width = (hi - lo) / n_bins if hi > lo else 1.0
+    bins = np.clip(np.floor((dist[placed] - lo) / width), 0, n_bins - 1).astype(np.int64)
+    d = depth[placed]
+    keep = []
+    for key in (np.where(np.isnan(d), np.inf, d), np.where(np.isnan(d), np.inf, -d)):
+        order = np.lexsort((key, bins))
+        _, first = np.unique(bins[order], return_index=True)
+        keep.append(placed[order[first]])
+    return np.unique(np.concatenate(keep))
+
+
+# ---------------------------------------------------------------------------
+# Compact run storage
+# ---------------------------------------------------------------------------
+
+# Text columns stored as categoricals by compact datasets
+_CATEGORICAL_COLUMNS = ("event", "id_od", "pipe_type", "tool")
+
+# Never narrowed: odometer distance and clock position drive alignment/matching
+_FULL_PRECISION_COLUMNS = {"log_dist_ft", "oclock_decimal"}
+
+# Columns the loader knows; unknown vendor columns that are entirely empty are pruned
+_CANONICAL_COLUMNS = set(_DEFAULT_COL_MAP.values()) | {"year", "oclock_decimal"}
+
+# Filter name → column indexed for query_anomalies (growth rows: later run)
+_ANOMALY_INDEX_COLUMNS = {
+    "dist": "log_dist_ft", "joint": "joint_number", "depth": "depth_pct", "clock": "oclock_decimal",
+}
+_GROWTH_INDEX_COLUMNS = {"dist": "y2_dist", "joint": "y2_joint", "depth": "y2_depth_pct", "clock": "y2_clock"}
+
+# Most decimal places a float32 column may need to be restored exactly
+_MAX_DECIMALS = 6
+
+
+def _float32_decimals(values: np.ndarray) -> int | None:
+    """Decimal places that recover ``values`` exactly from float32, or None.
+
+    Rounding the widened float32 to k places gives back the original
+    float64 when the column was reported to k decimals and float32 still
+    resolves that precision. -1 means float32 holds the values exactly.
+    """
+    finite = values[np.isfinite(values)]
+    narrow = finite.astype(np.float32).astype(np.float64)
+    if np.array_equal(narrow, finite):
+        return -1
+    for decimals in range(_MAX_DECIMALS + 1):
+        scale = 10.0 ** decimals
+        if np.array_equal(np.rint(narrow * scale) / scale, finite):
+            return decimals
+    return None
+
+
+def _compact_run(df: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, tuple[Any, int | None]]]:
+    """Narrow a run's dtypes. Returns (compact frame, {column: (dtype, decimals)}).
+
+    The second value is what ``_restore_run`` needs to give back the
+    original dtypes and values.
+    """
+    columns = {}
+    restore = {}
+    for col in df.columns:
+        s = df[col]
+        if col not in _CANONICAL_COLUMNS and s.isna().all():
+            continue
+        if col in _CATEGORICAL_COLUMNS and not pd.api.types.is_numeric_dtype(s):
+            columns[col] = s.astype("category")
+            restore[col] = (s.dtype, None)
+        elif col == "joint_number" and pd.api.types.is_numeric_dtype(s):
+            values = s.to_numpy(dtype=np.float64, na_value=np.nan)
+            finite = values[~np.isnan(values)]
+            if (finite == np.round(finite)).all() and (np.abs(finite) < 2**31).all():
+                columns[col] = s.astype("Int32")
+                restore[col] = (s.dtype, None)
+            else:
+                columns[col] = s
+        elif s.dtype == np.float64 and col not in _FULL_PRECISION_COLUMNS:
+            decimals = _float32_decimals(s.to_numpy())
+            if decimals is None:
+                columns[col] = s
+            else:
+                columns[col] = s.astype(np.float32)
+                restore[col] = (s.dtype, None if decimals < 0 else decimals)
+        else:
+            columns[col] = s
+    return pd.DataFrame(columns, index=df.index), restore
+
+
+def _restore_run(df: pd.DataFrame, restore: dict[str, tuple[Any, int | None]]) -> pd.DataFrame:
+    """Inverse of ``_compact_run`` for (a row subset of) a compact run."""
+    columns = {}
+    for col, (dtype, decimals) in restore.items():
+        if col not in df.columns:
+            continue
+        if decimals is None:
+            columns[col] = df[col].astype(dtype)
+        else:
+            scale = 10.0 ** decimals
+            values = np.rint(df[col].to_numpy(dtype=np.float64) * scale) / scale
+            columns[col] = pd.Series(values, index=df.index, dtype=dtype)
+    if not columns:
+        return df
+    out = df.copy()
+    for col, values in columns.items():
+        out[col] = values
+    return out
+
+
+def _frame_bytes(df: pd.DataFrame | None) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum()) if df is not None else 0
+
+
+class _RunSubsets(Mapping):
+    """year → rows of a compact run selected by a boolean mask.
+
+    Stands in for the reference/anomaly dicts of a compact dataset: only
+    the masks are stored, and each lookup materialises the rows with the
+    run's original dtypes, so callers see the same frames as without
+    compaction.
+    """
+
+    def __init__(self, runs: dict[int, pd.DataFrame], restore: dict[int, dict]):
+        self._runs = runs
+        self._restore = restore
+        self._masks: dict[int, np.ndarray] = {}
+        self._positions: dict[int, np.ndarray] = {}  # run row of each subset row, on demand
+
+    def set_mask(self, year: int, mask: np.ndarray):
+        self._masks[year] = np.asarray(mask, dtype=bool)
+        self._positions.pop(year, None)
+
+    def nbytes(self, year: int) -> int:
+        positions = self._positions.get(year)
+        return self._masks[year].nbytes + (positions.nbytes if positions is not None else 0)
+
+    def take(self, year: int, rows: np.ndarray) -> pd.DataFrame:
+        """Subset rows at positions ``rows`` without materialising the whole subset."""
+        if year not in self._positions:
+            self._positions[year] = np.flatnonzero(self._masks[year])
+        picked = self._runs[year].iloc[self._positions[year][rows]]
+        return _restore_run(picked, self._restore.get(year, {}))
+
+    def columns(self, year: int) -> pd.Index:
+        return self._runs[year].columns
+
+    def rebind(self, runs: dict[int, pd.DataFrame], restore: dict[int, dict]) -> _RunSubsets:
+        """Copy over other ``runs``/``restore`` dicts, sharing the mask arrays."""
+        subsets = _RunSubsets(runs, restore)
+        subsets._masks = dict(self._masks)
+        subsets._positions = dict(self._positions)
+        return subsets
+
+    def __getitem__(self, year: int) -> pd.DataFrame:
+        rows = self._runs[year][self._masks[year]]
+        return _restore_run(rows, self._restore.get(year, {}))
+
+    def __iter__(self):
+        return iter(self._masks)
+
+    def __len__(self) -> int:
+        return len(self._masks)
+
+
 # ---------------------------------------------------------------------------
 # Data ingestion
 # ---------------------------------------------------------------------------
 
 class ILIDataset:
-    """Holds normalised ILI data for all runs."""
+    """Holds normalised ILI data for all runs.
+
+    With ``compact=True`` runs are stored with narrow dtypes (categorical
+    event/id_od/pipe_type/tool, float32 measurements where that is exact
+    to the reported precision, nullable Int32 joint numbers), empty vendor
+    columns are dropped, and ``references``/``anomalies`` keep boolean
+    masks instead of row copies. Lookups in those restore the original
+    dtypes, so every result is the same as without compaction.
+    """
 
-    def __init__(self):
+    def __init__(self, compact: bool = False):
+        self.compact = compact
+        # Published snapshots are read-only: stages raise StaleSnapshotError
+        self.frozen = False
+        # progress(stage, done, total), called from inside long stages; may
+        # raise to abandon the stage (the dataset is then left half-built)
+        self.progress: Callable[[str, float, float], None] | None = None
         self.summary: pd.DataFrame | None = None
         self.runs: dict[int, pd.DataFrame] = {}   # year → DataFrame
-        self.references: dict[int, pd.DataFrame] = {}
-        self.anomalies: dict[int, pd.DataFrame] = {}
+        # year → {column: (original dtype, decimals)} for compact runs
+        self._run_dtypes: dict[int, dict[str, tuple[Any, int | None]]] = {}
+        self.references: Mapping[int, pd.DataFrame] = (
+            _RunSubsets(self.runs, self._run_dtypes) if compact else {}
+        )
+        self.anomalies: Mapping[int, pd.DataFrame] = (
+            _RunSubsets(self.runs, self._run_dtypes) if compact else {}
+        )
         self.aligned_welds: pd.DataFrame | None = None
-        self.correction_funcs: dict[tuple[int, int], Any] = {}
+        self.weld_matches: dict[tuple[int, int], pd.DataFrame] = {}
+        self.correction_funcs: dict[tuple[int, int], Correction] = {}
         self.matches: dict[tuple[int, int], pd.DataFrame] = {}
         self.growth: dict[tuple[int, int], pd.DataFrame] = {}
+        # Descending row order per growth rate, for get_top_growth
+        self._growth_ranking: GrowthRanking | None = None
+        self.tracks: pd.DataFrame | None = None   # one row per chained anomaly
         self._file_path: str | None = None
-
-    def load(self, file_path: str) -> dict:
-        """Load and normalise ILI Excel data. Returns summary dict."""
+        self._file_hash: str | None = None
+        self._stage_keys: dict[str, str] = {}     # stage → input fingerprint
+        self._stage_results: dict[str, Any] = {}  # stage → result dict
+        # (y1, y2, params, correction fingerprint) → (summary, matches), LRU order
+        self._match_cache: OrderedDict[tuple, tuple[dict, pd.DataFrame]] = OrderedDict()
+        # Runs added with register_run, re-applied on top of every load
+        self._registered_runs: dict[int, tuple[pd.DataFrame, np.ndarray, np.ndarray]] = {}
+        self._run_keys: dict[int, str] = {}        # year → content fingerprint
+        # Adjacent-pair weld alignment, reused while both runs are unchanged:
+        # (y1, y2) → (pair fingerprint, weld matches, correction)
+        self._pair_alignments: dict[tuple[int, int], tuple[str, pd.DataFrame, Correction | None]] = {}
+        self._correction_keys: dict[tuple[int, int], str] = {}
+        # Composed multi-hop corrections by correction fingerprint
+        self._composed_corrections: dict[str, Correction] = {}
+        # year → profile tile pyramid, rebuilt whenever the run is ingested
+        self._profile_pyramids: dict[int, ProfilePyramid] = {}
+        # year → anomaly cluster hierarchy, built on first use after ingest
+        self._cluster_hierarchies: dict[int, ClusterHierarchy] = {}
+        # query_anomalies indexes: year → anomalies index, (y1, y2) → growth index
+        self._query_indexes: dict[Any, TableIndex] = {}
+
+    def load(self, file_path: str, use_cache: bool = True, chunk_rows: int = TALLY_CHUNK_ROWS) -> dict:
+        """Load and normalise ILI data. Returns summary dict.
+
+        ``file_path`` is an Excel workbook (one sheet per run year), a vendor
+        tally export (``.csv``, or fixed-width ``.txt``/``.fwf``) named after
+        its run year, or a directory of such tally files.
+
+        With ``use_cache`` the normalised frames are read from (or written
+        to) the Parquet cache next to the source, see ``ili_cache``. Tally
+        files are streamed into the cache ``chunk_rows`` rows at a time.
+        """
+        self._writable()
         self._file_path = file_path
         path = Path(file_path)
         if not path.exists():
             raise FileNotFoundError(f"ILI data file not found: {file_path}")
 
-        xls = pd.ExcelFile(path)
-        self.summary = pd.read_excel(xls, "Summary")
-
-        result = {"pipeline_length_ft": 0, "runs": {}}
-
-        for year in [2007, 2015, 2022]:
-            sheet_name = str(year)
-            if sheet_name not in xls.sheet_names:
-                continue
+        self._invalidate("load")
+        self._file_hash = ili_cache.source_fingerprint(path)
+        cached = ili_cache.load_cached(path, self._file_hash) if use_cache else None
+        if cached is not None:
+            self.summary, parsed = cached
+        elif path.suffix.lower() in _WORKBOOK_SUFFIXES:
+            self.summary, parsed = self._parse_workbook(path)
+            if use_cache:
+                ili_cache.store(path, self._file_hash, self.summary, parsed)
+        else:
+            self.summary, parsed = self._parse_tallies(path, self._file_hash, use_cache, chunk_rows)
 
-            df = pd.read_excel(xls, sheet_name)
-            col_map = _YEAR_COL_MAPS.get(year, {})
+        self._run_keys = {year: _fingerprint(self._file_hash, year) for year in parsed}
+        for year, (df, is_ref, is_anom) in self._registered_runs.items():
+            parsed[year] = (df, is_ref, is_anom)
+            self._run_keys[year] = _frame_fingerprint(df)
 
-            # Fuzzy-rename columns (handles newlines/extra whitespace in Excel headers)
-            rename = _build_rename_map(df.columns, col_map)
-            df = df.rename(columns=rename)
-            df["year"] = year
+        result = {"pipeline_length_ft": 0, "runs": {}}
+        for year in sorted(parsed):
+            run_info, max_dist = self._ingest_run(year, *parsed[year])
+            result["pipeline_length_ft"] = max(result["pipeline_length_ft"], max_dist)
+            result["runs"][year] = run_info
 
-            # Parse o'clock to decimal
-            if "oclock" in df.columns:
-                df["oclock_decimal"] = df["oclock"].apply(_parse_oclock)
+        self._record_stage("load", self._load_key(self._file_hash), result)
+        return result
 
+    def _ingest_run(
+        self, year: int, df: pd.DataFrame, is_ref: np.ndarray, is_anom: np.ndarray,
+    ) -> tuple[dict, float]:
+        """Store a normalised run; returns its load summary and unrounded max distance (ft)."""
+        if "oclock_decimal" in df.columns and len(df) > 0 and df["oclock_decimal"].isna().all():
+            # No clock at all: the all-None column _parse_oclock_series gives
+            # (lost in the Parquet roundtrip or per-chunk parsing)
+            df["oclock_decimal"] = pd.Series([None] * len(df), index=df.index, dtype=object)
+
+        # Separate references and anomalies
+        if self.compact:
+            self.runs[year], self._run_dtypes[year] = _compact_run(df)
+            self.references.set_mask(year, is_ref)
+            self.anomalies.set_mask(year, is_anom)
+            refs = self.references[year]
+            anoms = self.anomalies[year]
+        else:
             self.runs[year] = df
-
-            # Separate references and anomalies
-            refs = df[df["event"].apply(_is_reference)].copy()
-            anoms = df[df["event"].apply(_is_anomaly)].copy()
+            refs = df[is_ref].copy()
+            anoms = df[is_anom].copy()
             self.references[year] = refs
             self.anomalies[year] = anoms
+        self._profile_pyramids[year] = self._build_pyramid(anoms)
+        self._query_indexes[year] = TableIndex(anoms, _ANOMALY_INDEX_COLUMNS)
+        # Every hierarchy may use this run's pipe OD as its fallback
+        self._cluster_hierarchies.clear()
 
-            max_dist = float(df["log_dist_ft"].max()) if "log_dist_ft" in df.columns else 0
-            result["pipeline_length_ft"] = max(result["pipeline_length_ft"], max_dist)
-            result["runs"][year] = {
-                "total_features": len(df),
-                "reference_points": len(refs),
-                "anomalies": len(anoms),
-                "girth_welds": int((refs["event"].str.lower().str.replace(" ", "").str.contains("girthweld")).sum()) if len(refs) > 0 else 0,
-                "metal_loss": int(anoms["event"].apply(_is_metal_loss).sum()) if len(anoms) > 0 else 0,
-                "max_distance_ft": round(max_dist, 1),
-            }
+        max_dist = float(df["log_dist_ft"].max()) if "log_dist_ft" in df.columns else 0
+        return {
+            "total_features": len(df),
+            "reference_points": len(refs),
+            "anomalies": len(anoms),
+            "girth_welds": int((refs["event"].str.lower().str.replace(" ", "").str.contains("girthweld")).sum()) if len(refs) > 0 else 0,
+            "metal_loss": int(_event_mask(anoms["event"], _is_metal_loss).sum()) if len(anoms) > 0 else 0,
+            "max_distance_ft": round(max_dist, 1),
+        }, max_dist
+
+    def _load_key(self, file_hash: str | None) -> str:
+        return _fingerprint(file_hash, sorted(
+            (year, _frame_fingerprint(df)) for year, (df, _, _) in self._registered_runs.items()
+        ))
+
+    def register_run(self, year: int, df: pd.DataFrame) -> dict:
+        """Add (or replace) the run for ``year`` from a raw DataFrame.
+
+        Columns are normalised like a workbook sheet. The run is kept across
+        reloads of the workbook. Only the alignment and matches of the run
+        pairs it touches are recomputed by the next ``ensure_*`` call.
+        Returns the run's load summary.
+        """
+        self._writable()
+        year = int(year)
+        parsed = self._normalise_run(year, df)
+        self._registered_runs[year] = parsed
+        self._run_keys[year] = _frame_fingerprint(parsed[0])
+        self._invalidate("align")
+
+        run_info, max_dist = self._ingest_run(year, *parsed)
+        load = self._stage_results.get("load")
+        if load is not None:
+            load["runs"][year] = run_info
+            load["pipeline_length_ft"] = max(load["pipeline_length_ft"], max_dist)
+            self._record_stage("load", self._load_key(self._file_hash), load)
+        return run_info
+
+    @staticmethod
+    def _parse_workbook(path: Path) -> tuple[pd.DataFrame, dict[int, tuple[pd.DataFrame, np.ndarray, np.ndarray]]]:
+        """Parse the workbook into (summary, {year: (frame, is_reference, is_anomaly)})."""
+        xls = pd.ExcelFile(path)
+        summary = pd.read_excel(xls, "Summary")
+
+        parsed = {}
+        sheets = {int(name): name for name in xls.sheet_names if _is_run_sheet(name)}
+        for year in sorted(sheets):
+            parsed[year] = ILIDataset._normalise_run(year, pd.read_excel(xls, sheets[year]))
+
+        return summary, parsed
+
+    @staticmethod
+    def _parse_tallies(
+        path: Path, sha256: str, use_cache: bool, chunk_rows: int,
+    ) -> tuple[pd.DataFrame, dict[int, tuple[pd.DataFrame, np.ndarray, np.ndarray]]]:
+        """Parse tally export(s), streaming them through the Parquet cache.
+
+        With the cache available, ingestion only holds one chunk in memory
+        and the runs are then memory-mapped back from Parquet. Without it
+        (no pyarrow, ``use_cache=False`` or a failed write) the chunks are
+        concatenated in memory.
+        """
+        files = _tally_files(path)
+        if not files:
+            raise ValueError(f"No ILI tally files (.csv, .txt, .fwf) found at {path}")
+        summary = pd.DataFrame()
+
+        if use_cache:
+            chunked = {year: _iter_tally_chunks(f, year, chunk_rows) for year, f in files.items()}
+            if ili_cache.store_chunks(path, sha256, summary, chunked):
+                cached = ili_cache.load_cached(path, sha256)
+                if cached is not None:
+                    return cached
+
+        parsed = {}
+        for year, f in files.items():
+            chunks = list(_iter_tally_chunks(f, year, chunk_rows))
+            if not chunks:
+                continue
+            parsed[year] = (
+                pd.concat([c[0] for c in chunks]),
+                np.concatenate([c[1] for c in chunks]),
+                np.concatenate([c[2] for c in chunks]),
+            )
+        return summary, parsed
 
-        return result
+    @staticmethod
+    def _normalise_run(year: int, df: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """Canonical columns, ``oclock_decimal`` and reference/anomaly masks for one run."""
+        col_map = _YEAR_COL_MAPS.get(year, _DEFAULT_COL_MAP)
+
+        # Fuzzy-rename columns (handles newlines/extra whitespace in Excel headers)
+        rename = _build_rename_map(df.columns, col_map)
+        df = df.rename(columns=rename)
+        missing = {"event", "log_dist_ft"} - set(df.columns)
+        if missing:
+            raise ValueError(f"Run {year} is missing required columns: {sorted(missing)}")
+        df["year"] = year
+
+        # Parse o'clock to decimal
+        if "oclock" in df.columns:
+            df["oclock_decimal"] = _parse_oclock_series(df["oclock"])
+
+        is_ref = _event_mask(df["event"], _is_reference)
+        is_anom = _event_mask(df["event"], _is_anomaly)
+        return df, is_ref, is_anom
 
     # ------------------------------------------------------------------
     # Phase 1: Align reference points (girth welds)
     # ------------------------------------------------------------------
 
     def align_welds(self) -> dict:
-        """Match girth welds across runs and build correction functions."""
+        """Match girth welds between adjacent runs and build correction functions.
+
+        Only adjacent runs are weld-matched. A pair whose runs are both
+        unchanged reuses its previous alignment, so adding a run costs one
+        or two new pair alignments. Corrections for non-adjacent pairs are
+        composed from the adjacent ones along the run chain.
+        """
+        self._writable()
+        self._invalidate("align")
+        key = _fingerprint(self._stage_keys.get("load"))
         years = sorted(self.runs.keys())
         if len(years) < 2:
-            return {"error": "Need at least 2 runs to align"}
+            result = {"error": "Need at least 2 runs to align"}
+            self._record_stage("align", key, result)
+            return result
 
         all_matches = []
 
-        for i in range(len(years) - 1):
-            y1, y2 = years[i], years[i + 1]
-            matches = self._match_welds(y1, y2)
+        for y1, y2 in zip(years, years[1:]):
+            matches = self._align_pair(y1, y2)
             all_matches.append({
                 "pair": f"{y1}->{y2}",
                 "matched": len(matches),
@@ -302,36 +911,75 @@ class ILIDataset:
                 "std_offset_ft": round(float(matches["offset"].std()), 3) if len(matches) > 0 else 0,
             })
 
-            # Build piecewise correction function
-            if len(matches) >= 2:
-                self.correction_funcs[(y1, y2)] = interp1d(
-                    matches["dist_y2"].values,
-                    matches["dist_y1"].values,
-                    kind="linear",
-                    fill_value="extrapolate",
-                    bounds_error=False,
-                )
+        # Non-adjacent pairs: (y1, yj) = (y1, yj-1) ∘ (yj-1, yj), built up
+        # hop by hop so each composition reuses the previous one
+        composed = {}
+        for i, y1 in enumerate(years):
+            for j in range(i + 2, len(years)):
+                hops = list(zip(years[i:j], years[i + 1:j + 1]))
+                hop_keys = [self._correction_keys.get(hop) for hop in hops]
+                corr_key = _fingerprint(*hop_keys) if None not in hop_keys else None
+                correction = self._composed_corrections.get(corr_key)
+                if correction is None:
+                    outer = self.correction_funcs.get((y1, years[j - 1]), Correction.identity())
+                    inner = self.correction_funcs.get((years[j - 1], years[j]), Correction.identity())
+                    correction = outer.compose(inner)
+                self.correction_funcs[(y1, years[j])] = correction
+                if corr_key is not None:
+                    self._correction_keys[(y1, years[j])] = corr_key
+                    composed[corr_key] = correction
+                offsets = self._chained_weld_offsets(hops)
+                all_matches.append({
+                    "pair": f"{y1}->{years[j]}",
+                    "composed_from": [f"{a}->{b}" for a, b in hops],
+                    "matched": len(offsets),
+                    "avg_offset_ft": round(float(offsets.mean()), 3) if len(offsets) > 0 else 0,
+                    "max_offset_ft": round(float(offsets.abs().max()), 3) if len(offsets) > 0 else 0,
+                })
 
-        # Also build direct 2007->2022 if we have both
-        if (2007 in self.runs and 2022 in self.runs and
-                2007 in self.references and 2022 in self.references):
-            matches_direct = self._match_welds(2007, 2022)
-            all_matches.append({
-                "pair": "2007->2022",
-                "matched": len(matches_direct),
-                "avg_offset_ft": round(float(matches_direct["offset"].mean()), 3) if len(matches_direct) > 0 else 0,
-                "max_offset_ft": round(float(matches_direct["offset"].abs().max()), 3) if len(matches_direct) > 0 else 0,
-            })
-            if len(matches_direct) >= 2:
-                self.correction_funcs[(2007, 2022)] = interp1d(
-                    matches_direct["dist_y2"].values,
-                    matches_direct["dist_y1"].values,
-                    kind="linear",
-                    fill_value="extrapolate",
-                    bounds_error=False,
+        self._composed_corrections = composed
+        result = {"weld_alignment": all_matches}
+        self._record_stage("align", key, result)
+        return result
+
+    def _chained_weld_offsets(self, hops: list[tuple[int, int]]) -> pd.Series:
+        """Offsets (last run - first run) of welds matched on every hop of a chain."""
+        chain = None
+        for hop in hops:
+            welds = self.weld_matches.get(hop)
+            if welds is None or welds.empty:
+                return pd.Series(dtype=float)
+            if chain is None:
+                chain = welds[["joint_number", "dist_y1", "dist_y2"]]
+            else:
+                chain = chain[["joint_number", "dist_y1"]].merge(
+                    welds[["joint_number", "dist_y2"]], on="joint_number", how="inner",
                 )
+        return chain["dist_y2"] - chain["dist_y1"]
+
+    def _align_pair(self, y1: int, y2: int) -> pd.DataFrame:
+        """Weld matches and correction for adjacent runs, reused while both are unchanged."""
+        run_keys = (self._run_keys.get(y1), self._run_keys.get(y2))
+        pair_key = _fingerprint(*run_keys) if None not in run_keys else None
+        reused = self._pair_alignments.get((y1, y2))
+        if pair_key is not None and reused is not None and reused[0] == pair_key:
+            _, matches, correction = reused
+            self.aligned_welds = matches
+            self.weld_matches[(y1, y2)] = matches
+        else:
+            matches = self._match_welds(y1, y2)
+            correction = None
+            # Build piecewise correction function
+            if len(matches) >= 2:
+                correction = Correction(matches["dist_y2"].to_numpy(), matches["dist_y1"].to_numpy())
+            if pair_key is not None:
+                self._pair_alignments[(y1, y2)] = (pair_key, matches, correction)
 
-        return {"weld_alignment": all_matches}
+        if correction is not None:
+            self.correction_funcs[(y1, y2)] = correction
+        if pair_key is not None:
+            self._correction_keys[(y1, y2)] = pair_key
+        return matches
 
     def _match_welds(self, y1: int, y2: int) -> pd.DataFrame:
         """Match girth welds between two runs by joint number."""
@@ -364,6 +1012,7 @@ class ILIDataset:
         merged = merged.sort_values("dist_y1").reset_index(drop=True)
 
         self.aligned_welds = merged
+        self.weld_matches[(y1, y2)] = merged
         return merged
 
     # ------------------------------------------------------------------
@@ -377,41 +1026,247 @@ class ILIDataset:
         depth_weight: float = 0.3,
         dist_weight: float = 0.4,
         clock_weight: float = 0.3,
+        assignment: str = "greedy",
+        workers: int = 1,
     ) -> dict:
-        """Match anomalies across consecutive runs."""
-        years = sorted(self.runs.keys())
+        """Match anomalies across consecutive runs.
+
+        ``assignment="greedy"`` (default) assigns in later-run row order.
+        ``assignment="optimal"`` solves a min-cost one-to-one assignment over
+        the same gated candidates, per girth-weld-bounded block.
+        ``workers > 1`` farms the pairs, split into girth-weld shards, out to
+        a process pool; the result is identical to the serial path.
+        """
+        self._writable()
+        if assignment not in ASSIGNMENT_MODES:
+            raise ValueError(f"Unknown assignment mode: {assignment!r} (expected one of {ASSIGNMENT_MODES})")
+        self._invalidate("match")
+        key = _fingerprint(
+            self._stage_keys.get("align"),
+            distance_tol, clock_tol, depth_weight, dist_weight, clock_weight, assignment,
+        )
+        params = (distance_tol, clock_tol, depth_weight, dist_weight, clock_weight, assignment)
+        pairs = self._match_pairs()
+        computed = self._match_pairs_parallel(pairs, params, workers) if workers > 1 else {}
+
         results = {}
+        for n, (y1, y2) in enumerate(pairs):
+            if (y1, y2) in computed:
+                stats, matches_df = computed[(y1, y2)]
+                self.matches[(y1, y2)] = matches_df
+                self._store_match(y1, y2, params, stats, matches_df)
+                results[f"{y1}->{y2}"] = stats
+            else:
+                results[f"{y1}->{y2}"] = self._match_anomaly_pair(y1, y2, *params, progress=(n, len(pairs)))
+            self._report("match", n + 1, len(pairs))
+
+        self.tracks = self._build_tracks()
+        self._record_stage("match", key, results)
+        return results
 
-        for i in range(len(years) - 1):
-            y1, y2 = years[i], years[i + 1]
-            pair_result = self._match_anomaly_pair(
-                y1, y2, distance_tol, clock_tol,
-                depth_weight, dist_weight, clock_weight,
-            )
-            results[f"{y1}->{y2}"] = pair_result
+    def _build_tracks(self) -> pd.DataFrame:
+        """Chain the adjacent-pair matches into one row per anomaly identity.
 
-        # Direct 2007->2022
-        if 2007 in self.runs and 2022 in self.runs:
-            pair_result = self._match_anomaly_pair(
-                2007, 2022, distance_tol, clock_tol,
-                depth_weight, dist_weight, clock_weight,
+        One column per run year holding the anomaly's index label in that run
+        (<NA> where it was not seen or not matched), plus ``track_id`` and
+        ``n_runs``. Anomalies never matched to another run are left out.
+        """
+        years = sorted(self.runs.keys())
+        tracks = None
+        for y1, y2 in zip(years, years[1:]):
+            matches_df = self.matches.get((y1, y2))
+            if matches_df is None or matches_df.empty:
+                links = pd.DataFrame({y1: pd.array([], dtype="Int64"), y2: pd.array([], dtype="Int64")})
+            else:
+                links = matches_df[["y1_idx", "y2_idx"]].set_axis([y1, y2], axis=1).astype("Int64")
+            if tracks is None:
+                tracks = links
+                continue
+            # Extend tracks still open at y1; the rest stay as they are
+            open_ = tracks[y1].notna()
+            tracks = pd.concat(
+                [tracks[open_].merge(links, on=y1, how="outer"), tracks[~open_]],
+                ignore_index=True,
             )
-            results["2007->2022"] = pair_result
 
-        return results
+        if tracks is None:
+            return pd.DataFrame()
+        tracks = tracks[years].sort_values(years, na_position="last", ignore_index=True)
+        tracks.insert(0, "track_id", np.arange(len(tracks)))
+        tracks["n_runs"] = tracks[years].notna().sum(axis=1)
+        return tracks
+
+    def _match_pairs(self) -> list[tuple[int, int]]:
+        """Run pairs to match: adjacent runs, plus first->last when there are more than two.
+
+        Tracks across all runs come from chaining the adjacent matches
+        (see ``_build_tracks``); the first->last pair is matched directly on
+        the composed correction for the whole-history growth view.
+        """
+        years = sorted(self.runs.keys())
+        pairs = list(zip(years, years[1:]))
+        if len(years) > 2:
+            pairs.append((years[0], years[-1]))
+        return pairs
+
+    def _match_pairs_parallel(
+        self, pairs: list[tuple[int, int]], params: tuple, workers: int,
+    ) -> dict[tuple[int, int], tuple[dict, pd.DataFrame]]:
+        """Match uncached pairs in a process pool, sharded by girth-weld blocks.
+
+        Workers receive only RunArrays/segment arrays for their shard and
+        return positional matches; frames are built here, in pair order, so
+        the output does not depend on scheduling.
+        """
+        distance_tol = params[0]
+        tasks = []
+        owners = []
+        prepared = {}
+        for y1, y2 in pairs:
+            if self._cached_match(y1, y2, params) is not None:
+                continue
+            ml1, ml2, a1, a2 = self._metal_loss_pair(y1, y2)
+            seg1, seg2 = self._weld_segments(y1, y2, a1.dist, a2.dist)
+            prepared[(y1, y2)] = (ml1, ml2, a1, a2)
+            for rows1, rows2 in shard_rows(a1, a2, seg1, seg2, distance_tol, workers):
+                tasks.append((
+                    subset_arrays(a1, rows1), subset_arrays(a2, rows2),
+                    seg1[rows1], seg2[rows2], *params,
+                ))
+                owners.append(((y1, y2), rows1, rows2))
+
+        shard_results = _run_tasks(
+            assign_arrays, tasks, workers,
+            on_done=lambda n: self._report("match", n, len(tasks) + 1),
+        )
+
+        parts: dict[tuple[int, int], list] = {pair: [] for pair in prepared}
+        for (pair, rows1, rows2), (i2, i1, score) in zip(owners, shard_results):
+            parts[pair].append((rows2[i2], rows1[i1], score))
+
+        computed = {}
+        for pair, (ml1, ml2, a1, a2) in prepared.items():
+            if parts[pair]:
+                i2 = np.concatenate([p[0] for p in parts[pair]])
+                i1 = np.concatenate([p[1] for p in parts[pair]])
+                score = np.concatenate([p[2] for p in parts[pair]])
+                order = np.argsort(i2, kind="stable")
+                i2, i1, score = i2[order], i1[order], score[order]
+            else:
+                i2 = i1 = np.zeros(0, dtype=np.int64)
+                score = np.zeros(0)
+            computed[pair] = self._pair_result(ml1, ml2, a2, i1, i2, score)
+        return computed
+
+    def sweep_matches(
+        self,
+        distance_tols: list[float],
+        clock_tols: list[float],
+        depth_weight: float = 0.3,
+        dist_weight: float = 0.4,
+        clock_weight: float = 0.3,
+        assignment: str = "greedy",
+    ) -> dict:
+        """Match summaries for every (distance_tol, clock_tol) grid point.
+
+        Candidate windows are generated once per pair at the widest distance
+        tolerance and re-gated/re-scored for each narrower point, giving the
+        same result as calling match_anomalies at that point. Every point is
+        stored in the match cache, so picking one afterwards is instant.
+        Does not change ``self.matches`` or the pipeline stage state.
+        """
+        self._writable()
+        if assignment not in ASSIGNMENT_MODES:
+            raise ValueError(f"Unknown assignment mode: {assignment!r} (expected one of {ASSIGNMENT_MODES})")
+        distance_tols = sorted(set(distance_tols))
+        clock_tols = sorted(set(clock_tols))
+        grid = {(dt, ct): {} for dt in distance_tols for ct in clock_tols}
+        if not grid:
+            return {"grid": []}
+
+        for y1, y2 in self._match_pairs():
+            prepared = None
+            for (dt, ct), pairs in grid.items():
+                params = (dt, ct, depth_weight, dist_weight, clock_weight, assignment)
+                cached = self._cached_match(y1, y2, params)
+                if cached is not None:
+                    pairs[f"{y1}->{y2}"] = dict(cached[0])
+                    continue
+                if prepared is None:
+                    ml1, ml2, a1, a2 = self._metal_loss_pair(y1, y2)
+                    wide = window_pairs(a1, a2, distance_tols[-1])
+                    prepared = (ml1, ml2, a1, a2, wide)
+                ml1, ml2, a1, a2, (i2, i1) = prepared
+                score, keep = score_edges(
+                    a1, a2, i1, i2, dt, ct,
+                    depth_weight, dist_weight, clock_weight,
+                )
+                edges = iter([rank_edges(i2, i1, score, keep)])
+                stats, matches_df = self._assign_pair(y1, y2, ml1, ml2, a1, a2, edges, assignment)
+                self._store_match(y1, y2, params, stats, matches_df)
+                pairs[f"{y1}->{y2}"] = stats
+
+        return {
+            "grid": [
+                {"distance_tol": dt, "clock_tol": ct, "pairs": pairs}
+                for (dt, ct), pairs in grid.items()
+            ],
+        }
 
     def _match_anomaly_pair(
         self, y1: int, y2: int,
         distance_tol: float, clock_tol: float,
         depth_weight: float, dist_weight: float, clock_weight: float,
+        assignment: str = "greedy",
+        progress: tuple[int, int] = (0, 1),
     ) -> dict:
-        """Match anomalies between two specific runs."""
-        anoms1 = self.anomalies[y1].copy()
-        anoms2 = self.anomalies[y2].copy()
+        """Match anomalies between two specific runs.
+
+        Each later-run anomaly is scored only against earlier-run anomalies
+        inside its corrected-distance window (see ``ili_matching``), then
+        assigned greedily in later-run order or, with ``assignment="optimal"``,
+        by a min-cost bipartite assignment per girth-weld segment block.
+        ``progress`` is (pairs done, pairs total) for ``_report``.
+        """
+        params = (distance_tol, clock_tol, depth_weight, dist_weight, clock_weight, assignment)
+        cached = self._cached_match(y1, y2, params)
+        if cached is not None:
+            stats, matches_df = cached
+            self.matches[(y1, y2)] = matches_df
+            return dict(stats)
+
+        ml1, ml2, a1, a2 = self._metal_loss_pair(y1, y2)
+        edges = self._tracked_edges(iter_candidate_edges(
+            a1, a2, distance_tol, clock_tol,
+            depth_weight, dist_weight, clock_weight,
+        ), len(a2.dist), *progress)
+        stats, matches_df = self._assign_pair(y1, y2, ml1, ml2, a1, a2, edges, assignment)
+        self.matches[(y1, y2)] = matches_df
+        self._store_match(y1, y2, params, stats, matches_df)
+        return stats
+
+    def _tracked_edges(self, edges: Iterator, n2: int, done: int, total: int) -> Iterator:
+        """Pass ``edges`` through, reporting match progress by later-run row."""
+        if self.progress is None:
+            yield from edges
+            return
+        for batch in edges:
+            yield batch
+            if len(batch[0]):
+                self._report("match", done + (int(batch[0][-1]) + 1) / max(n2, 1), total)
+
+    def _report(self, stage: str, done: float, total: float):
+        if self.progress is not None:
+            self.progress(stage, done, total)
+
+    def _metal_loss_pair(self, y1: int, y2: int):
+        """Metal-loss frames and matcher arrays for a pair (y2 distance-corrected)."""
+        anoms1 = self.anomalies[y1]
+        anoms2 = self.anomalies[y2]
 
         # Filter to metal-loss type only
-        ml1 = anoms1[anoms1["event"].apply(_is_metal_loss)].copy()
-        ml2 = anoms2[anoms2["event"].apply(_is_metal_loss)].copy()
+        ml1 = anoms1[_event_mask(anoms1["event"], _is_metal_loss)].copy()
+        ml2 = anoms2[_event_mask(anoms2["event"], _is_metal_loss)].copy()
 
         # Apply distance correction if available
         corr_key = (y1, y2)
@@ -421,199 +1276,326 @@ class ILIDataset:
         else:
             ml2["corrected_dist"] = ml2["log_dist_ft"]
 
-        matched_pairs = []
-        used_y1 = set()
-        used_y2 = set()
-
-        # For each anomaly in y2, find best match in y1
-        for idx2, row2 in ml2.iterrows():
-            corr_dist = row2["corrected_dist"]
-            clock2 = row2.get("oclock_decimal")
-
-            best_score = -1
-            best_idx1 = None
-            candidates = 0
-
-            for idx1, row1 in ml1.iterrows():
-                if idx1 in used_y1:
-                    continue
-
-                dist1 = row1["log_dist_ft"]
-                dist_diff = abs(corr_dist - dist1)
-                if dist_diff > distance_tol:
-                    continue
-
-                # Clock check
-                clock1 = row1.get("oclock_decimal")
-                if clock1 is not None and clock2 is not None:
-                    clock_diff = _clock_distance(clock1, clock2)
-                    if clock_diff > clock_tol:
-                        continue
-                else:
-                    clock_diff = 0  # No clock data, don't penalize
-
-                candidates += 1
-
-                # Compute similarity score (0-1, higher = better match)
-                dist_score = 1.0 - (dist_diff / distance_tol)
-
-                clock_score = 1.0 - (clock_diff / clock_tol) if (clock1 is not None and clock2 is not None) else 0.5
-
-                depth1 = row1.get("depth_pct")
-                depth2 = row2.get("depth_pct")
-                if pd.notna(depth1) and pd.notna(depth2) and depth1 > 0:
-                    # Depth should grow or stay same; penalize shrinkage heavily
-                    depth_ratio = depth2 / depth1
-                    if depth_ratio >= 1.0:
-                        depth_score = max(0, 1.0 - abs(depth_ratio - 1.0) / 2.0)
-                    else:
-                        depth_score = max(0, depth_ratio - 0.3)  # Mild shrinkage ok (measurement error)
-                else:
-                    depth_score = 0.5
+        a1 = run_arrays(ml1)
+        a2 = run_arrays(ml2, dist=ml2["corrected_dist"].to_numpy(dtype=np.float64))
+        return ml1, ml2, a1, a2
 
-                total_score = (
-                    dist_weight * dist_score
-                    + clock_weight * clock_score
-                    + depth_weight * depth_score
-                )
-
-                if total_score > best_score:
-                    best_score = total_score
-                    best_idx1 = idx1
-
-            if best_idx1 is not None and best_score > 0.3:
-                row1 = ml1.loc[best_idx1]
-                confidence = "high" if best_score > 0.7 else ("medium" if best_score > 0.5 else "low")
-                matched_pairs.append({
-                    "y1_idx": best_idx1,
-                    "y2_idx": idx2,
-                    "y1_dist": float(row1["log_dist_ft"]),
-                    "y2_dist": float(row2["log_dist_ft"]),
-                    "y2_corrected_dist": float(corr_dist),
-                    "y1_joint": row1.get("joint_number"),
-                    "y2_joint": row2.get("joint_number"),
-                    "y1_depth_pct": row1.get("depth_pct"),
-                    "y2_depth_pct": row2.get("depth_pct"),
-                    "y1_length_in": row1.get("length_in"),
-                    "y2_length_in": row2.get("length_in"),
-                    "y1_width_in": row1.get("width_in"),
-                    "y2_width_in": row2.get("width_in"),
-                    "y1_clock": row1.get("oclock_decimal"),
-                    "y2_clock": row2.get("oclock_decimal"),
-                    "y1_event": row1.get("event"),
-                    "y2_event": row2.get("event"),
-                    "y1_id_od": row1.get("id_od"),
-                    "y2_id_od": row2.get("id_od"),
-                    "score": round(best_score, 3),
-                    "confidence": confidence,
-                })
-                used_y1.add(best_idx1)
-                used_y2.add(idx2)
-
-        # Identify new and missing anomalies
-        new_in_y2 = ml2[~ml2.index.isin(used_y2)]
-        missing_from_y1 = ml1[~ml1.index.isin(used_y1)]
-
-        matches_df = pd.DataFrame(matched_pairs)
-        self.matches[(y1, y2)] = matches_df
-
-        return {
-            "matched": len(matched_pairs),
-            "new_in_later_run": len(new_in_y2),
-            "missing_from_earlier_run": len(missing_from_y1),
-            "high_confidence": len([m for m in matched_pairs if m["confidence"] == "high"]),
-            "medium_confidence": len([m for m in matched_pairs if m["confidence"] == "medium"]),
-            "low_confidence": len([m for m in matched_pairs if m["confidence"] == "low"]),
+    def _assign_pair(self, y1, y2, ml1, ml2, a1, a2, edges, assignment: str) -> tuple[dict, pd.DataFrame]:
+        """Assign candidate edges and build the (summary, matches) for a pair."""
+        if assignment == "optimal":
+            seg1, seg2 = self._weld_segments(y1, y2, a1.dist, a2.dist)
+            i2, i1, scores = optimal_assign(edges, seg1, seg2)
+        else:
+            i2, i1, scores = greedy_assign(edges, len(ml1))
+        return self._pair_result(ml1, ml2, a2, i1, i2, scores)
+
+    @staticmethod
+    def _pair_result(ml1, ml2, a2, i1, i2, scores) -> tuple[dict, pd.DataFrame]:
+        """(summary, matches DataFrame) for accepted positional matches."""
+        matches_df = build_matches_frame(ml1, ml2, a2.dist, i1, i2, scores)
+
+        confidence = matches_df["confidence"] if len(matches_df) > 0 else pd.Series(dtype=object)
+        stats = {
+            "matched": len(matches_df),
+            "new_in_later_run": len(ml2) - len(i2),
+            "missing_from_earlier_run": len(ml1) - len(i1),
+            "high_confidence": int((confidence == "high").sum()),
+            "medium_confidence": int((confidence == "medium").sum()),
+            "low_confidence": int((confidence == "low").sum()),
             "total_y1_metal_loss": len(ml1),
             "total_y2_metal_loss": len(ml2),
         }
+        return stats, matches_df
+
+    def _match_cache_key(self, y1: int, y2: int, params: tuple) -> tuple | None:
+        # Keyed on the pair's own correction (both runs' content), so adding
+        # another run does not evict pairs it does not touch. Without an
+        # alignment we cannot tell if the inputs moved.
+        correction_key = self._correction_keys.get((y1, y2))
+        if self._stage_keys.get("align") is None or correction_key is None:
+            return None
+        return (y1, y2, params, correction_key)
+
+    def _cached_match(self, y1: int, y2: int, params: tuple) -> tuple[dict, pd.DataFrame] | None:
+        key = self._match_cache_key(y1, y2, params)
+        if key is None or key not in self._match_cache:
+            return None
+        self._match_cache.move_to_end(key)
+        return self._match_cache[key]
+
+    def _store_match(self, y1: int, y2: int, params: tuple, stats: dict, matches_df: pd.DataFrame):
+        key = self._match_cache_key(y1, y2, params)
+        if key is None:
+            return
+        self._match_cache[key] = (dict(stats), matches_df)
+        self._match_cache.move_to_end(key)
+        while len(self._match_cache) > MATCH_CACHE_SIZE:
+            self._match_cache.popitem(last=False)
+
+    def _weld_segments(
+        self, y1: int, y2: int, dist1: np.ndarray, corrected_dist2: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Girth-weld segment id of each anomaly, in y1 distance coordinates."""
+        welds = self.weld_matches.get((y1, y2))
+        if welds is None:
+            # Non-adjacent pair: y1's welds as aligned to the next run
+            later = [y for y in self.runs if y > y1]
+            welds = self.weld_matches.get((y1, min(later))) if later else None
+        if welds is None or welds.empty:
+            return np.zeros(len(dist1), dtype=np.int64), np.zeros(len(corrected_dist2), dtype=np.int64)
+        bounds = np.sort(welds["dist_y1"].to_numpy(dtype=np.float64))
+        return (
+            np.searchsorted(bounds, dist1, side="right"),
+            np.searchsorted(bounds, corrected_dist2, side="right"),
+        )
 
     # ------------------------------------------------------------------
     # Phase 3: Growth rate calculation
     # ------------------------------------------------------------------
 
-    def calculate_growth(self) -> dict:
-        """Compute growth rates for all matched anomaly pairs."""
-        year_gaps = {
-            (2007, 2015): 8,
-            (2015, 2022): 7,
-            (2007, 2022): 15,
-        }
-
+    def calculate_growth(self, workers: int = 1, severity_thresholds=None) -> dict:
+        """Compute growth rates for all matched anomaly pairs.
+
+        Rates are whole-column arithmetic over each matches table.
+        ``severity_thresholds`` is an optional {label: min depth growth %/yr}
+        table (default ``SEVERITY_THRESHOLDS``); rows above no threshold are
+        "normal". Changing it only re-runs this stage, not matching.
+        ``workers > 1`` computes the pairs in a process pool; each worker
+        only receives the pair's depth/length/width arrays.
+        """
+        self._writable()
+        thresholds = _severity_table(severity_thresholds)
+        self._invalidate("growth")
+        key = self._growth_key(thresholds)
+
+        pairs = [pair for pair, matches_df in self.matches.items() if not matches_df.empty]
+        tasks = []
+        for y1, y2 in pairs:
+            matches_df = self.matches[(y1, y2)]
+            arrays = [
+                float_column(matches_df, f"{prefix}_{col}")
+                for col in ("depth_pct", "length_in", "width_in")
+                for prefix in ("y1", "y2")
+            ]
+            tasks.append((*arrays, y2 - y1, thresholds))
+
+        labels = [label for label, _ in thresholds] + ["normal"]
         results = {}
-
-        for (y1, y2), matches_df in self.matches.items():
-            if matches_df.empty:
-                continue
-
-            gap = year_gaps.get((y1, y2), y2 - y1)
-            growth_rows = []
-
-            for _, row in matches_df.iterrows():
-                d1 = row.get("y1_depth_pct")
-                d2 = row.get("y2_depth_pct")
-                l1 = row.get("y1_length_in")
-                l2 = row.get("y2_length_in")
-                w1 = row.get("y1_width_in")
-                w2 = row.get("y2_width_in")
-
-                depth_growth = (d2 - d1) / gap if (pd.notna(d1) and pd.notna(d2)) else None
-                length_growth = (l2 - l1) / gap if (pd.notna(l1) and pd.notna(l2)) else None
-                width_growth = (w2 - w1) / gap if (pd.notna(w1) and pd.notna(w2)) else None
-
-                severity = "normal"
-                if depth_growth is not None:
-                    if depth_growth > 3.0:
-                        severity = "critical"
-                    elif depth_growth > 2.0:
-                        severity = "high"
-                    elif depth_growth > 1.0:
-                        severity = "moderate"
-
-                growth_rows.append({
-                    **row.to_dict(),
-                    "years_between": gap,
-                    "depth_growth_pct_yr": round(depth_growth, 3) if depth_growth is not None else None,
-                    "length_growth_in_yr": round(length_growth, 4) if length_growth is not None else None,
-                    "width_growth_in_yr": round(width_growth, 4) if width_growth is not None else None,
-                    "severity": severity,
-                })
-
-            growth_df = pd.DataFrame(growth_rows)
+        columns_per_pair = _run_tasks(
+            _growth_columns, tasks, workers, on_done=lambda n: self._report("growth", n, len(tasks)),
+        )
+        for (y1, y2), task, columns in zip(pairs, tasks, columns_per_pair):
+            growth_df = self.matches[(y1, y2)].copy()
+            growth_df["years_between"] = task[-2]
+            for name, values in columns.items():
+                growth_df[name] = values
             self.growth[(y1, y2)] = growth_df
+            self._query_indexes[(y1, y2)] = TableIndex(growth_df, _GROWTH_INDEX_COLUMNS)
 
             # Stats
-            valid_depth = growth_df["depth_growth_pct_yr"].dropna()
+            depth = columns["depth_growth_pct_yr"]
+            valid_depth = depth[~np.isnan(depth)]
+            counts = pd.Series(columns["severity"]).value_counts()
             results[f"{y1}->{y2}"] = {
                 "total_matched": len(growth_df),
-                "avg_depth_growth_pct_yr": round(float(valid_depth.mean()), 3) if len(valid_depth) > 0 else None,
+                "avg_depth_growth_pct_yr": round(float(pd.Series(valid_depth).mean()), 3) if len(valid_depth) > 0 else None,
                 "max_depth_growth_pct_yr": round(float(valid_depth.max()), 3) if len(valid_depth) > 0 else None,
-                "critical_count": int((growth_df["severity"] == "critical").sum()),
-                "high_count": int((growth_df["severity"] == "high").sum()),
-                "moderate_count": int((growth_df["severity"] == "moderate").sum()),
-                "normal_count": int((growth_df["severity"] == "normal").sum()),
+                **{f"{label}_count": int(counts.get(label, 0)) for label in labels},
             }
 
+        self._growth_ranking = GrowthRanking(self.growth)
+        self._record_stage("growth", key, results)
         return results
 
+    # ------------------------------------------------------------------
+    # Incremental pipeline: recompute only stale stages
+    # ------------------------------------------------------------------
+
+    def _invalidate(self, stage: str):
+        """Drop the artefacts and fingerprints of ``stage`` and everything after it."""
+        if stage == "load":
+            self._run_keys.clear()
+            self._run_dtypes.clear()
+            self._profile_pyramids.clear()
+            self._cluster_hierarchies.clear()
+            self._query_indexes.clear()
+        # Growth tables are rebuilt by any invalidation
+        for key in [k for k in self._query_indexes if isinstance(k, tuple)]:
+            del self._query_indexes[key]
+        if stage in ("load", "align"):
+            self._correction_keys.clear()
+        for later in _PIPELINE_STAGES[_PIPELINE_STAGES.index(stage):]:
+            self._stage_keys.pop(later, None)
+            self._stage_results.pop(later, None)
+            for attr in _STAGE_ARTEFACTS[later]:
+                value = getattr(self, attr)
+                if isinstance(value, _RunSubsets):
+                    # "runs" comes first in the tuple, so this binds the new dict
+                    setattr(self, attr, _RunSubsets(self.runs, self._run_dtypes))
+                else:
+                    setattr(self, attr, {} if isinstance(value, dict) else None)
+
+    def _record_stage(self, stage: str, key: str, result: Any):
+        self._stage_keys[stage] = key
+        self._stage_results[stage] = result
+
+    def stage_key(self, stage: str) -> str | None:
+        """Input fingerprint of a completed stage (None if stale or never run)."""
+        return self._stage_keys.get(stage)
+
+    def state_key(self) -> tuple:
+        """Fingerprints of all stages and the cluster forests cached with them.
+
+        Changes whenever a stage is rerun or dropped, or a cluster forest
+        is built, so the registry measures the dataset again.
+        """
+        forests = tuple((year, h.built()) for year, h in sorted(self._cluster_hierarchies.items()))
+        return (*(self._stage_keys.get(stage) for stage in _PIPELINE_STAGES), forests)
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def fork(self) -> ILIDataset:
+        """Writable copy sharing every frame and array, but no container.
+
+        Stages replace frames rather than edit them, so recomputing on the
+        copy never changes what readers of this dataset see.
+        """
+        work = copy.copy(self)
+        for name, value in vars(self).items():
+            if isinstance(value, OrderedDict):
+                setattr(work, name, OrderedDict(value))
+            elif isinstance(value, dict):
+                setattr(work, name, dict(value))
+        for name in ("references", "anomalies"):
+            value = getattr(self, name)
+            if isinstance(value, _RunSubsets):
+                setattr(work, name, value.rebind(work.runs, work._run_dtypes))
+        work.frozen = False
+        return work
+
+    def freeze(self) -> ILIDataset:
+        """Make the stages refuse to run on this dataset (it is being published)."""
+        self.frozen = True
+        return self
+
+    def _writable(self):
+        if self.frozen:
+            raise StaleSnapshotError("Snapshot is read-only; recompute on fork()")
+
+    def ensure_loaded(self, file_path: str | None = None) -> dict:
+        """Load ``file_path`` unless the same file content is already loaded."""
+        path = file_path or self._file_path
+        if path is None:
+            raise ValueError("No ILI data file given and none loaded")
+        if not Path(path).exists():
+            raise FileNotFoundError(f"ILI data file not found: {path}")
+        key = self._load_key(ili_cache.source_fingerprint(path))
+        if self._stage_keys.get("load") == key:
+            if self._file_path != path:
+                self._writable()
+                self._file_path = path
+            return self._stage_results["load"]
+        return self.load(path)
+
+    def ensure_aligned(self, file_path: str | None = None) -> dict:
+        """Weld alignment result, recomputed only if the loaded data changed."""
+        self.ensure_loaded(file_path)
+        if self._stage_keys.get("align") == _fingerprint(self._stage_keys.get("load")):
+            return self._stage_results["align"]
+        return self.align_welds()
+
+    def ensure_matched(self, file_path: str | None = None, workers: int = 1, **match_params) -> dict:
+        """Match result for ``match_params`` (match_anomalies keywords), reusing a fresh one."""
+        self.ensure_aligned(file_path)
+        bound = inspect.signature(self.match_anomalies).bind(**match_params)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        params.pop("workers")  # does not change the result
+        key = _fingerprint(self._stage_keys.get("align"), *params.values())
+        if self._stage_keys.get("match") == key:
+            return self._stage_results["match"]
+        return self.match_anomalies(**params, workers=workers)
+
+    def ensure_growth(
+        self, file_path: str | None = None, workers: int = 1,
+        severity_thresholds=None, **match_params,
+    ) -> dict:
+        """Growth statistics, recomputing only the stages whose inputs changed."""
+        self.ensure_matched(file_path, workers=workers, **match_params)
+        thresholds = _severity_table(severity_thresholds)
+        if self._stage_keys.get("growth") == self._growth_key(thresholds):
+            return self._stage_results["growth"]
+        return self.calculate_growth(workers=workers, severity_thresholds=thresholds)
+
+    def reuse_matched(self, file_path: str | None = None, workers: int = 1) -> dict:
+        """Current match result, whatever parameters built it.
+
+        Read paths use this so that a match run with non-default parameters
+        (e.g. ``assignment="optimal"``) is not replaced by a default one.
+        Matches with the defaults only when there is no fresh match stage.
+        """
+        self.ensure_aligned(file_path)
+        if "match" in self._stage_keys:
+            return self._stage_results["match"]
+        return self.ensure_matched(workers=workers)
+
+    def reuse_growth(self, file_path: str | None = None, workers: int = 1, severity_thresholds=None) -> dict:
+        """Growth statistics over the current matches (see ``reuse_matched``).
+
+        Without ``severity_thresholds`` the current growth stage is kept
+        whatever table binned it; the defaults apply only if there is none.
+        """
+        self.reuse_matched(file_path, workers=workers)
+        if severity_thresholds is None and "growth" in self._stage_keys:
+            return self._stage_results["growth"]
+        thresholds = _severity_table(severity_thresholds)
+        if self._stage_keys.get("growth") == self._growth_key(thresholds):
+            return self._stage_results["growth"]
+        return self.calculate_growth(workers=workers, severity_thresholds=thresholds)
+
+    def _growth_key(self, thresholds: tuple[tuple[str, float], ...]) -> str:
+        if thresholds == SEVERITY_THRESHOLDS:
+            return _fingerprint(self._stage_keys.get("match"))
+        return _fingerprint(self._stage_keys.get("match"), thresholds)
+
     # ------------------------------------------------------------------
     # Query helpers
     # ------------------------------------------------------------------
 
-    def get_top_growth(self, pair: tuple[int, int] | None = None, top_n: int = 20) -> list[dict]:
-        """Return the fastest-growing anomalies."""
+    def get_top_growth(self, pair: tuple[int, int] | None = None, top_n: int = 20, sort_by: str = "depth") -> list[dict]:
+        """Return the fastest-growing anomalies by ``sort_by`` ("depth", "length" or "width") rate.
+
+        Slices the ranking built by ``calculate_growth``, so only the
+        returned rows are read. Across pairs the rows come out as sorting
+        the concatenated growth tables would order them.
+        """
+        if sort_by not in GROWTH_METRICS:
+            raise ValueError(f"Unknown sort_by {sort_by!r}; expected one of {sorted(GROWTH_METRICS)}")
+        ranking = self._growth_ranking
+        if not self.growth or ranking is None:
+            return []
         if pair and pair in self.growth:
-            df = self.growth[pair]
-        else:
-            # Combine all pairs
-            dfs = list(self.growth.values())
-            if not dfs:
-                return []
-            df = pd.concat(dfs, ignore_index=True)
-
-        df = df.dropna(subset=["depth_growth_pct_yr"])
-        df = df.sort_values("depth_growth_pct_yr", ascending=False).head(top_n)
-        return df.to_dict(orient="records")
+            rows = ranking.top(sort_by, top_n, pair)
+            return self.growth[pair].iloc[rows].to_dict(orient="records")
+
+        tables, rows = ranking.top(sort_by, top_n)
+        # One slice per table (empty ones too, so columns and dtypes match a
+        # full concat), then back from table order to rank order
+        frames = list(self.growth.values())
+        grouped = np.argsort(tables, kind="stable")
+        df = pd.concat([frames[i].iloc[rows[tables == i]] for i in range(len(frames))], ignore_index=True)
+        rank = np.empty_like(grouped)
+        rank[grouped] = np.arange(len(grouped))
+        return df.iloc[rank].to_dict(orient="records")
+
+    def pipe_od_in(self) -> float | None:
+        """Median pipe outside diameter (in) over the runs that report one, or None."""
+        ods = [float_column(df, "pipe_od_in") for df in self.runs.values() if "pipe_od_in" in df.columns]
+        known = np.concatenate(ods) if ods else np.empty(0)
+        known = known[~np.isnan(known)]
+        return float(np.median(known)) if len(known) else None
 
     def get_summary_stats(self) -> dict:
         """Return overall pipeline summary statistics."""
@@ -624,7 +1606,7 @@ class ILIDataset:
 
         for year, df in self.runs.items():
             anoms = self.anomalies.get(year, pd.DataFrame())
-            ml = anoms[anoms["event"].apply(_is_metal_loss)] if len(anoms) > 0 else pd.DataFrame()
+            ml = anoms[_event_mask(anoms["event"], _is_metal_loss)] if len(anoms) > 0 else pd.DataFrame()
             depth_vals = ml["depth_pct"].dropna() if "depth_pct" in ml.columns else pd.Series(dtype=float)
 
             stats[f"run_{year}"] = {
@@ -641,38 +1623,110 @@ class ILIDataset:
 
         return stats
 
+    def memory_report(self) -> dict:
+        """Bytes held per run and per derived table (deep, including strings).
+
+        Frames shared between tables (e.g. cached and current matches) are
+        only counted once, in the first table listed.
+        """
+        seen: set[int] = set()
+
+        def frames_bytes(frames) -> int:
+            total = 0
+            for df in frames:
+                if df is not None and id(df) not in seen:
+                    seen.add(id(df))
+                    total += _frame_bytes(df)
+            return total
+
+        runs = {}
+        for year, df in sorted(self.runs.items()):
+            entry = {"rows": len(df), "columns": df.shape[1], "run_bytes": frames_bytes([df])}
+            for name, subsets in (("references", self.references), ("anomalies", self.anomalies)):
+                if isinstance(subsets, _RunSubsets):
+                    entry[f"{name}_bytes"] = subsets.nbytes(year) if year in subsets else 0
+                else:
+                    entry[f"{name}_bytes"] = frames_bytes([subsets.get(year)])
+            entry["total_bytes"] = entry["run_bytes"] + entry["references_bytes"] + entry["anomalies_bytes"]
+            runs[year] = entry
+
+        corrections = {id(c): c for c in [*self.correction_funcs.values(), *self._composed_corrections.values()]}
+        tables = {
+            "summary": frames_bytes([self.summary]),
+            "registered_runs": frames_bytes(df for df, _, _ in self._registered_runs.values()),
+            "weld_matches": frames_bytes(
+                [*self.weld_matches.values(), *(welds for _, welds, _ in self._pair_alignments.values())]
+            ),
+            "corrections": sum(c.x.nbytes + c.y.nbytes + c._slope.nbytes for c in corrections.values()),
+            "matches": frames_bytes(self.matches.values()),
+            "match_cache": frames_bytes(df for _, df in self._match_cache.values()),
+            "growth": frames_bytes(self.growth.values()),
+            "tracks": frames_bytes([self.tracks]),
+            "profile_pyramids": sum(p.nbytes for p in self._profile_pyramids.values()),
+            "cluster_hierarchies": sum(h.nbytes for h in self._cluster_hierarchies.values()),
+            "query_indexes": sum(ix.nbytes for ix in self._query_indexes.values()),
+            "growth_ranking": self._growth_ranking.nbytes if self._growth_ranking is not None else 0,
+        }
+        return {
+            "compact": self.compact,
+            "runs": runs,
+            "tables": tables,
+            "total_bytes": sum(r["total_bytes"] for r in runs.values()) + sum(tables.values()),
+        }
+
     def query_anomalies(self, filters: dict) -> list[dict]:
-        """Query anomalies with filters: year, joint_min, joint_max, min_depth, severity, limit."""
+        """Query anomalies (or growth rows of a pair) with filters.
+
+        Filters: year, pair (e.g. "2015->2022", growth rows), joint_min,
+        joint_max, dist_min, dist_max (ft), min_depth, max_depth (%),
+        clock_min, clock_max (o'clock sector; 11 to 1 wraps past 12),
+        severity (growth rows) and limit (default 50). Growth rows are
+        filtered on the later run's joint/distance/depth/clock. Each table
+        has sorted indexes (``ili_index``), so filters are binary searches.
+        """
         year = filters.get("year")
         pair_key = filters.get("pair")  # e.g. "2015->2022"
+        limit = filters.get("limit", 50)
 
         if pair_key and self.growth:
             # Query growth data
             parts = pair_key.split("->")
             key = (int(parts[0]), int(parts[1]))
             df = self.growth.get(key, pd.DataFrame())
-        elif year and year in self.anomalies:
-            df = self.anomalies[year].copy()
-        else:
-            # Default: combine all anomalies
-            dfs = [a.copy() for a in self.anomalies.values()]
-            df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
-
-        if df.empty:
+            if df.empty:
+                return []
+            if key not in self._query_indexes:
+                self._query_indexes[key] = TableIndex(df, _GROWTH_INDEX_COLUMNS)
+            rows = self._query_indexes[key].select(filters, limit)
+            return df.iloc[rows].to_dict(orient="records")
+
+        # One run, or by default all runs in order
+        years = [year] if year and year in self.anomalies else list(self.anomalies)
+        pieces = []
+        remaining = limit
+        for y in years:
+            if remaining <= 0:
+                break
+            if y not in self._query_indexes:
+                self._query_indexes[y] = TableIndex(self.anomalies[y], _ANOMALY_INDEX_COLUMNS)
+            rows = self._query_indexes[y].select(filters, remaining)
+            if len(rows):
+                if isinstance(self.anomalies, _RunSubsets):
+                    pieces.append(self.anomalies.take(y, rows))
+                else:
+                    pieces.append(self.anomalies[y].iloc[rows])
+                remaining -= len(rows)
+        if not pieces:
             return []
-
-        if "joint_min" in filters and "joint_number" in df.columns:
-            df = df[df["joint_number"] >= filters["joint_min"]]
-        if "joint_max" in filters and "joint_number" in df.columns:
-            df = df[df["joint_number"] <= filters["joint_max"]]
-        if "min_depth" in filters and "depth_pct" in df.columns:
-            df = df[df["depth_pct"] >= filters["min_depth"]]
-        if "severity" in filters and "severity" in df.columns:
-            df = df[df["severity"] == filters["severity"]]
-
-        limit = filters.get("limit", 50)
-        df = df.head(limit)
-
+        if len(years) == 1:
+            return pieces[0].to_dict(orient="records")
+
+        # Rows from several runs carry the union of their columns
+        columns = []
+        for y in years:
+            cols = self.anomalies.columns(y) if isinstance(self.anomalies, _RunSubsets) else self.anomalies[y].columns
+            columns.extend(c for c in cols if c not in columns)
+        df = pd.concat(pieces, ignore_index=True).reindex(columns=columns)
         return df.to_dict(orient="records")
 
     def get_alignment_data(self) -> dict:
@@ -702,8 +1756,49 @@ class ILIDataset:
 
         return result
 
+    def get_tracks(self, min_runs: int = 2, limit: int = 100, offset: int = 0) -> list[dict]:
+        """Anomaly tracks seen in at least ``min_runs`` runs, with per-run measurements."""
+        if self.tracks is None or self.tracks.empty:
+            return []
+        years = [c for c in self.tracks.columns if c not in ("track_id", "n_runs")]
+        page = self.tracks[self.tracks["n_runs"] >= min_runs].iloc[offset:offset + limit]
+
+        observations = {}
+        for year in years:
+            labels = page[year]
+            found = labels.notna().to_numpy()
+            cols = [c for c in ("log_dist_ft", "depth_pct", "oclock_decimal") if c in self.anomalies[year].columns]
+            values = self.anomalies[year].loc[labels[found].to_numpy(dtype=np.int64), cols]
+            observations[year] = (found, labels.to_numpy(), values.to_dict(orient="records"))
+
+        records = []
+        for row, (track_id, n_runs) in enumerate(zip(page["track_id"].tolist(), page["n_runs"].tolist())):
+            runs = {}
+            for year, (found, labels, values) in observations.items():
+                if found[row]:
+                    obs = values[int(found[:row].sum())]
+                    runs[str(year)] = {"idx": int(labels[row]), **{
+                        k: None if isinstance(v, float) and math.isnan(v) else v for k, v in obs.items()
+                    }}
+            records.append({"track_id": track_id, "n_runs": n_runs, "runs": runs})
+        return records
+
     def get_match_details(self, pair: str, limit: int = 100, offset: int = 0) -> list[dict]:
         """Return detailed match data for a run pair."""
+        df = self.match_details_frame(pair, limit=limit, offset=offset)
+        records = df.to_dict(orient="records")
+        # Clean NaN values for JSON serialization
+        for r in records:
+            for k, v in r.items():
+                if isinstance(v, float) and (math.isnan(v) or math.isinf(v)):
+                    r[k] = None
+        return records
+
+    def match_details_frame(self, pair: str, limit: int | None = 100, offset: int = 0) -> pd.DataFrame:
+        """Growth (or, before growth, matches) rows for a run pair such as "2015->2022".
+
+        ``limit=None`` returns every row from ``offset`` on.
+        """
         parts = pair.split("->")
         key = (int(parts[0]), int(parts[1]))
 
@@ -712,58 +1807,136 @@ class ILIDataset:
         elif key in self.matches:
             df = self.matches[key]
         else:
-            return []
+            return pd.DataFrame()
+        return df.iloc[offset:] if limit is None else df.iloc[offset:offset + limit]
+
+    # Profile columns left out of a point (rather than null) when missing
+    PROFILE_OPTIONAL = ("oclock", "joint")
+
+    def profile_pyramid(self, year: int) -> ProfilePyramid | None:
+        """Depth-profile tile pyramid for ``year`` (None if the run is unknown)."""
+        if year not in self._profile_pyramids:
+            if year not in self.anomalies:
+                return None
+            self._profile_pyramids[year] = self._build_pyramid(self.anomalies[year])
+        return self._profile_pyramids[year]
+
+    def cluster_hierarchy(self, year: int, min_samples: int | None = None) -> ClusterHierarchy | None:
+        """Cluster hierarchy of ``year``'s anomalies, answering epsilons up to ``HIERARCHY_REACH``.
+
+        Built on first use, with the forest for ``min_samples`` if given,
+        and kept until the run is ingested again. Building adds to the
+        memory the registry accounts for, so a published snapshot raises
+        ``StaleSnapshotError`` instead; build it under ``datasets.use``.
+        None if the run is unknown.
+        """
+        if year not in self.anomalies:
+            return None
+        hierarchy = self._cluster_hierarchies.get(year)
+        if hierarchy is None or (min_samples is not None and min_samples not in hierarchy.built()):
+            self._writable()
+            if hierarchy is None:
+                hierarchy = ClusterHierarchy(self.anomalies[year], self.pipe_od_in())
+                self._cluster_hierarchies[year] = hierarchy
+            if min_samples is not None:
+                hierarchy.forest(min_samples)
+        return hierarchy
+
+    @staticmethod
+    def _build_pyramid(anoms: pd.DataFrame) -> ProfilePyramid:
+        ml = anoms[_event_mask(anoms["event"], _is_metal_loss)] if len(anoms) else anoms
+        return ProfilePyramid(
+            float_column(ml, "log_dist_ft"), float_column(ml, "depth_pct"), ml.index.to_numpy(),
+        )
 
-        df = df.iloc[offset:offset + limit]
-        records = df.to_dict(orient="records")
-        # Clean NaN values for JSON serialization
-        for r in records:
-            for k, v in r.items():
-                if isinstance(v, float) and (math.isnan(v) or math.isinf(v)):
-                    r[k] = None
-        return records
+    def get_profile_data(
+        self, year: int, start_ft: float | None = None, end_ft: float | None = None,
+        max_points: int | None = None,
+    ) -> list[dict]:
+        """Return distance vs depth data for pipeline profile chart (see ``profile_frame``)."""
+        df = self.profile_frame(year, start_ft=start_ft, end_ft=end_ft, max_points=max_points)
+        result = []
+        for entry in df.to_dict(orient="records"):
+            for k in ("log_dist_ft", "depth_pct"):
+                if entry[k] != entry[k]:
+                    entry[k] = None
+            for k in self.PROFILE_OPTIONAL:
+                if k in entry and pd.isna(entry[k]):
+                    del entry[k]
+            result.append(entry)
+        return result
 
-    def get_profile_data(self, year: int) -> list[dict]:
-        """Return distance vs depth data for pipeline profile chart."""
+    def profile_frame(
+        self, year: int, start_ft: float | None = None, end_ft: float | None = None,
+        max_points: int | None = None,
+    ) -> pd.DataFrame:
+        """Metal-loss points for the profile chart, one row per anomaly.
+
+        Columns: log_dist_ft (2 dp), depth_pct (1 dp), event, and when the
+        run has them oclock (2 dp) and joint (nullable int). Missing
+        oclock/joint values are dropped from a point by the encoders, see
+        ``PROFILE_OPTIONAL``.
+
+        ``start_ft``/``end_ft`` restrict the points to a distance window.
+        When more than ``max_points`` remain, the window is cut into
+        ``max_points // 2`` equal-width bins and only the shallowest and
+        deepest anomaly of each bin are kept, which preserves the outline
+        of the depth profile. Zoomed-in windows with few enough points come
+        back at full resolution.
+        """
         if year not in self.anomalies:
-            return []
+            return pd.DataFrame()
 
         anoms = self.anomalies[year]
-        ml = anoms[anoms["event"].apply(_is_metal_loss)].copy()
-
+        ml = anoms[_event_mask(anoms["event"], _is_metal_loss)]
+        if start_ft is not None or end_ft is not None or max_points is not None:
+            dist = float_column(ml, "log_dist_ft")
+            if start_ft is not None or end_ft is not None:
+                lo = -np.inf if start_ft is None else start_ft
+                hi = np.inf if end_ft is None else end_ft
+                in_window = np.flatnonzero((dist >= lo) & (dist <= hi))
+                ml, dist = ml.iloc[in_window], dist[in_window]
+            if max_points is not None and len(ml) > max_points:
+                lo = start_ft if start_ft is not None else np.nanmin(dist)
+                hi = end_ft if end_ft is not None else np.nanmax(dist)
+                keep = _profile_extremes(dist, float_column(ml, "depth_pct"), lo, hi, max(1, max_points // 2))
+                ml = ml.iloc[keep]
         if ml.empty:
-            return []
-
-        result = []
-        for _, row in ml.iterrows():
-            entry: dict[str, Any] = {
-                "log_dist_ft": round(float(row["log_dist_ft"]), 2) if pd.notna(row.get("log_dist_ft")) else None,
-                "depth_pct": round(float(row["depth_pct"]), 1) if pd.notna(row.get("depth_pct")) else None,
-                "event": row.get("event"),
-            }
-            if "oclock_decimal" in row and pd.notna(row.get("oclock_decimal")):
-                entry["oclock"] = round(float(row["oclock_decimal"]), 2)
-            if "joint_number" in row and pd.notna(row.get("joint_number")):
-                entry["joint"] = int(row["joint_number"])
-            result.append(entry)
+            return pd.DataFrame()
 
-        return result
+        frame = pd.DataFrame({
+            "log_dist_ft": _round_like_python(float_column(ml, "log_dist_ft"), 2),
+            "depth_pct": _round_like_python(float_column(ml, "depth_pct"), 1),
+            "event": ml["event"].to_numpy(dtype=object),
+        })
+        if "oclock_decimal" in ml.columns:
+            frame["oclock"] = _round_like_python(float_column(ml, "oclock_decimal"), 2)
+        if "joint_number" in ml.columns:
+            frame["joint"] = pd.array(np.trunc(float_column(ml, "joint_number")), dtype="Float64").astype("Int64")
+        return frame
 
 
 # ---------------------------------------------------------------------------
-# Module-level singleton for reuse across tool calls
+# Datasets shared across tool calls and API requests
 # ---------------------------------------------------------------------------
 
-_dataset: ILIDataset | None = None
+datasets = DatasetRegistry(ILIDataset)
 
 
-def get_dataset() -> ILIDataset:
-    global _dataset
-    if _dataset is None:
-        _dataset = ILIDataset()
-    return _dataset
+def open_dataset(file_path: str) -> str:
+    """Load ``file_path`` (reusing it if already registered) and return its dataset id."""
+    return datasets.open(file_path)
+
+
+def get_dataset(dataset_id: str | None = None) -> ILIDataset:
+    """Dataset ``dataset_id`` (default: the last one opened).
+
+    Once a dataset has been recomputed through ``datasets.use`` this is its
+    published, read-only snapshot; run stages with ``datasets.use`` or
+    ``datasets.current``.
+    """
+    return datasets.get(dataset_id)
 
 
 def reset_dataset():
-    global _dataset
-    _dataset = None
+    datasets.clear()
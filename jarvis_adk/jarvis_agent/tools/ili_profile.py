@@ -0,0 +1,125 @@
+"""Multi-resolution tiles of a run's depth-vs-distance profile.
+
+A ``ProfilePyramid`` bins a run's metal-loss anomalies into fixed-width
+distance bins once, at the finest level, and derives every coarser
+level by merging neighbouring bin pairs. Level ``z`` covers the run with
+``2**z`` tiles of ``TILE_BINS`` bins each, so serving a tile while the
+dashboard zooms or pans is an array slice rather than a re-binning.
+
+Each bin holds the anomaly count, max and mean depth, and the index
+label of the deepest anomaly. ``fingerprint`` hashes the binned inputs,
+so tile ETags change exactly when a tile's data can.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+
+import numpy as np
+
+# Bins per tile at every level
+TILE_BINS = 256
+
+# The finest level is the first whose bins are at most this wide (ft)
+MIN_BIN_FT = 10.0
+
+# Upper bound on levels (2**MAX_LEVEL tiles at the finest level)
+MAX_LEVEL = 16
+
+
+class ProfilePyramid:
+    """Per-level bin arrays for one run's depth profile."""
+
+    def __init__(self, dist, depth, ids, min_bin_ft: float = MIN_BIN_FT):
+        dist = np.asarray(dist, dtype=np.float64)
+        depth = np.asarray(depth, dtype=np.float64)
+        ids = np.asarray(ids, dtype=np.int64)
+        placed = ~np.isnan(dist)
+        dist, depth, ids = dist[placed], depth[placed], ids[placed]
+
+        self.origin_ft = float(math.floor(dist.min())) if len(dist) else 0.0
+        extent = float(dist.max()) - self.origin_ft if len(dist) else 0.0
+        self.extent_ft = max(extent, 1.0)
+        self.max_level = min(MAX_LEVEL, max(0, math.ceil(math.log2(self.extent_ft / (TILE_BINS * min_bin_ft)))))
+
+        h = hashlib.sha1(np.array([self.origin_ft, self.extent_ft, self.max_level]).tobytes())
+        for values in (dist, depth, ids):
+            h.update(values.tobytes())
+        self.fingerprint = h.hexdigest()[:16]
+
+        # level → (count, depth_count, depth_sum, max_depth, deepest id)
+        self.levels: list[tuple[np.ndarray, ...]] = [None] * (self.max_level + 1)
+        self.levels[self.max_level] = self._finest(dist, depth, ids)
+        for level in range(self.max_level - 1, -1, -1):
+            self.levels[level] = self._coarsen(self.levels[level + 1])
+
+    def _finest(self, dist, depth, ids) -> tuple[np.ndarray, ...]:
+        n_bins = TILE_BINS * 2 ** self.max_level
+        width = self.extent_ft / n_bins
+        bins = np.clip(np.floor((dist - self.origin_ft) / width), 0, n_bins - 1).astype(np.int64)
+        has_depth = ~np.isnan(depth)
+
+        count = np.bincount(bins, minlength=n_bins)
+        depth_count = np.bincount(bins[has_depth], minlength=n_bins)
+        depth_sum = np.bincount(bins[has_depth], weights=depth[has_depth], minlength=n_bins)
+        max_depth = np.full(n_bins, np.nan)
+        deepest = np.full(n_bins, -1, dtype=np.int64)
+        if has_depth.any():
+            b, d, i = bins[has_depth], depth[has_depth], ids[has_depth]
+            # Deepest first within each bin; ties keep the earlier anomaly
+            order = np.lexsort((-d, b))
+            occupied, first = np.unique(b[order], return_index=True)
+            max_depth[occupied] = d[order[first]]
+            deepest[occupied] = i[order[first]]
+        return count, depth_count, depth_sum, max_depth, deepest
+
+    @staticmethod
+    def _coarsen(finer: tuple[np.ndarray, ...]) -> tuple[np.ndarray, ...]:
+        count, depth_count, depth_sum, max_depth, deepest = (a.reshape(-1, 2) for a in finer)
+        left = np.nan_to_num(max_depth[:, 0], nan=-np.inf)
+        right = np.nan_to_num(max_depth[:, 1], nan=-np.inf)
+        take_right = right > left
+        return (
+            count.sum(axis=1),
+            depth_count.sum(axis=1),
+            depth_sum.sum(axis=1),
+            np.fmax(max_depth[:, 0], max_depth[:, 1]),
+            np.where(take_right, deepest[:, 1], deepest[:, 0]),
+        )
+
+    def has_tile(self, level: int, tile: int) -> bool:
+        return 0 <= level <= self.max_level and 0 <= tile < 2 ** level
+
+    def tile(self, level: int, tile: int) -> dict:
+        """One tile's bins as parallel lists (empty bins: count 0, depths/ids null)."""
+        tile_ft = self.extent_ft / 2 ** level
+        rows = slice(tile * TILE_BINS, (tile + 1) * TILE_BINS)
+        count, depth_count, depth_sum, max_depth, deepest = (a[rows] for a in self.levels[level])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_depth = np.round(depth_sum / depth_count, 2)
+        return {
+            "level": level,
+            "tile": tile,
+            "start_ft": self.origin_ft + tile * tile_ft,
+            "end_ft": self.origin_ft + (tile + 1) * tile_ft,
+            "bin_ft": tile_ft / TILE_BINS,
+            "count": count,
+            "max_depth": max_depth,
+            "mean_depth": mean_depth,
+            "deepest_idx": [None if i < 0 else i for i in deepest.tolist()],
+        }
+
+    def describe(self) -> dict:
+        """Layout a client needs to address tiles."""
+        return {
+            "origin_ft": self.origin_ft,
+            "extent_ft": self.extent_ft,
+            "max_level": self.max_level,
+            "tile_bins": TILE_BINS,
+            "fingerprint": self.fingerprint,
+        }
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for arrays in self.levels for a in arrays)
@@ -0,0 +1,256 @@
+"""Registry of loaded ILI datasets, so one server can hold several workbooks.
+
+Datasets are keyed by source path plus content hash (``dataset_id``). If
+the same workbook is opened twice, both callers share one ``ILIDataset``.
+An edited copy gets its own dataset.
+
+Each entry publishes an immutable snapshot (a frozen ``ILIDataset``).
+Readers take the current snapshot without locking (``snapshot`` and
+``current``). Recomputation (``use``) runs on a ``fork()`` of the snapshot
+while holding the entry's lock, so writers to one dataset still run one
+at a time. When the block completes, the fork is frozen and swapped in
+with a single reference assignment. Readers that are already running
+keep the snapshot they started with, and a failed recomputation
+publishes nothing.
+
+Entries are kept in least-recently-used order. A dataset is measured
+(``memory_report()["total_bytes"]``) each time one of its pipeline stages
+changes. When the combined size exceeds ``max_bytes``, idle datasets are
+dropped oldest first. The default dataset and the most recently used one
+are never dropped. A later request for a dropped id reloads it from its
+source, which is cheap through the Parquet cache, as long as the content
+is unchanged.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from . import ili_cache
+
+# Combined size of registered datasets above which idle ones are evicted
+REGISTRY_MAX_BYTES = 2 << 30
+
+# Id of the dataset used before any workbook is opened (filled by its caller)
+DEFAULT_ID = "default"
+
+
+class StaleSnapshotError(RuntimeError):
+    """A stage would have to run on a published (read-only) snapshot."""
+
+
+class UnknownDatasetError(KeyError):
+    """No dataset is registered, or can be reloaded, under the requested id."""
+
+    def __str__(self) -> str:
+        return f"Unknown dataset: {self.args[0]}"
+
+
+def dataset_id(path: str | Path, sha256: str | None = None) -> str:
+    """Registry id of a source: its name plus a hash of its resolved path and content."""
+    path = Path(path).resolve()
+    sha256 = sha256 or ili_cache.source_fingerprint(path)
+    digest = hashlib.sha1(f"{path}\0{sha256}".encode()).hexdigest()[:12]
+    return f"{path.stem}-{digest}"
+
+
+class _Entry:
+    __slots__ = ("dataset", "path", "lock", "users", "loaded", "nbytes", "measured")
+
+    def __init__(self, dataset: Any, path: str | None):
+        self.dataset = dataset  # published snapshot
+        self.path = path
+        self.lock = threading.RLock()  # held by the one writer
+        self.users = 0          # requests currently holding the entry
+        self.loaded = path is None
+        self.nbytes = 0
+        self.measured: tuple | None = None  # dataset.state_key() when nbytes was taken
+
+
+class DatasetRegistry:
+    """Thread-safe id → dataset map with per-dataset locks and LRU eviction."""
+
+    def __init__(self, factory: Callable[[], Any], max_bytes: int = REGISTRY_MAX_BYTES):
+        self._factory = factory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()  # oldest first
+        self._sources: dict[str, str] = {}  # id → path, kept after eviction
+        self._default: str | None = None
+        self.evictions = 0
+
+    def open(self, path: str | Path, make_default: bool = True) -> str:
+        """Register and load the dataset for ``path`` and return its id."""
+        if not Path(path).exists():
+            raise FileNotFoundError(f"ILI data file not found: {path}")
+        key = dataset_id(path)
+        with self._lock:
+            self._sources[key] = str(path)
+            if make_default or self._default is None:
+                self._default = key
+        with self.use(key):
+            pass
+        return key
+
+    def snapshot(self, key: str | None = None) -> Any:
+        """Published dataset ``key`` (default: the last one opened), without locking.
+
+        Callers must not run stages on it; use ``current`` or ``use``.
+        """
+        key, entry = self._checkout(key)
+        try:
+            if not entry.loaded:
+                with self.use(key):
+                    pass
+            return entry.dataset
+        finally:
+            with self._lock:
+                entry.users -= 1
+
+    get = snapshot
+
+    def fingerprint(self, key: str | None = None) -> tuple[str, tuple]:
+        """``(id, state_key())`` of dataset ``key``; it changes whenever a stage is republished."""
+        with self._lock:
+            key = key or self._default or DEFAULT_ID
+        return key, self.snapshot(key).state_key()
+
+    def current(self, key: str | None, ensure: Callable[[Any], Any]) -> tuple[Any, Any]:
+        """``(dataset, ensure(dataset))`` for a snapshot on which ``ensure`` succeeds.
+
+        ``ensure`` (e.g. ``lambda ds: ds.ensure_growth(path)``) runs on the
+        published snapshot first. Only if it would have to compute something
+        (``StaleSnapshotError``) does it run again under ``use``, and the
+        result is then published.
+        """
+        ds = self.snapshot(key)
+        if ds.frozen:
+            try:
+                return ds, ensure(ds)
+            except StaleSnapshotError:
+                pass
+        with self.use(key) as ds:
+            return ds, ensure(ds)
+
+    @contextmanager
+    def use(self, key: str | None = None) -> Iterator[Any]:
+        """Recompute dataset ``key`` (default: the last one opened) in the ``with`` block.
+
+        Yields a writable fork of the snapshot, which is published when the
+        block exits normally and discarded if it raises.
+        """
+        key, entry = self._checkout(key)
+        try:
+            with entry.lock:
+                work = entry.dataset.fork()
+                if not entry.loaded:
+                    work.ensure_loaded(entry.path)
+                yield work
+                self._publish(entry, work)
+        finally:
+            with self._lock:
+                entry.users -= 1
+                self._evict()
+
+    def drop(self, key: str) -> bool:
+        """Forget dataset ``key``. Requests already holding it finish normally."""
+        with self._lock:
+            self._sources.pop(key, None)
+            if self._default == key:
+                self._default = None
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sources.clear()
+            self._default = None
+
+    def describe(self) -> dict:
+        """Registered datasets (most recently used first) and their sizes."""
+        with self._lock:
+            entries = [
+                {
+                    "id": key,
+                    "path": entry.path,
+                    "bytes": entry.nbytes,
+                    "in_use": entry.users > 0,
+                    "default": key == self._default,
+                }
+                for key, entry in reversed(self._entries.items())
+            ]
+            return {
+                "default": self._default,
+                "max_bytes": self.max_bytes,
+                "total_bytes": sum(e["bytes"] for e in entries),
+                "evictions": self.evictions,
+                "datasets": entries,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _checkout(self, key: str | None) -> tuple[str, _Entry]:
+        """Find (or re-create) the entry for ``key`` and count the caller as a user."""
+        with self._lock:
+            key = key or self._default or DEFAULT_ID
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.users += 1
+                self._entries.move_to_end(key)
+                return key, entry
+            path = self._sources.get(key)
+            if path is None and key != DEFAULT_ID:
+                raise UnknownDatasetError(key)
+
+        # Evicted: reload only if the source still has the content the id names
+        if path is not None:
+            try:
+                current = dataset_id(path)
+            except OSError:
+                current = None
+            if current != key:
+                raise UnknownDatasetError(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(self._factory(), path)
+                if self._default is None:
+                    self._default = key
+            entry.users += 1
+            self._entries.move_to_end(key)
+            return key, entry
+
+    @staticmethod
+    def _publish(entry: _Entry, work: Any):
+        """Swap in ``work`` as the snapshot; call with ``entry.lock`` held."""
+        state = work.state_key()
+        if state != entry.measured:
+            entry.nbytes = work.memory_report()["total_bytes"]
+            entry.measured = state
+        entry.dataset = work.freeze()
+        entry.loaded = True
+
+    def _evict(self):
+        """Drop idle entries, oldest first, until under ``max_bytes``.
+
+        The default and the most recently used entry are always kept, so a
+        dataset that was just opened is still there for the next request.
+        """
+        total = sum(entry.nbytes for entry in self._entries.values())
+        for key in list(self._entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.users or key == self._default:
+                continue
+            del self._entries[key]
+            total -= entry.nbytes
+            self.evictions += 1
@@ -0,0 +1,70 @@
+"""Coalescing of concurrent identical computations ("single flight").
+
+Several dashboard tabs or agent sessions often ask for the same pipeline
+result at the same moment. ``SingleFlight.do(stage, key, fn)`` runs
+``fn`` once per ``(stage, key)`` in flight: the first caller computes,
+and callers arriving before it finishes wait on the same future and get
+the same result (or the same exception). Nothing is cached past the
+call. Once the computation returns, the next caller runs ``fn`` again,
+and the stage caches of ``ILIDataset`` decide whether that is cheap.
+
+Keys should include the dataset fingerprint (``DatasetRegistry.fingerprint``)
+and every parameter that changes the result.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    """In-flight ``(stage, key)`` → future table with computed/saved counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[tuple[str, Hashable], Future] = {}
+        self.computed: Counter[str] = Counter()
+        self.saved: Counter[str] = Counter()  # callers served by another's computation
+
+    def do(self, stage: str, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """``fn()``, or the result of the identical call already running."""
+        flight = (stage, key)
+        with self._lock:
+            future = self._calls.get(flight)
+            leader = future is None
+            if leader:
+                future = self._calls[flight] = Future()
+                self.computed[stage] += 1
+            else:
+                self.saved[stage] += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[flight]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def describe(self) -> dict:
+        """Computations run and saved, overall and per stage."""
+        with self._lock:
+            stages = sorted(set(self.computed) | set(self.saved))
+            return {
+                "computed": sum(self.computed.values()),
+                "saved": sum(self.saved.values()),
+                "in_flight": len(self._calls),
+                "stages": {s: {"computed": self.computed[s], "saved": self.saved[s]} for s in stages},
+            }
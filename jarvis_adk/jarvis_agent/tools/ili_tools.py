@@ -10,7 +10,7 @@ import json
 import os
 from pathlib import Path
 
-from .ili_processing import get_dataset, reset_dataset
+from .ili_processing import SEVERITY_THRESHOLDS, datasets, open_dataset
 
 # Default path: ILIDataV2.xlsx at repo root
 _DEFAULT_FILE = str(Path(__file__).resolve().parent.parent.parent.parent / "ILIDataV2.xlsx")
@@ -19,8 +19,8 @@ _DEFAULT_FILE = str(Path(__file__).resolve().parent.parent.parent.parent / "ILID
 def ili_load_data(file_path: str = "") -> str:
     """Load ILI inspection data from an Excel file.
 
-    Reads the ILI Excel workbook (Summary, 2007, 2015, 2022 sheets),
-    normalises column names, and separates reference points from anomalies.
+    Reads the ILI Excel workbook (Summary plus one sheet per inspection
+    year, e.g. 2007, 2015, 2022), normalises column names, and separates reference points from anomalies.
 
     Args:
         file_path: Path to the ILI Excel file. Leave empty to use the default ILIDataV2.xlsx.
@@ -28,28 +28,27 @@ def ili_load_data(file_path: str = "") -> str:
     Returns:
         JSON summary with row counts, anomaly counts, and distance ranges per run.
     """
-    reset_dataset()
-    ds = get_dataset()
     path = file_path.strip() if file_path.strip() else _DEFAULT_FILE
-    result = ds.load(path)
+    with datasets.use(open_dataset(path)) as ds:
+        result = ds.ensure_loaded(path)
     return json.dumps(result, indent=2, default=str)
 
 
 def ili_align_runs() -> str:
     """Align ILI inspection runs by matching girth welds.
 
-    Matches girth welds across 2007, 2015, and 2022 runs by joint number,
-    then builds piecewise linear correction functions to compensate for
-    odometer drift between runs.
+    Matches girth welds between adjacent runs by joint number, then builds
+    piecewise linear correction functions to compensate for odometer drift
+    between runs (composed along the chain for non-adjacent runs).
 
     Returns:
         JSON with alignment quality metrics (matched welds, offsets, etc.).
     """
-    ds = get_dataset()
-    if not ds.runs:
-        return json.dumps({"error": "No data loaded. Call ili_load_data first."})
-    result = ds.align_welds()
-    return json.dumps(result, indent=2, default=str)
+    with datasets.use() as ds:
+        if not ds.runs:
+            return json.dumps({"error": "No data loaded. Call ili_load_data first."})
+        result = ds.align_welds()
+        return json.dumps(result, indent=2, default=str)
 
 
 def ili_match_anomalies() -> str:
@@ -62,13 +61,11 @@ def ili_match_anomalies() -> str:
     Returns:
         JSON with match counts, confidence breakdown, and new/missing counts per run pair.
     """
-    ds = get_dataset()
-    if not ds.runs:
-        return json.dumps({"error": "No data loaded. Call ili_load_data first."})
-    if not ds.correction_funcs:
-        ds.align_welds()
-    result = ds.match_anomalies()
-    return json.dumps(result, indent=2, default=str)
+    with datasets.use() as ds:
+        if not ds.runs:
+            return json.dumps({"error": "No data loaded. Call ili_load_data first."})
+        result = ds.ensure_matched()
+        return json.dumps(result, indent=2, default=str)
 
 
 def ili_growth_rates(sort_by: str = "depth", top_n: int = 20) -> str:
@@ -85,28 +82,31 @@ def ili_growth_rates(sort_by: str = "depth", top_n: int = 20) -> str:
     Returns:
         JSON with growth statistics and top fastest-growing anomalies.
     """
-    ds = get_dataset()
-    if not ds.matches:
-        return json.dumps({"error": "No matches found. Call ili_match_anomalies first."})
-
-    stats = ds.calculate_growth()
-    top = ds.get_top_growth(top_n=top_n)
-
-    # Clean NaN for JSON
-    clean_top = []
-    for item in top:
-        clean = {}
-        for k, v in item.items():
-            if isinstance(v, float) and (v != v):  # NaN check
-                clean[k] = None
-            else:
-                clean[k] = v
-        clean_top.append(clean)
+    with datasets.use() as ds:
+        if not ds.matches:
+            return json.dumps({"error": "No matches found. Call ili_match_anomalies first."})
+
+        stats = ds.reuse_growth(severity_thresholds=SEVERITY_THRESHOLDS)
+        try:
+            top = ds.get_top_growth(top_n=top_n, sort_by=sort_by.strip().lower())
+        except ValueError as e:
+            return json.dumps({"error": str(e)})
+
+        # Clean NaN for JSON
+        clean_top = []
+        for item in top:
+            clean = {}
+            for k, v in item.items():
+                if isinstance(v, float) and (v != v):  # NaN check
+                    clean[k] = None
+                else:
+                    clean[k] = v
+            clean_top.append(clean)
 
-    return json.dumps({
-        "statistics": stats,
-        "top_growing": clean_top,
-    }, indent=2, default=str)
+        return json.dumps({
+            "statistics": stats,
+            "top_growing": clean_top,
+        }, indent=2, default=str)
 
 
 def ili_query(query: str) -> str:
@@ -118,6 +118,8 @@ def ili_query(query: str) -> str:
     - "new in 2022" — anomalies only in 2022 (not matched to earlier run)
     - "joint 400 to 600" — anomalies in joint range
     - "depth > 40" — anomalies with depth above threshold
+    - "distance 1000 to 2500" — anomalies in a log-distance window (ft)
+    - "clock 11 to 1" — anomalies in an o'clock sector (wraps past 12)
     - "critical" / "high" / "moderate" — by severity level
     - "profile 2022" — depth-vs-distance data for charting
 
@@ -127,9 +129,12 @@ def ili_query(query: str) -> str:
     Returns:
         JSON results matching the query.
     """
-    ds = get_dataset()
-    q = query.strip().lower()
+    with datasets.use() as ds:
+        return _query(ds, query.strip().lower())
+
 
+def _query(ds, q: str) -> str:
+    """``ili_query`` on a dataset the caller holds."""
     if "summary" in q or "stats" in q or "overview" in q:
         return json.dumps(ds.get_summary_stats(), indent=2, default=str)
 
@@ -150,13 +155,15 @@ def ili_query(query: str) -> str:
             clean.append(r)
         return json.dumps(clean, indent=2, default=str)
 
+    years = sorted(ds.runs, reverse=True)
+
     if "profile" in q:
-        for year in [2022, 2015, 2007]:
+        for year in years:
             if str(year) in q:
-                data = ds.get_profile_data(year)
-                return json.dumps(data[:200], indent=2, default=str)
-        data = ds.get_profile_data(2022)
-        return json.dumps(data[:200], indent=2, default=str)
+                data = ds.get_profile_data(year, max_points=200)
+                return json.dumps(data, indent=2, default=str)
+        data = ds.get_profile_data(years[0], max_points=200) if years else []
+        return json.dumps(data, indent=2, default=str)
 
     if "alignment" in q or "weld" in q or "correction" in q:
         return json.dumps(ds.get_alignment_data(), indent=2, default=str)
@@ -165,7 +172,7 @@ def ili_query(query: str) -> str:
     filters: dict = {"limit": 50}
 
     if "new" in q:
-        for year in [2022, 2015]:
+        for year in years[:-1]:
             if str(year) in q:
                 filters["year"] = year
                 break
@@ -186,9 +193,19 @@ def ili_query(query: str) -> str:
     if depth_match:
         filters["min_depth"] = float(depth_match.group(1))
 
+    dist_match = re.search(r"(?:distance|dist)\s*(\d+(?:\.\d+)?)\s*(?:ft)?\s*(?:to|-)\s*(\d+(?:\.\d+)?)", q)
+    if dist_match:
+        filters["dist_min"] = float(dist_match.group(1))
+        filters["dist_max"] = float(dist_match.group(2))
+
+    clock_match = re.search(r"clock\s*(\d+(?:\.\d+)?)\s*(?:to|-)\s*(\d+(?:\.\d+)?)", q)
+    if clock_match:
+        filters["clock_min"] = float(clock_match.group(1))
+        filters["clock_max"] = float(clock_match.group(2))
+
     # Try growth data first, fall back to raw anomalies
-    if "pair" not in filters and ds.growth:
-        filters["pair"] = "2015->2022"
+    if "pair" not in filters and ds.growth and len(years) >= 2:
+        filters["pair"] = f"{years[1]}->{years[0]}"
 
     result = ds.query_anomalies(filters)
     clean = []
@@ -1,5 +1,7 @@
 """Verify ILI API endpoints return expected responses."""
 
+import json
+import time
 from pathlib import Path
 from urllib.parse import quote
 
@@ -10,7 +12,7 @@ ILIData_PATH = PROJECT_ROOT / "ILIDataV2.xlsx"
 
 
 def test_api_endpoints():
-    from ili_api import app
+    from ili_api import app, datasets
     client = TestClient(app)
     # URL-encode path for query param (Windows backslashes, etc.)
     data_path = quote(str(ILIData_PATH), safe="")
@@ -22,8 +24,17 @@ def test_api_endpoints():
     assert "runs" in body
     assert "pipeline_length_ft" in body
     assert body["pipeline_length_ft"] > 0
+    dataset = body["dataset"]
     print("[OK] GET /ili/load")
 
+    r = client.get("/ili/datasets")
+    assert r.status_code == 200
+    assert r.json()["default"] == dataset
+    assert client.get(f"/ili/summary?dataset={dataset}").json() == client.get("/ili/summary").json()
+    r = client.get("/ili/summary?dataset=no-such-dataset")
+    assert r.status_code == 404 and "error" in r.json()
+    print("[OK] GET /ili/datasets")
+
     r = client.get("/ili/summary")
     assert r.status_code == 200
     body = r.json()
@@ -47,6 +58,18 @@ def test_api_endpoints():
         assert "missing_from_earlier_run" in v
     print("[OK] GET /ili/match")
 
+    r = client.get("/ili/match-sweep?distance_tol=2&distance_tol=3&clock_tol=1.5")
+    assert r.status_code == 200
+    grid = r.json()["grid"]
+    assert len(grid) == 2
+    assert grid[1]["pairs"] == client.get("/ili/match").json()
+    print("[OK] GET /ili/match-sweep")
+
+    r = client.get("/ili/tracks?min_runs=3&limit=5")
+    assert r.status_code == 200
+    assert all(len(t["runs"]) == 3 for t in r.json())
+    print("[OK] GET /ili/tracks")
+
     r = client.get("/ili/growth?top_n=5")
     assert r.status_code == 200
     body = r.json()
@@ -54,6 +77,11 @@ def test_api_endpoints():
     assert "top_growing" in body
     print("[OK] GET /ili/growth")
 
+    r = client.get("/ili/memory")
+    assert r.status_code == 200
+    assert r.json()["total_bytes"] > 0
+    print("[OK] GET /ili/memory")
+
     r = client.get("/ili/alignment-data")
     assert r.status_code == 200
     body = r.json()
@@ -61,18 +89,69 @@ def test_api_endpoints():
     assert "corrections" in body
     print("[OK] GET /ili/alignment-data")
 
+    from jarvis_agent.tools.ili_processing import get_dataset
+    ds = get_dataset()
+
     r = client.get("/ili/matches/2015->2022?limit=10&offset=0")
     assert r.status_code == 200
     body = r.json()
     assert isinstance(body, list)
+    assert body == ds.get_match_details("2015->2022", limit=10)
     print("[OK] GET /ili/matches/{pair}")
 
     r = client.get("/ili/profile/2022")
     assert r.status_code == 200
     body = r.json()
     assert isinstance(body, list)
+    assert body == ds.get_profile_data(2022)
     print("[OK] GET /ili/profile/{year}")
 
+    layout = client.get("/ili/profile-tiles/2022").json()
+    r = client.get(f"/ili/profile-tiles/2022/{layout['max_level']}/0")
+    assert r.status_code == 200
+    assert client.get("/ili/profile-tiles/2022/0/0").json()["count"] is not None
+    r2 = client.get(f"/ili/profile-tiles/2022/{layout['max_level']}/0", headers={"If-None-Match": r.headers["etag"]})
+    assert r2.status_code == 304
+    assert client.get("/ili/profile-tiles/2022/0/1").status_code == 404
+    print("[OK] GET /ili/profile-tiles")
+
+    r = client.get("/ili/export/profile/2022")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in r.text.splitlines()] == ds.get_profile_data(2022)
+    r = client.get("/ili/export/matches/2015->2022?format=csv")
+    assert r.status_code == 200
+    assert len(r.text.splitlines()) == len(ds.growth[(2015, 2022)]) + 1
+    print("[OK] GET /ili/export/{matches,profile}")
+
+    r = client.post("/ili/jobs?workers=1")
+    assert r.status_code == 202
+    job_id = r.json()["id"]
+    for _ in range(600):
+        status = client.get(f"/ili/jobs/{job_id}").json()
+        if status["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.05)
+    assert status["status"] == "done" and status["percent"] == 100.0, status
+    assert set(status["stages"]) == {"load", "align", "match", "growth"}
+    assert client.get(f"/ili/jobs/{job_id}/result").json()["matching"] == client.get("/ili/match").json()
+    assert client.delete(f"/ili/jobs/{job_id}").json()["cancelled"] is False
+    assert client.get("/ili/jobs/nope").status_code == 404
+    print("[OK] /ili/jobs")
+
+    r = client.get("/ili/run-all/stream")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):]) for line in r.text.splitlines() if line.startswith("data: ")]
+    assert events[0]["event"] == "job" and events[-1]["event"] == "done"
+    ends = {e["stage"]: e for e in events if e["event"] == "stage_end"}
+    assert list(ends) == ["load", "align", "match", "growth"]
+    assert {**ends["load"]["result"], "dataset": client.get("/ili/load").json()["dataset"]} == client.get("/ili/load").json()
+    assert ends["match"]["result"] == client.get("/ili/match").json()
+    replay = client.get(f"/ili/jobs/{events[0]['job']['id']}/events", headers={"Last-Event-ID": "2"})
+    assert replay.text.startswith("id: 3\n")
+    print("[OK] GET /ili/run-all/stream")
+
     # run-all: same as load+align+match+growth in one call; structure verified by steps above
     r = client.get("/ili/run-all")
     assert r.status_code == 200, r.text
@@ -81,6 +160,26 @@ def test_api_endpoints():
     assert "growth" in body and "top_growing" in body and "summary" in body
     print("[OK] GET /ili/run-all")
 
+    r = client.get("/ili/clusters?year=2022&epsilon=25&min_samples=3")
+    assert r.status_code == 200 and all(k.startswith("cluster_") for k in r.json())
+    r = client.get("/ili/clusters?year=2022&min_samples=3&epsilons=5,25,50")
+    counts = r.json()["counts"]
+    assert [c["epsilon"] for c in counts] == [5.0, 25.0, 50.0]
+    assert counts[1]["clusters"] == len(client.get("/ili/clusters?year=2022&epsilon=25&min_samples=3").json())
+    # Cached with the published snapshot (and measured); wider epsilons are one-off
+    assert 3 in datasets.snapshot(None).cluster_hierarchy(2022).built()
+    wide = client.get("/ili/clusters?year=2022&min_samples=3&epsilons=50,400").json()["counts"]
+    assert wide[0] == counts[2]
+    assert wide[1]["clusters"] == len(client.get("/ili/clusters?year=2022&epsilon=400&min_samples=3").json())
+    assert datasets.snapshot(None).cluster_hierarchy(2022).reach == 200.0
+    assert client.get("/ili/clusters?year=2022&epsilon=5000").status_code == 422
+    assert "error" in client.get("/ili/clusters?year=2022&epsilons=5,5000").json()
+    print("[OK] GET /ili/clusters")
+
+    stats = client.get("/ili/singleflight").json()
+    assert stats["in_flight"] == 0 and stats["stages"]["run-all"]["computed"] >= 1
+    print("[OK] GET /ili/singleflight")
+
     print("\nAll API endpoint checks passed.")
 
 
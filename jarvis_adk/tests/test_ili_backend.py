@@ -19,6 +19,8 @@ def test_backend():
     assert "runs" in load_result
     assert "pipeline_length_ft" in load_result
     assert load_result["pipeline_length_ft"] > 0
+    # Unrounded, unlike the per-run max_distance_ft
+    assert load_result["pipeline_length_ft"] == max(float(df["log_dist_ft"].max()) for df in ds.runs.values())
     runs = load_result["runs"]
     assert len(runs) >= 2, "Need at least 2 runs"
     for year, run_info in runs.items():
@@ -95,5 +97,235 @@ def test_backend():
     print("\nAll backend verification checks passed.")
 
 
+def test_incremental_stages():
+    from jarvis_agent.tools.ili_processing import ILIDataset
+
+    ds = ILIDataset()
+    ds.ensure_growth(str(ILIData_PATH))
+    keys = {s: ds.stage_key(s) for s in ("load", "align", "match", "growth")}
+    assert all(keys.values())
+
+    # Same inputs: nothing recomputes
+    ds.ensure_matched(str(ILIData_PATH))
+    assert {s: ds.stage_key(s) for s in keys} == keys
+
+    # New tolerance: only match (and growth, once asked for) go stale
+    ds.ensure_matched(str(ILIData_PATH), distance_tol=2.0)
+    assert ds.stage_key("load") == keys["load"]
+    assert ds.stage_key("align") == keys["align"]
+    assert ds.stage_key("match") != keys["match"]
+    assert ds.stage_key("growth") is None and not ds.growth
+    print("[OK] Incremental stages: only stale stages recompute")
+
+
+def test_reads_reuse_current_match_stage():
+    from jarvis_agent.tools.ili_processing import ILIDataset
+
+    ds = ILIDataset()
+    optimal = ds.ensure_matched(str(ILIData_PATH), assignment="optimal")
+    match_key = ds.stage_key("match")
+    ds.freeze()
+
+    # Non-default match params stay; growth is computed over them
+    assert ds.reuse_matched(str(ILIData_PATH)) is optimal
+    ds.frozen = False
+    stats = ds.reuse_growth(str(ILIData_PATH))
+    assert ds.stage_key("match") == match_key
+    assert stats["2015->2022"]["total_matched"] == optimal["2015->2022"]["matched"]
+
+    # Nothing matched yet: the defaults are used
+    fresh = ILIDataset()
+    assert fresh.reuse_matched(str(ILIData_PATH)) == fresh.ensure_matched(str(ILIData_PATH))
+    print("[OK] Reads reuse the current match stage")
+
+
+def test_reads_keep_custom_severity_thresholds():
+    from jarvis_agent.tools.ili_processing import ILIDataset
+
+    ds = ILIDataset()
+    custom = ds.reuse_growth(str(ILIData_PATH), severity_thresholds={"watch": 0.5, "severe": 2.5})
+    growth_key = ds.stage_key("growth")
+    ds.freeze()
+
+    assert ds.reuse_growth(str(ILIData_PATH)) is custom
+    assert set(ds.growth[(2015, 2022)]["severity"]) <= {"watch", "severe", "normal"}
+    ds.frozen = False
+    default = ds.reuse_growth(str(ILIData_PATH), severity_thresholds=None)
+    assert default is custom and ds.stage_key("growth") == growth_key
+    assert "critical_count" in ds.ensure_growth(str(ILIData_PATH))["2015->2022"]
+    print("[OK] Reads keep custom severity thresholds")
+
+
+def test_register_run_extends_tracks():
+    import pandas as pd
+    from jarvis_agent.tools.ili_processing import ILIDataset
+
+    ds = ILIDataset()
+    ds.ensure_growth(str(ILIData_PATH))
+    old_pairs = dict(ds.matches)
+
+    # A fourth run: the 2022 sheet with 0.1% odometer stretch
+    raw = pd.read_excel(ILIData_PATH, "2022")
+    dist_col = next(c for c in raw.columns if "Wheel Count" in c)
+    raw[dist_col] = raw[dist_col] * 1.001
+    ds.register_run(2026, raw)
+
+    stats = ds.ensure_growth(str(ILIData_PATH))
+    assert sorted(ds.runs) == [2007, 2015, 2022, 2026]
+    assert set(stats) == {"2007->2015", "2015->2022", "2022->2026", "2007->2026"}
+    # Untouched adjacent pairs come from the match cache, not a re-match
+    assert ds.matches[(2015, 2022)] is old_pairs[(2015, 2022)]
+    assert (2007, 2026) in ds.correction_funcs
+    assert ds.tracks["n_runs"].max() == 4
+    assert ds.get_tracks(min_runs=4, limit=1)[0]["runs"].keys() == {"2007", "2015", "2022", "2026"}
+    print("[OK] Registered run: only new pairs aligned/matched, tracks span 4 runs")
+
+
+def test_tally_csv_directory_matches_workbook(tmp_path):
+    import pandas as pd
+    from jarvis_agent.tools.ili_processing import ILIDataset
+
+    runs_dir = tmp_path / "tallies"
+    runs_dir.mkdir()
+    for year in (2015, 2022):
+        pd.read_excel(ILIData_PATH, str(year)).to_csv(runs_dir / f"tally_{year}.csv", index=False)
+
+    ref = ILIDataset()
+    ref.load(str(ILIData_PATH))
+    ref.align_welds()
+    expected = ref.match_anomalies()["2015->2022"]
+
+    for use_cache in (True, True, False):  # cold stream, cache hit, in-memory
+        ds = ILIDataset()
+        result = ds.load(str(runs_dir), use_cache=use_cache, chunk_rows=500)
+        assert sorted(result["runs"]) == [2015, 2022]
+        ds.align_welds()
+        assert ds.match_anomalies()["2015->2022"] == expected
+    print("[OK] Tally CSV directory: streamed load matches the workbook")
+
+
+def test_compact_dataset_gives_same_results():
+    import pandas as pd
+    from jarvis_agent.tools.ili_processing import ILIDataset
+
+    full = ILIDataset()
+    compact = ILIDataset(compact=True)
+    for ds in (full, compact):
+        ds.ensure_growth(str(ILIData_PATH))
+    assert compact._stage_results == full._stage_results
+    for pair, growth_df in full.growth.items():
+        pd.testing.assert_frame_equal(compact.growth[pair], growth_df)
+    assert compact.runs[2022]["event"].dtype == "category"
+    assert compact.anomalies[2022]["event"].dtype == full.anomalies[2022]["event"].dtype
+
+    report, full_report = compact.memory_report(), full.memory_report()
+    assert report["runs"][2022]["anomalies_bytes"] == len(compact.runs[2022])
+    assert report["total_bytes"] < full_report["total_bytes"]
+    print("[OK] Compact dataset: same results, smaller runs")
+
+
+def test_profile_level_of_detail():
+    import numpy as np
+    from jarvis_agent.tools.ili_processing import ILIDataset
+
+    ds = ILIDataset()
+    ds.load(str(ILIData_PATH))
+    full = ds.get_profile_data(2022)
+
+    coarse = ds.get_profile_data(2022, max_points=100)
+    assert 0 < len(coarse) <= 100
+    assert max(p["depth_pct"] for p in coarse) == max(p["depth_pct"] for p in full)
+    assert all(p in full for p in coarse)
+
+    window = ds.get_profile_data(2022, start_ft=1000.0, end_ft=3000.0, max_points=1000)
+    assert window == [p for p in full if 1000.0 <= p["log_dist_ft"] <= 3000.0]
+    print("[OK] Profile LOD: capped overview keeps extremes, zoomed window is full resolution")
+
+    pyramid = ds.profile_pyramid(2022)
+    top = pyramid.tile(0, 0)
+    assert top["count"].sum() == len(full)
+    assert np.nanmax(top["max_depth"]) == max(p["depth_pct"] for p in full)
+    finest = [pyramid.tile(pyramid.max_level, t)["count"] for t in range(2 ** pyramid.max_level)]
+    assert np.concatenate(finest).reshape(256, -1).sum(axis=1).tolist() == top["count"].tolist()
+    print("[OK] Profile pyramid: levels consistent")
+
+
+def test_query_anomalies_indexed_filters():
+    from jarvis_agent.tools.ili_processing import ILIDataset
+
+    ds = ILIDataset()
+    ds.ensure_growth(str(ILIData_PATH))
+    anoms = ds.anomalies[2022]
+
+    rows = ds.query_anomalies({"year": 2022, "joint_min": 400, "joint_max": 600, "min_depth": 20, "limit": 10_000})
+    expected = anoms[anoms["joint_number"].between(400, 600) & (anoms["depth_pct"] >= 20)]
+    assert [r["log_dist_ft"] for r in rows] == expected["log_dist_ft"].tolist()
+
+    sector = ds.query_anomalies({"year": 2022, "clock_min": 11, "clock_max": 1, "limit": 10_000})
+    assert sector and all(r["oclock_decimal"] >= 11 or r["oclock_decimal"] <= 1 for r in sector)
+
+    critical = ds.query_anomalies({"pair": "2015->2022", "severity": "critical", "limit": 10_000})
+    assert len(critical) == ds.ensure_growth()["2015->2022"]["critical_count"]
+    print("[OK] Indexed anomaly queries")
+
+
+def test_top_growth_ranking_matches_full_sort():
+    import pandas as pd
+    import pytest
+    from jarvis_agent.tools.ili_index import GROWTH_METRICS
+    from jarvis_agent.tools.ili_processing import ILIDataset
+
+    ds = ILIDataset()
+    ds.ensure_growth(str(ILIData_PATH))
+
+    def full_sort(pair, top_n, column):
+        df = ds.growth[pair] if pair else pd.concat(list(ds.growth.values()), ignore_index=True)
+        df = df.dropna(subset=[column])
+        return df.sort_values(column, ascending=False).head(top_n).to_dict(orient="records")
+
+    for metric, column in GROWTH_METRICS.items():
+        for pair in (None, *ds.growth):
+            for top_n in (1, 30, 10_000):
+                top = ds.get_top_growth(pair, top_n=top_n, sort_by=metric)
+                assert pd.DataFrame(top).equals(pd.DataFrame(full_sort(pair, top_n, column))), (metric, pair, top_n)
+    with pytest.raises(ValueError):
+        ds.get_top_growth(sort_by="severity")
+
+    # Re-binning rebuilds the tables, and the ranking with them
+    ds.ensure_growth(severity_thresholds={"critical": 0.5})
+    assert pd.DataFrame(ds.get_top_growth(top_n=5)).equals(pd.DataFrame(full_sort(None, 5, "depth_growth_pct_yr")))
+    assert ds.get_top_growth(top_n=5)[0]["severity"] == "critical"
+    print("[OK] Top growth ranking")
+
+
+def test_fork_leaves_published_snapshot_untouched():
+    import pytest
+    from jarvis_agent.tools.ili_processing import ILIDataset
+    from jarvis_agent.tools.ili_registry import StaleSnapshotError
+
+    for compact in (False, True):
+        published = ILIDataset(compact=compact)
+        published.ensure_growth(str(ILIData_PATH))
+        published.freeze()
+        matches = dict(published.matches)
+        state = published.state_key()
+
+        # Up-to-date reads work on the frozen snapshot; recomputation does not
+        assert published.ensure_growth(str(ILIData_PATH)) is published._stage_results["growth"]
+        with pytest.raises(StaleSnapshotError):
+            published.ensure_matched(str(ILIData_PATH), distance_tol=2.0)
+
+        work = published.fork()
+        work.ensure_growth(str(ILIData_PATH), distance_tol=2.0)
+        work.load(str(ILIData_PATH), use_cache=False)
+        assert published.state_key() == state
+        assert published.matches.keys() == matches.keys()
+        assert all(published.matches[k] is df for k, df in matches.items())
+        assert len(published.anomalies[2022]) == len(work.anomalies[2022])
+    print("[OK] Fork leaves the published snapshot untouched")
+
+
 if __name__ == "__main__":
     test_backend()
+    test_incremental_stages()
+    test_register_run_extends_tracks()
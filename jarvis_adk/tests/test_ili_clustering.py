@@ -0,0 +1,132 @@
+"""Verify anomaly clustering: DBSCAN labels, wall geometry and cluster statistics."""
+
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+ILIData_PATH = PROJECT_ROOT / "ILIDataV2.xlsx"
+
+
+def _labels(df, epsilon, min_samples, pipe_od_in=None):
+    from jarvis_agent.tools.ili_clustering import dbscan_labels, iter_neighbour_pairs, wall_positions
+
+    pos = wall_positions(df, pipe_od_in)
+    pairs = list(iter_neighbour_pairs(pos, epsilon, batch_rows=64))
+    i = np.concatenate([p[0] for p in pairs]) if pairs else np.empty(0, dtype=np.int64)
+    j = np.concatenate([p[1] for p in pairs]) if pairs else np.empty(0, dtype=np.int64)
+    return pos, dbscan_labels(len(df), i, j, min_samples)
+
+
+def test_labels_match_sklearn_dbscan():
+    from sklearn.cluster import DBSCAN
+    from jarvis_agent.tools.ili_clustering import wall_distance
+
+    rng = np.random.default_rng(7)
+    n = 600
+    df = pd.DataFrame({
+        "log_dist_ft": rng.integers(0, 300, n).astype(float),
+        "oclock_decimal": rng.choice([0.2, 11.8, 3.0, 6.5, np.nan], n),
+        "pipe_od_in": rng.choice([24.0, 30.0, np.nan], n),
+        "wall_thickness_in": 0.375,
+    })
+    for epsilon, min_samples in ((0.5, 2), (1.5, 3), (4.0, 8)):
+        pos, labels = _labels(df, epsilon, min_samples)
+        i, j = np.triu_indices(n, 1)
+        matrix = np.zeros((n, n))
+        matrix[i, j] = matrix[j, i] = wall_distance(pos, i, j)
+        expected = DBSCAN(eps=epsilon, min_samples=min_samples, metric="precomputed").fit(matrix).labels_
+        assert (labels == expected).all(), (epsilon, min_samples)
+
+
+def test_clock_axis_wraps_and_uses_pipe_geometry():
+    from jarvis_agent.tools.ili_clustering import wall_distance, wall_positions
+
+    df = pd.DataFrame({
+        "log_dist_ft": [100.0, 100.0, 100.0, 100.0],
+        "oclock_decimal": [11.75, 0.25, 6.0, np.nan],
+        "pipe_od_in": [24.0, 24.0, np.nan, np.nan],
+        "wall_thickness_in": [0.5, 0.5, 0.5, 0.5],
+    })
+    pos = wall_positions(df, pipe_od_in=36.0)
+    circ_24 = math.pi * 23.5 / 12
+    assert pos.circ[0] == circ_24 and pos.circ[2] == math.pi * 35.5 / 12
+    d = wall_distance(pos, np.array([0, 0, 0]), np.array([1, 2, 3]))
+    # 11:45 and 00:15 are half an hour apart across 12, not 11.5 hours
+    assert math.isclose(d[0], circ_24 / 24)
+    assert math.isclose(d[1], 5.75 / 12 * (circ_24 + pos.circ[2]) / 2)
+    assert d[2] == 0.0  # no o'clock: axial separation only
+
+    _, labels = _labels(df.iloc[:3], epsilon=0.3, min_samples=2)
+    assert labels.tolist() == [0, 0, -1]
+
+
+def test_cluster_anomalies_on_workbook():
+    from jarvis_agent.tools.ili_clustering import cluster_anomalies
+    from jarvis_agent.tools.ili_processing import ILIDataset
+
+    ds = ILIDataset()
+    ds.ensure_loaded(str(ILIData_PATH))
+    assert ds.pipe_od_in() == 24.0
+    anoms = ds.anomalies[2022]
+    result = cluster_anomalies(anoms, epsilon=50.0, min_samples=3, pipe_od_in=ds.pipe_od_in())
+    assert result and list(result)[0] == "cluster_0"
+
+    _, labels = _labels(anoms, 50.0, 3, ds.pipe_od_in())
+    for name, cluster in result.items():
+        members = anoms.iloc[np.flatnonzero(labels == int(name.split("_")[1]))]
+        assert cluster["member_count"] == len(members) >= 1
+        assert cluster["span_start"] == round(float(members["log_dist_ft"].min()), 1)
+        depths = members["depth_pct"].dropna()
+        assert cluster["max_depth_pct"] == (round(float(depths.max()), 1) if len(depths) else 0)
+        assert cluster["total_length_in"] == round(float(members["length_in"].sum()), 1)
+        assert cluster["member_distances"] == [round(float(d), 1) for d in members["log_dist_ft"].head(10)]
+        assert 0 < cluster["risk_score"] <= 10.0
+    assert cluster_anomalies(anoms.iloc[:0]) == {}
+
+
+def test_hierarchy_cuts_match_direct_clustering():
+    from jarvis_agent.tools.ili_clustering import cluster_anomalies, cluster_stats
+    from jarvis_agent.tools.ili_processing import ILIDataset
+    from jarvis_agent.tools.ili_registry import StaleSnapshotError
+
+    ds = ILIDataset()
+    ds.ensure_loaded(str(ILIData_PATH))
+    hierarchy = ds.cluster_hierarchy(2015)
+    assert ds.cluster_hierarchy(2015) is hierarchy  # cached with the dataset
+    anoms = ds.anomalies[2015]
+    epsilons = [0.5, 5.0, 25.0, 50.0, 200.0]
+    for min_samples in (1, 2, 3, 6):
+        counts = hierarchy.counts(epsilons, min_samples)
+        for epsilon, count in zip(epsilons, counts):
+            direct = cluster_anomalies(anoms, epsilon=epsilon, min_samples=min_samples, pipe_od_in=ds.pipe_od_in())
+            assert cluster_stats(anoms, hierarchy.labels(epsilon, min_samples)) == direct, (epsilon, min_samples)
+            assert count["epsilon"] == epsilon and count["clusters"] == len(direct)
+    tight, loose = hierarchy.counts([1.0, 2.0], 1)
+    assert tight["clusters"] >= loose["clusters"]  # single linkage: clusters only merge
+
+    # The cached hierarchy never grows past its reach
+    with pytest.raises(ValueError):
+        hierarchy.labels(500.0, 3)
+    assert ds.cluster_hierarchy(2015, min_samples=3) is hierarchy and 3 in hierarchy.built()
+    assert ds.memory_report()["tables"]["cluster_hierarchies"] > 0
+
+    # Published snapshots only read cached hierarchies and forests
+    state = ds.state_key()
+    ds.freeze()
+    assert ds.cluster_hierarchy(2015, min_samples=3) is hierarchy
+    with pytest.raises(StaleSnapshotError):
+        ds.cluster_hierarchy(2015, min_samples=4)
+    with pytest.raises(StaleSnapshotError):
+        ds.cluster_hierarchy(2022)
+    work = ds.fork()
+    work.cluster_hierarchy(2022, min_samples=4)
+    assert work.state_key() != state
+
+    # Re-ingesting runs drops the cached hierarchies
+    work.load(str(ILIData_PATH))
+    assert work.cluster_hierarchy(2015) is not hierarchy
+    assert work.cluster_hierarchy(1999) is None
@@ -0,0 +1,53 @@
+"""Verify knot-array corrections against interp1d, composition and encoding."""
+
+import pickle
+
+import numpy as np
+from scipy.interpolate import interp1d
+
+
+def _knots(seed=0, n=200):
+    rng = np.random.default_rng(seed)
+    x = np.round(np.cumsum(rng.uniform(10, 60, n)), 3)
+    y = np.round(x + np.cumsum(rng.normal(0, 0.5, n)), 3)
+    return x, y
+
+
+def test_matches_interp1d_including_extrapolation():
+    from jarvis_agent.tools.ili_correction import Correction
+
+    x, y = _knots()
+    ref = interp1d(x, y, kind="linear", fill_value="extrapolate", bounds_error=False)
+    dist = np.concatenate([np.linspace(x[0] - 500, x[-1] + 500, 10_001), x])
+    assert np.array_equal(Correction(x, y)(dist), ref(dist))
+
+
+def test_compose_equals_chained_evaluation():
+    from jarvis_agent.tools.ili_correction import Correction
+
+    outer = Correction(*_knots(1))
+    inner = Correction(*_knots(2))
+    dist = np.linspace(-1000, 15_000, 20_001)
+    np.testing.assert_allclose(outer.compose(inner)(dist), outer(inner(dist)), rtol=0, atol=1e-8)
+
+    # Non-monotone inner: every fold maps back onto the outer knots
+    folded = Correction([0, 1, 2, 3], [0, 2, 1, 3])
+    bumpy = Correction([0, 0.5, 1.5, 2.5, 3], [0, 5, -1, 2, 0])
+    dist = np.linspace(-3, 6, 10_001)
+    np.testing.assert_allclose(bumpy.compose(folded)(dist), bumpy(folded(dist)), atol=1e-12)
+
+
+def test_encoding_roundtrip_is_lossless_and_small():
+    from jarvis_agent.tools.ili_correction import Correction
+
+    corr = Correction(*_knots(n=1600))
+    data = corr.to_bytes()
+    assert len(data) < 8 * len(corr)  # well under the 16 bytes/knot of raw float64
+    for restored in (Correction.from_bytes(data), pickle.loads(pickle.dumps(corr))):
+        assert np.array_equal(restored.x, corr.x)
+        assert np.array_equal(restored.y, corr.y)
+
+    # Off-grid knots fall back to raw float64, still exact
+    off_grid = Correction(corr.x + 1e-7, corr.y)
+    restored = Correction.from_bytes(off_grid.to_bytes())
+    assert np.array_equal(restored.x, off_grid.x)
@@ -0,0 +1,89 @@
+"""Verify background pipeline jobs: progress, timings, results and cancellation."""
+
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+ILIData_PATH = PROJECT_ROOT / "ILIDataV2.xlsx"
+
+
+def _wait(job, timeout=120):
+    deadline = time.time() + timeout
+    while job.finished is None and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_pipeline_job_reports_stages_and_progress():
+    from jarvis_agent.tools.ili_jobs import JobManager, run_pipeline
+    from jarvis_agent.tools.ili_processing import ILIDataset
+
+    seen = []
+    ds = ILIDataset()
+
+    def pipeline(job):
+        report = job.progress
+
+        def spy(stage, done, total):
+            seen.append((stage, done / total))
+            report(stage, done, total)
+
+        job.progress = spy
+        return run_pipeline(ds, str(ILIData_PATH), job)
+
+    job = _wait(JobManager().submit(pipeline))
+    info = job.describe()
+    assert info["status"] == "done", info["error"]
+    assert info["percent"] == 100.0
+    assert list(info["stages"]) == ["load", "align", "match", "growth"]
+    assert all(s["status"] == "done" and s["seconds"] >= 0 for s in info["stages"].values())
+    assert job.result["matching"] == ds.ensure_matched()
+    assert set(job.result) >= {"load", "alignment", "matching", "growth", "top_growing", "summary"}
+    # Matching reports from inside the pair loop, not just at its end
+    assert any(stage == "match" and 0 < frac < 1 for stage, frac in seen)
+    assert any(stage == "growth" for stage, _ in seen)
+    assert ds.progress is None
+
+    # The event log replays the run in order and ends with the final status
+    events = list(job.events())
+    assert [e["id"] for e in events] == list(range(1, len(events) + 1))
+    stage_events = [(e["event"], e["stage"]) for e in events if e["event"].startswith("stage_")]
+    assert stage_events == [(kind, s) for s in ("load", "align", "match", "growth") for kind in ("stage_start", "stage_end")]
+    ends = {e["stage"]: e for e in events if e["event"] == "stage_end"}
+    assert ends["load"]["result"] == job.result["load"] and ends["load"]["rows"] > 0
+    assert ends["align"]["result"] == job.result["alignment"]
+    assert ends["match"]["rows"] == sum(len(df) for df in ds.matches.values())
+    assert any(e["event"] == "progress" and e["stage"] == "match" for e in events)
+    assert {e["name"] for e in events if e["event"] == "partial"} == {"top_growing", "summary"}
+    assert events[-1]["event"] == "done" and events[-1]["percent"] == 100.0
+    elapsed = [e["elapsed_seconds"] for e in events]
+    assert elapsed == sorted(elapsed)
+    assert list(job.events(after=len(events))) == []
+
+
+def test_cancel_stops_running_job():
+    from jarvis_agent.tools.ili_jobs import JobManager
+
+    started = threading.Event()
+
+    def slow(job):
+        job.start_stage("match")
+        started.set()
+        for i in range(10_000):
+            job.progress("match", i, 10_000)
+            time.sleep(0.001)
+        return "finished"
+
+    manager = JobManager()
+    job = manager.submit(slow)
+    started.wait(5)
+    while job.describe()["percent"] == 0:
+        time.sleep(0.001)
+    assert job.cancel()
+    _wait(job)
+    assert job.status == "cancelled" and job.result is None
+    assert not job.cancel()
+    assert 0 < job.describe()["percent"] < 100 * 0.6
+    assert manager.describe()[0]["id"] == job.id
+    assert [e["event"] for e in job.events()][-1] == "cancelled"
@@ -0,0 +1,107 @@
+"""Verify anomaly assignment modes on a small hand-built pair of runs."""
+
+import pandas as pd
+
+
+def _runs():
+    # y2 row 0 sits between both y1 anomalies and is scored first; greedy
+    # hands it y1 "A", leaving y2 row 1 (right on top of A) with the weaker B.
+    run1 = pd.DataFrame({
+        "joint_number": [10, 10],
+        "log_dist_ft": [100.0, 102.0],
+        "event": ["metal loss", "metal loss"],
+        "depth_pct": [20.0, 20.0],
+        "oclock_decimal": [3.0, 3.0],
+    })
+    run2 = pd.DataFrame({
+        "joint_number": [10, 10],
+        "log_dist_ft": [100.9, 100.0],
+        "event": ["metal loss", "metal loss"],
+        "depth_pct": [20.0, 20.0],
+        "oclock_decimal": [3.0, 3.0],
+    })
+    return run1, run2
+
+
+def _dataset():
+    from jarvis_agent.tools.ili_processing import ILIDataset
+
+    run1, run2 = _runs()
+    ds = ILIDataset()
+    ds.runs = {2015: run1, 2022: run2}
+    ds.anomalies = {2015: run1, 2022: run2}
+    return ds
+
+
+def test_greedy_assignment_is_row_ordered():
+    ds = _dataset()
+    stats = ds.match_anomalies()
+    df = ds.matches[(2015, 2022)]
+    assert stats["2015->2022"]["matched"] == 2
+    assert dict(zip(df["y2_idx"], df["y1_idx"])) == {0: 0, 1: 1}
+
+
+def test_optimal_assignment_maximises_total_score():
+    ds = _dataset()
+    ds.match_anomalies()
+    greedy_total = ds.matches[(2015, 2022)]["score"].sum()
+
+    stats = ds.match_anomalies(assignment="optimal")
+    df = ds.matches[(2015, 2022)]
+    assert stats["2015->2022"]["matched"] == 2
+    assert dict(zip(df["y2_idx"], df["y1_idx"])) == {0: 1, 1: 0}
+    assert df["score"].sum() > greedy_total
+    assert df["y1_idx"].is_unique
+
+
+def test_unknown_assignment_mode_rejected():
+    import pytest
+
+    with pytest.raises(ValueError):
+        _dataset().match_anomalies(assignment="hungarian")
+
+
+def test_workers_match_serial_result():
+    ds = _dataset()
+    serial = ds.match_anomalies(assignment="optimal")
+    serial_df = ds.matches[(2015, 2022)].copy()
+    serial_growth = ds.calculate_growth()
+
+    ds._match_cache.clear()
+    assert ds.match_anomalies(assignment="optimal", workers=2) == serial
+    pd.testing.assert_frame_equal(ds.matches[(2015, 2022)], serial_df)
+    assert ds.calculate_growth(workers=2) == serial_growth
+
+
+def test_custom_severity_thresholds_reuse_matches():
+    import numpy as np
+
+    from jarvis_agent.tools.ili_processing import _round_like_python
+
+    ds = _dataset()
+    ds.anomalies[2022] = ds.runs[2022] = ds.runs[2022].assign(depth_pct=[30.0, 41.0])
+    ds.match_anomalies()
+    ds.calculate_growth()
+    default = ds.growth[(2015, 2022)]["severity"].tolist()
+    matches = ds.matches[(2015, 2022)]
+
+    stats = ds.calculate_growth(severity_thresholds={"watch": 0.5, "severe": 2.5})
+    assert ds.matches[(2015, 2022)] is matches
+    assert stats["2015->2022"]["severe_count"] + stats["2015->2022"]["watch_count"] == 2
+    assert ds.growth[(2015, 2022)]["severity"].tolist() != default
+
+    values = np.random.default_rng(0).integers(-10**6, 10**6, 5000) / 2000.0
+    assert _round_like_python(values, 3).tolist() == [round(v, 3) for v in values.tolist()]
+
+
+def test_severity_uses_unrounded_growth_rate():
+    ds = _dataset()
+    # 31.7 -> 38.7 over 7 years is 1.0000000000000004 %/yr: just over the
+    # moderate threshold, although the stored rate rounds to 1.0
+    ds.anomalies[2015] = ds.runs[2015] = ds.runs[2015].assign(depth_pct=[31.7, 31.7])
+    ds.anomalies[2022] = ds.runs[2022] = ds.runs[2022].assign(depth_pct=[38.7, 38.7])
+    ds.match_anomalies()
+    ds.calculate_growth()
+    growth = ds.growth[(2015, 2022)]
+    assert growth["depth_growth_pct_yr"].tolist() == [1.0, 1.0]
+    assert growth["severity"].tolist() == ["moderate", "moderate"]
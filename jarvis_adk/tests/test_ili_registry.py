@@ -0,0 +1,190 @@
+"""Verify the dataset registry: ids, snapshots, per-dataset locks, LRU eviction and reloads."""
+
+import copy
+import threading
+import time
+
+import pytest
+
+
+class _FakeDataset:
+    """Stands in for ILIDataset: loads count as one state change of ``size`` bytes."""
+
+    size = 100
+
+    def __init__(self):
+        self.loads = 0
+        self.path = None
+        self.frozen = False
+
+    def fork(self):
+        work = copy.copy(self)
+        work.frozen = False
+        return work
+
+    def freeze(self):
+        self.frozen = True
+        return self
+
+    def ensure_loaded(self, path=None):
+        from jarvis_agent.tools.ili_registry import StaleSnapshotError
+
+        if path is not None and path == self.path:
+            return {"path": path}
+        if self.frozen:
+            raise StaleSnapshotError
+        self.loads += 1
+        self.path = path
+        return {"path": path}
+
+    def state_key(self):
+        return (self.path, self.loads)
+
+    def memory_report(self):
+        return {"total_bytes": self.size}
+
+
+def _files(tmp_path, n):
+    paths = []
+    for i in range(n):
+        p = tmp_path / f"run{i}.xlsx"
+        p.write_bytes(f"workbook {i}".encode())
+        paths.append(p)
+    return paths
+
+
+def test_ids_follow_path_and_content(tmp_path):
+    from jarvis_agent.tools.ili_registry import DatasetRegistry, dataset_id
+
+    a, b = _files(tmp_path, 2)
+    registry = DatasetRegistry(_FakeDataset)
+    id_a, id_b = registry.open(a), registry.open(b)
+    assert id_a != id_b
+    assert id_a.startswith("run0-") and id_b.startswith("run1-")
+    assert registry.open(a) == id_a
+    assert registry.get(id_a) is not registry.get(id_b)
+    assert registry.get(id_a).loads == 1  # re-opening reuses the loaded dataset
+    assert registry.get() is registry.get(id_a)  # last opened is the default
+
+    a.write_bytes(b"edited")
+    assert dataset_id(a) != id_a
+
+
+def test_eviction_spares_default_and_in_use(tmp_path):
+    from jarvis_agent.tools.ili_registry import DatasetRegistry
+
+    a, b, c = _files(tmp_path, 3)
+    registry = DatasetRegistry(_FakeDataset, max_bytes=250)
+    id_a = registry.open(a)
+    id_b = registry.open(b, make_default=False)
+    assert registry.describe()["total_bytes"] == 200
+
+    # a is the default, b is held by a request and c was just used: none can go
+    with registry.use(id_b):
+        id_c = registry.open(c, make_default=False)
+        held = {d["id"] for d in registry.describe()["datasets"]}
+        assert held == {id_a, id_b, id_c}
+        assert registry.evictions == 0
+
+    # Once b is released it is the oldest idle dataset, so it goes
+    listing = registry.describe()
+    assert registry.evictions == 1
+    assert {d["id"] for d in listing["datasets"]} == {id_a, id_c}
+    assert listing["default"] == id_a
+    assert listing["total_bytes"] <= 250
+
+
+def test_reload_after_eviction_and_stale_ids(tmp_path):
+    from jarvis_agent.tools.ili_registry import DatasetRegistry, UnknownDatasetError
+
+    a, b = _files(tmp_path, 2)
+    registry = DatasetRegistry(_FakeDataset, max_bytes=150)
+    id_a = registry.open(a)
+    id_b = registry.open(b)  # b becomes the default, a is evicted
+    assert [d["id"] for d in registry.describe()["datasets"]] == [id_b]
+
+    with registry.use(id_a) as ds:
+        assert ds.loads == 1 and ds.path == str(a)
+
+    # Source changed since eviction: the id no longer names its content
+    registry.open(b)
+    registry.get(id_b)
+    assert id_a not in {d["id"] for d in registry.describe()["datasets"]}
+    a.write_bytes(b"edited")
+    with pytest.raises(UnknownDatasetError):
+        registry.get(id_a)
+    with pytest.raises(UnknownDatasetError):
+        registry.get("never-registered")
+    assert registry.drop(id_b)
+    with pytest.raises(UnknownDatasetError):
+        registry.get(id_b)
+
+
+def test_requests_on_one_dataset_are_serialised(tmp_path):
+    from jarvis_agent.tools.ili_registry import DatasetRegistry
+
+    a, b = _files(tmp_path, 2)
+    registry = DatasetRegistry(_FakeDataset)
+    id_a, id_b = registry.open(a), registry.open(b)
+    active = {id_a: 0, id_b: 0}
+    peak = {id_a: 0, id_b: 0}
+    both = threading.Event()
+
+    def work(key):
+        with registry.use(key):
+            active[key] += 1
+            peak[key] = max(peak[key], active[key])
+            if active[id_a] and active[id_b]:
+                both.set()
+            time.sleep(0.02)
+            active[key] -= 1
+
+    threads = [threading.Thread(target=work, args=(key,)) for key in (id_a, id_b) * 4]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak == {id_a: 1, id_b: 1}
+    assert both.is_set()  # different datasets do run side by side
+
+
+def test_readers_keep_the_published_snapshot_while_recomputing(tmp_path):
+    from jarvis_agent.tools.ili_registry import DatasetRegistry
+
+    (a,) = _files(tmp_path, 1)
+    registry = DatasetRegistry(_FakeDataset)
+    key = registry.open(a)
+    before = registry.snapshot(key)
+    assert before.frozen
+
+    started, finish = threading.Event(), threading.Event()
+
+    def recompute():
+        with registry.use(key) as ds:
+            ds.loads += 10
+            started.set()
+            finish.wait(5)
+
+    writer = threading.Thread(target=recompute)
+    writer.start()
+    started.wait(5)
+    # The writer holds the lock, yet reads return at once with the old snapshot
+    ds, result = registry.current(key, lambda ds: ds.ensure_loaded(str(a)))
+    assert ds is before and ds.loads == 1 and result == {"path": str(a)}
+    finish.set()
+    writer.join()
+
+    after = registry.snapshot(key)
+    assert after is not before and after.frozen and after.loads == 11
+    assert before.loads == 1
+
+    # A failed recomputation publishes nothing
+    with pytest.raises(RuntimeError):
+        with registry.use(key) as ds:
+            ds.loads = -1
+            raise RuntimeError("boom")
+    assert registry.snapshot(key) is after
+
+    # Stale snapshot: current() recomputes under use() and publishes
+    ds, _ = registry.current(key, lambda ds: ds.ensure_loaded("elsewhere"))
+    assert ds.path == "elsewhere" and registry.snapshot(key) is ds
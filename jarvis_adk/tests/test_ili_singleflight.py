@@ -0,0 +1,78 @@
+"""Verify single-flight coalescing of concurrent identical computations."""
+
+import threading
+
+import pytest
+
+
+def test_concurrent_callers_share_one_computation():
+    from jarvis_agent.tools.ili_singleflight import SingleFlight
+
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"rows": 42}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flights.do("growth", ("ds", 20), compute)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    # Wait until the four followers are queued behind the leader
+    while flights.describe()["saved"] < 4:
+        threading.Event().wait(0.001)
+    assert flights.in_flight() == 1
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len(results) == 5 and all(r is results[0] for r in results)
+    assert flights.describe() == {
+        "computed": 1, "saved": 4, "in_flight": 0,
+        "stages": {"growth": {"computed": 1, "saved": 4}},
+    }
+
+    # Nothing is cached once the flight lands; other keys never coalesce
+    flights.do("growth", ("ds", 20), compute)
+    flights.do("growth", ("ds", 50), compute)
+    assert len(calls) == 3
+    assert flights.describe()["saved"] == 4
+
+
+def test_followers_receive_the_leaders_exception():
+    from jarvis_agent.tools.ili_singleflight import SingleFlight
+
+    flights = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        release.wait(5)
+        raise ValueError("bad thresholds")
+
+    def call():
+        try:
+            flights.do("run-all", "key", failing)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads:
+        t.start()
+    while flights.describe()["saved"] < 2:
+        threading.Event().wait(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(errors) == 3 and len({id(e) for e in errors}) == 1
+    assert flights.in_flight() == 0
+    with pytest.raises(ZeroDivisionError):
+        flights.do("run-all", "key", lambda: 1 / 0)